@@ -0,0 +1,225 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Reduction analysis.
+
+Recognizes the variables which a loop only updates with statements at the top
+level of its body like:
+
+  total = total + e
+  total = e * total
+  best = max(best, e)
+
+where e does not depend on the variable. The contributions e of the
+iterations may then be computed independently, and combined with the value
+before the loop. Augmented assignments like `total += e` are not recognized,
+as they may update values like lists and arrays in place, which other
+references to the value would observe. Both plain code and code virtualized by the variables and
+functions transformers are recognized; in virtualized code, calls to max and
+min are only recognized when made through the overload.
+
+Requires activity analysis annotations (see activity.py).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+
+import gast
+from pyctr.core import anno
+from pyctr.core import ast_util
+
+_BINARY_OPS = {
+    gast.Add: 'add',
+    gast.Sub: 'sub',
+    gast.Mult: 'mul',
+    gast.Div: 'truediv',
+    gast.FloorDiv: 'floordiv',
+    gast.Mod: 'mod',
+    gast.Pow: 'pow',
+    gast.MatMult: 'matmul',
+    gast.BitAnd: 'and_',
+    gast.BitOr: 'or_',
+    gast.BitXor: 'xor',
+    gast.LShift: 'lshift',
+    gast.RShift: 'rshift',
+}
+
+_FUNCTIONS = ('max', 'min')
+
+# Operations whose contributions can be combined in any grouping. These are
+# also commutative for numbers; matmul is left out, as it is not commutative.
+ASSOCIATIVE_OPS = frozenset(
+    ('add', 'mul', 'and_', 'or_', 'xor', 'max', 'min'))
+
+
+class Reduction(
+    collections.namedtuple('Reduction', ('name', 'ops'))):
+  """A variable which a loop only updates by reduction statements.
+
+  Attributes:
+    name: Text, the name of the variable.
+    ops: Tuple[Text, ...], the operations of its reduction statements, in
+      order. Operations are named like the functions of the operator module,
+      or are max or min.
+  """
+
+  __slots__ = ()
+
+  @property
+  def op(self):
+    """The operation of all the statements, or None if they differ."""
+    if len(set(self.ops)) == 1:
+      return self.ops[0]
+    return None
+
+  @property
+  def associative(self):
+    return self.op in ASSOCIATIVE_OPS
+
+
+def _read_name(node, overload_name):
+  """Returns the Name node read by node, either directly or by overload.read."""
+  if isinstance(node, gast.Name):
+    return node
+  if (ast_util.is_overload_call(node, overload_name, 'read') and
+      len(node.args) == 1 and isinstance(node.args[0], gast.Name)):
+    return node.args[0]
+  return None
+
+
+def _function_call(node, overload_name):
+  """Returns the function name and arguments of plain or virtualized calls."""
+  if not isinstance(node, gast.Call):
+    return None
+  if ast_util.is_overload_call(node, overload_name, 'call'):
+    if (len(node.args) == 3 and isinstance(node.args[0], gast.Name) and
+        isinstance(node.args[1], gast.Tuple) and
+        isinstance(node.args[2], gast.Dict) and not node.args[2].keys):
+      return node.args[0].id, node.args[1].elts
+    return None
+  # In virtualized code, only calls through the overload can be intercepted.
+  if (overload_name is None and isinstance(node.func, gast.Name) and
+      not node.keywords):
+    return node.func.id, node.args
+  return None
+
+
+def _assignment(node, overload_name):
+  """Returns the target Name and value of plain or virtualized assignments."""
+  if (isinstance(node, gast.Assign) and len(node.targets) == 1 and
+      isinstance(node.targets[0], gast.Name)):
+    return node.targets[0], node.value
+  if (isinstance(node, gast.Expr) and
+      ast_util.is_overload_call(node.value, overload_name, 'assign') and
+      len(node.value.args) == 2 and isinstance(node.value.args[0], gast.Name)):
+    return node.value.args[0], node.value.args[1]
+  return None
+
+
+def match(node, overload_name=None):
+  """Recognizes a reduction statement.
+
+  Args:
+    node: ast.AST, a statement.
+    overload_name: Optional[Text], the name of the overload module in
+      virtualized code.
+
+  Returns:
+    Optional[Tuple[Text, Text, Tuple[ast.AST, ...]]], the name of the
+    variable, the operation, and the Name nodes of the variable in the
+    statement, if node is a reduction statement; else None.
+  """
+  assignment = _assignment(node, overload_name)
+  if assignment is None:
+    return None
+  target, value = assignment
+  if isinstance(value, gast.BinOp):
+    op = _BINARY_OPS.get(type(value.op))
+    operands = (value.left, value.right)
+  else:
+    call = _function_call(value, overload_name)
+    if call is None or call[0] not in _FUNCTIONS or len(call[1]) != 2:
+      return None
+    op = call[0]
+    operands = tuple(call[1])
+  if op is None:
+    return None
+
+  for operand, other in (operands, operands[::-1]):
+    operand = _read_name(operand, overload_name)
+    if (operand is not None and operand.id == target.id and
+        target.id not in [n.id for n in ast_util.name_nodes(other)]):
+      return target.id, op, (target, operand)
+  return None
+
+
+def find(node, overload_name=None):
+  """Returns the reductions of a loop.
+
+  Args:
+    node: Union[ast.For, ast.While], annotated by the activity analysis.
+    overload_name: Optional[Text], the name of the overload module in
+      virtualized code.
+
+  Returns:
+    Dict[Text, Reduction], the variables which the loop modifies only by
+    reduction statements directly in its body, and which it does not
+    otherwise read.
+  """
+  body_scope = anno.getanno(node, anno.Static.BODY_SCOPE)
+  modified = set(str(qn.root) for qn in body_scope.modified)
+  if isinstance(node, gast.For):
+    modified -= set(n.id for n in ast_util.name_nodes(node.target))
+
+  ops = collections.OrderedDict()
+  allowed_uses = set()
+  occurrences = collections.defaultdict(list)
+  for stmt in node.body:
+    for n in gast.walk(stmt):
+      if isinstance(n, gast.Name):
+        occurrences[n.id].append(n)
+    # Statements in nested blocks may not run in every iteration, so their
+    # contributions could not be computed independently of the variable.
+    reduction = match(stmt, overload_name)
+    if reduction is not None:
+      name, op, uses = reduction
+      ops.setdefault(name, []).append(op)
+      allowed_uses.update(id(u) for u in uses)
+
+  return collections.OrderedDict(
+      (name, Reduction(name, tuple(name_ops)))
+      for name, name_ops in ops.items()
+      if name in modified and
+      all(id(n) in allowed_uses for n in occurrences[name]))
+
+
+def resolve(node, overload_name=None):
+  """Annotates the loops in node with anno.Static.REDUCTIONS.
+
+  Args:
+    node: ast.AST, annotated by the activity analysis.
+    overload_name: Optional[Text], the name of the overload module in
+      virtualized code.
+
+  Returns:
+    ast.AST, node
+  """
+  for n in gast.walk(node):
+    if (isinstance(n, (gast.For, gast.While)) and
+        anno.hasanno(n, anno.Static.BODY_SCOPE)):
+      anno.setanno(n, anno.Static.REDUCTIONS, find(n, overload_name))
+  return node
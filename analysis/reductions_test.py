@@ -0,0 +1,146 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for reductions module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest as test
+import gast
+from pyctr.analysis import activity
+from pyctr.analysis import reductions
+from pyctr.api import config
+from pyctr.core import anno
+from pyctr.core import parsing
+from pyctr.core import qual_names
+from pyctr.sct import transformer
+
+
+class ReductionsTest(test.TestCase):
+
+  def _loop_reductions(self, test_fn, overload_name=None):
+    node, source = parsing.parse_entity(test_fn)
+    entity_info = transformer.EntityInfo(
+        source_code=source,
+        source_file=None,
+        namespace={},
+        arg_values=None,
+        arg_types=None,
+        owner_type=None)
+    node = qual_names.resolve(node)
+    ctx = transformer.Context(entity_info)
+    overload = None
+    if overload_name is not None:
+      overload = config.VirtualizationConfig(None, overload_name)
+    node = activity.resolve(node, ctx, overload=overload)
+    node = reductions.resolve(node, overload_name)
+    loop = next(n for n in gast.walk(node) if isinstance(n, gast.For))
+    return anno.getanno(loop, anno.Static.REDUCTIONS)
+
+  def test_reductions(self):
+
+    def test_fn(xs):
+      a = 0
+      b = 1
+      c = 0
+      d = 0
+      for x in xs:
+        y = x * 2
+        a = a + y
+        b = y * b
+        c = max(c, y)
+        d = d - x
+      return a, b, c, d
+
+    found = self._loop_reductions(test_fn)
+
+    self.assertDictEqual(
+        {name: r.ops for name, r in found.items()},
+        {'a': ('add',), 'b': ('mul',), 'c': ('max',), 'd': ('sub',)})
+    self.assertTrue(found['b'].associative)
+    self.assertFalse(found['d'].associative)
+
+  def test_augmented_assignments(self):
+
+    def test_fn(xs):
+      acc = []
+      for x in xs:
+        acc += [x]
+      return acc
+
+    self.assertEmpty(self._loop_reductions(test_fn))
+
+  def test_loop_carried_reads(self):
+
+    def test_fn(xs):
+      a = 0
+      b = 0
+      c = 0
+      out = []
+      for x in xs:
+        a = a + x
+        out.append(a)
+        b = b + b
+        if c > 0:
+          c = c + x
+      return out, b, c
+
+    self.assertEmpty(self._loop_reductions(test_fn))
+
+  def test_nested_updates(self):
+
+    def test_fn(xs):
+      a = 0
+      b = 0
+      for x in xs:
+        if x > 0:
+          a = a + x
+        b = b + x
+      return a, b
+
+    self.assertListEqual(list(self._loop_reductions(test_fn)), ['b'])
+
+  def test_mixed_operations(self):
+
+    def test_fn(xs):
+      a = 0
+      for x in xs:
+        a = a + x
+        a = a * x
+      return a
+
+    found = self._loop_reductions(test_fn)
+
+    self.assertEqual(found['a'].ops, ('add', 'mul'))
+    self.assertIsNone(found['a'].op)
+    self.assertFalse(found['a'].associative)
+
+  def test_virtualized(self):
+
+    def test_fn(xs):
+      for x in xs:
+        overload.assign(a, overload.read(a) + overload.read(x))  # pylint:disable=undefined-variable
+        overload.assign(b, overload.call(min, (overload.read(x), overload.read(b)), {}))  # pylint:disable=undefined-variable,line-too-long
+        overload.assign(c, max(overload.read(c), overload.read(x)))  # pylint:disable=undefined-variable
+
+    found = self._loop_reductions(test_fn, overload_name='overload')
+
+    self.assertListEqual(list(found), ['a', 'b'])
+    self.assertEqual(found['b'].op, 'min')
+
+
+if __name__ == '__main__':
+  test.main()
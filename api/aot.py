@@ -0,0 +1,156 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Ahead-of-time conversion into importable Python packages.
+
+The converted code is generated at build time and written as a regular Python
+package. Importing that package only binds the generated functions to the
+globals and closure of the original functions, so no conversion happens at
+runtime.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import compileall
+import importlib
+import os
+
+from pyctr.api import conversion
+from pyctr.core import parsing
+
+_HEADER = '''# Generated by pyctr from {module}. Do not edit.
+"""Converted functions of {module}."""
+
+from pyctr.api import aot as pyctr_aot__
+
+converted_functions__ = {{}}
+
+'''
+
+_BINDING = '''
+converted_functions__[{qualname!r}] = pyctr_aot__.bind(
+    {module!r}, {qualname!r}, {overload!r}, {gen_fun})
+'''
+
+_ALIAS = '{name} = converted_functions__[{name!r}]\n'
+
+
+def bind(module_name, qualname, overload_module_name, generator):
+  """Runtime shim binding a generated function to its original.
+
+  Args:
+    module_name: Text, the module containing the original function
+    qualname: Text, the qualified name of the original function
+    overload_module_name: Text, the module containing overloaded functionality
+    generator: Callable, the generator function emitted at build time
+
+  Returns:
+    The converted function.
+  """
+  module = importlib.import_module(module_name)
+  func = conversion._resolve_function(module, qualname)  # pylint:disable=protected-access
+  overload_module = importlib.import_module(overload_module_name)
+  return conversion._attach_closure(func, generator(overload_module))  # pylint:disable=protected-access
+
+
+def generate_source(module, overload_module, transformers, functions=None):
+  """Generates the source code of a module containing converted functions.
+
+  Args:
+    module: the module containing the functions to be converted
+    overload_module: module containing overloaded functionality
+    transformers: list of transformers to be applied
+    functions: Optional[Iterable[Union[Callable, Text]]], see
+      conversion.convert_module. Only functions reachable by their qualified
+      name from module can be converted ahead of time.
+
+  Returns:
+    Text, the generated source code. When imported, it exposes the converted
+    functions in a dict `converted_functions__` keyed by qualified name, and
+    the top level ones by their name as well.
+  """
+  overload, converted, generator_nodes = conversion._transform_module_functions(  # pylint:disable=protected-access
+      module, overload_module, transformers, functions)
+
+  pieces = [
+      _HEADER.format(module=module.__name__),
+      parsing.ast_to_source(generator_nodes)
+  ]
+  for func, gen_fun_name in converted:
+    qualname = conversion.qualified_name(func)
+    if '<locals>' in qualname:
+      raise ValueError(
+          'cannot convert {} ahead of time: only functions reachable from the '
+          'module namespace are supported'.format(qualname))
+    pieces.append(
+        _BINDING.format(
+            module=module.__name__,
+            qualname=qualname,
+            overload=overload.module.__name__,
+            gen_fun=gen_fun_name))
+  pieces.append('\n')
+  for func, _ in converted:
+    qualname = conversion.qualified_name(func)
+    if '.' not in qualname:
+      pieces.append(_ALIAS.format(name=qualname))
+
+  return ''.join(pieces)
+
+
+def write_package(output_dir, package_name, source):
+  """Writes generated source code as an importable, byte-compiled package.
+
+  Args:
+    output_dir: Text, the directory in which the package is created
+    package_name: Text, the name of the package
+    source: Text, the code generated by generate_source
+
+  Returns:
+    Text, the path to the package's directory.
+
+  Raises:
+    SyntaxError: if the generated code could not be compiled.
+  """
+  package_dir = os.path.join(output_dir, package_name)
+  if not os.path.isdir(package_dir):
+    os.makedirs(package_dir)
+  with open(os.path.join(package_dir, '__init__.py'), 'w') as f:
+    f.write(source)
+  if not compileall.compile_dir(package_dir, quiet=1):
+    raise SyntaxError('failed to compile {}'.format(package_dir))
+  return package_dir
+
+
+def compile_module(module, overload_module, transformers, output_dir,
+                   package_name=None, functions=None):
+  """Converts functions of a module into a package, ahead of time.
+
+  Args:
+    module: the module containing the functions to be converted
+    overload_module: module containing overloaded functionality
+    transformers: list of transformers to be applied
+    output_dir: Text, the directory in which the package is created
+    package_name: Optional[Text], the name of the package. Defaults to the last
+      component of the module's name, suffixed with `_converted`.
+    functions: Optional[Iterable[Union[Callable, Text]]], see generate_source
+
+  Returns:
+    Text, the path to the package's directory.
+  """
+  if package_name is None:
+    package_name = module.__name__.split('.')[-1] + '_converted'
+  source = generate_source(module, overload_module, transformers, functions)
+  return write_package(output_dir, package_name, source)
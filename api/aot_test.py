@@ -0,0 +1,114 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for aot module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import importlib
+import os
+import sys
+
+from absl.testing import absltest as test
+from pyctr.api import aot
+from pyctr.overloads import py_defaults
+from pyctr.overloads.testing import reverse_conditional_logic as rev_cond
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import variables
+
+
+def check_cond(i):
+  v = []
+
+  if i < 5:
+    v.append(1)
+  else:
+    v.append(2)
+  return v
+
+
+class Accumulator(object):
+
+  def __init__(self, total):
+    self.total = total
+
+  def add(self, n):
+    total = self.total
+    i = 0
+    while i < n:
+      total = total + i
+      i = i + 1
+    return total
+
+
+class AotTest(test.TestCase):
+
+  def _import_package(self, package_dir):
+    sys.path.insert(0, os.path.dirname(package_dir))
+    try:
+      return importlib.import_module(os.path.basename(package_dir))
+    finally:
+      sys.path.pop(0)
+
+  def test_compile_module(self):
+    output_dir = self.create_tempdir().full_path
+    package_dir = aot.compile_module(
+        sys.modules[__name__],
+        rev_cond, [control_flow],
+        output_dir,
+        package_name='aot_test_check_cond',
+        functions=[check_cond])
+
+    init_file = os.path.join(package_dir, '__init__.py')
+    self.assertTrue(os.path.exists(init_file))
+    pycache = os.path.join(package_dir, '__pycache__')
+    if os.path.isdir(pycache):
+      self.assertNotEmpty(os.listdir(pycache))
+    else:
+      self.assertTrue(os.path.exists(init_file + 'c'))
+
+    package = self._import_package(package_dir)
+    self.assertListEqual(package.check_cond(1), [2])
+    self.assertListEqual(package.check_cond(5), [1])
+    self.assertIs(package.check_cond,
+                  package.converted_functions__['check_cond'])
+
+  def test_compile_method(self):
+    output_dir = self.create_tempdir().full_path
+    package_dir = aot.compile_module(
+        sys.modules[__name__],
+        py_defaults, [variables, control_flow],
+        output_dir,
+        package_name='aot_test_accumulator',
+        functions=['Accumulator.add'])
+
+    package = self._import_package(package_dir)
+    add = package.converted_functions__['Accumulator.add']
+    self.assertEqual(add(Accumulator(1), 4), Accumulator(1).add(4))
+    self.assertFalse(hasattr(package, 'add'))
+
+  def test_generate_source_rejects_local_functions(self):
+
+    def local_fn():
+      pass
+
+    with self.assertRaisesRegex(ValueError, 'ahead of time'):
+      aot.generate_source(
+          sys.modules[__name__], py_defaults, [], functions=[local_fn])
+
+
+if __name__ == '__main__':
+  test.main()
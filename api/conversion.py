@@ -18,10 +18,19 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+from concurrent import futures
+import importlib
+import inspect
+import multiprocessing
+import threading
 import types
+import weakref
 
+import gast
 from pyctr.api import config
 from pyctr.core import naming
+from pyctr.core import origin_info
 from pyctr.core import parsing
 from pyctr.sct import templates
 from pyctr.sct import transformer
@@ -34,8 +43,8 @@ def _transform(source, ctx, overload, transformers):
   return source
 
 
-def _wrap_in_generator(func, source, namer, overload):
-  """Wraps the source code in a generated function.
+def _generator_node(func, source, namer, overload):
+  """Builds the AST of a generator function for the converted source code.
 
   Args:
     func: the original function
@@ -44,7 +53,9 @@ def _wrap_in_generator(func, source, namer, overload):
     overload: config.VirtualizationConfig
 
   Returns:
-    The generated function with a new closure variable.
+    Tuple[Text, List[gast.AST]], the name of the generator function and its
+    AST. The generator takes the overload module as its only argument and
+    returns the converted function.
   """
 
   nonlocals = []
@@ -56,6 +67,11 @@ def _wrap_in_generator(func, source, namer, overload):
     nonlocal_node = templates.replace(free_template, var=var)
     nonlocals.extend(nonlocal_node)
 
+  # Splice the statements in directly; a nested Module node would not survive
+  # a round trip through source code, which the source map relies on.
+  if isinstance(source, gast.Module):
+    source = source.body
+
   gen_fun_name = namer.new_symbol('gen_fun', set())
   template = """
     def gen_fun(overload):
@@ -74,9 +90,32 @@ def _wrap_in_generator(func, source, namer, overload):
       program=source,
       f_name=func.__name__)
 
-  converted_module, _ = parsing.ast_to_object(ret)
+  return gen_fun_name, ret
+
+
+def _wrap_in_generator(func, source, namer, overload, source_map=False):
+  """Wraps the source code in a generated function.
+
+  Args:
+    func: the original function
+    source: the generated source code
+    namer: naming.Namer, used for naming vars
+    overload: config.VirtualizationConfig
+    source_map: bool, whether to attach the source map of the generated code
+
+  Returns:
+    The generated function with a new closure variable. If source_map is set,
+    its `ag_source_map__` attribute maps the generated code back to the
+    original, see origin_info.SourceMap.
+  """
+  gen_fun_name, ret = _generator_node(func, source, namer, overload)
+  converted_module, _ = parsing.ast_to_object(
+      ret, include_source_map=source_map)
   outer_func = getattr(converted_module, gen_fun_name)
-  return outer_func(overload.module)
+  gen_func = outer_func(overload.module)
+  if source_map:
+    gen_func.ag_source_map__ = converted_module.ag_source_map__
+  return gen_func
 
 
 def _attach_closure(original_func, gen_func):
@@ -118,25 +157,140 @@ def _attach_closure(original_func, gen_func):
 
   closure = tuple([gen_dict[cell] for cell in gen_code.co_freevars])
 
-  return types.FunctionType(
+  new_func = types.FunctionType(
       gen_code,
       original_func.__globals__,
       argdefs=original_func.__defaults__,
       closure=closure)
+  new_func.__dict__.update(gen_func.__dict__)
+  return new_func
 
 
-def convert(func, overload_module, transformers):
+class _ConversionCache(object):
+  """Thread-safe cache of converted functions.
+
+  Concurrent requests for the same conversion are deduplicated: the first
+  thread performs the conversion, and the others wait for its result.
+
+  Conversions are keyed by the code object of the original function, which is
+  only weakly referenced, and an arbitrary hashable key describing the
+  conversion. They are stored without the closure of the original function,
+  which is attached on each request: its cells may reference the function, and
+  so the code object, which would then never be released. Functions without a
+  closure are also cached after it is attached, so that they convert to the
+  same function each time.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._converted = weakref.WeakKeyDictionary()
+    self._attached = weakref.WeakKeyDictionary()
+    self._pending = {}
+
+  def _get_or_convert_code(self, code, key, converter):
+    """Returns the cached conversion of code, calling converter if needed."""
+    with self._lock:
+      converted = self._converted.get(code)
+      if converted is not None and key in converted:
+        return converted[key]
+      pending = self._pending.get((code, key))
+      is_owner = pending is None
+      if is_owner:
+        pending = futures.Future()
+        self._pending[(code, key)] = pending
+
+    if not is_owner:
+      return pending.result()
+
+    try:
+      result = converter()
+    except BaseException as e:
+      with self._lock:
+        del self._pending[(code, key)]
+      pending.set_exception(e)
+      raise
+
+    with self._lock:
+      self._converted.setdefault(code, {})[key] = result
+      del self._pending[(code, key)]
+    pending.set_result(result)
+    return result
+
+  def get_or_convert(self, func, key, converter):
+    """Returns the cached conversion of func, calling converter if needed.
+
+    Args:
+      func: the original function
+      key: Hashable, identifies the conversion of func
+      converter: Callable[[], Callable], performs the conversion, returning
+        the generated function before the closure of func is attached to it,
+        see _attach_closure.
+
+    Returns:
+      The converted function, with the closure of func, possibly converted by
+      a previous or concurrent call.
+    """
+    gen_func = self._get_or_convert_code(func.__code__, key, converter)
+    if func.__closure__:
+      return _attach_closure(func, gen_func)
+
+    with self._lock:
+      attached = self._attached.setdefault(func, {})
+      if key not in attached:
+        attached[key] = _attach_closure(func, gen_func)
+      return attached[key]
+
+  def clear(self):
+    with self._lock:
+      self._converted.clear()
+      self._attached.clear()
+
+
+_cache = _ConversionCache()
+
+
+def clear_cache():
+  """Discards the functions memoized by convert."""
+  _cache.clear()
+
+
+def convert(func, overload_module, transformers, source_map=False):
   """Main entry point for converting a function using Pyct.
 
+  Conversions are memoized, and this function is safe to call from multiple
+  threads. Concurrent calls with the same arguments convert the function only
+  once, and all return the same converted function. Closures created from the
+  same code share the conversion, but each call returns a new function, bound
+  to the closure of func.
+
   Args:
     func: function to be converted
     overload_module: module containing overloaded functionality
     transformers: list of transformers to be applied
+    source_map: bool, whether to map the generated code back to the original.
+      This makes the conversion slower, so it is meant for debugging and
+      profiling.
 
   Returns:
-    gen_func: converted function
+    gen_func: converted function. If source_map is set, its `ag_source_map__`
+    attribute maps lines of the generated code to the original, see
+    origin_info.SourceMap.
   """
-  source, _ = parsing.parse_entity(func)
+  key = (overload_module, tuple(transformers), source_map)
+  return _cache.get_or_convert(
+      func, key,
+      lambda: _convert(func, overload_module, transformers, source_map))
+
+
+def _convert(func, overload_module, transformers, source_map=False):
+  """Converts a function, without attaching its closure. See convert."""
+  # All the conversion state (Context, Namer, the AST) is local to this call,
+  # which makes concurrent conversions safe.
+  source, source_code = parsing.parse_entity(func)
+  if source_map:
+    # Without origins, transformer.Base has nothing to propagate to the
+    # generated code.
+    origin_info.resolve(source, source_code, func)
   entity_info = transformer.EntityInfo(
       source_code=source,
       source_file='<fragment>',
@@ -151,9 +305,258 @@ def convert(func, overload_module, transformers):
   overload = config.VirtualizationConfig(overload_module, overload_name)
 
   source = _transform(source, ctx, overload, transformers)
-  gen_func = _wrap_in_generator(func, source, namer, overload)
-  gen_func = _attach_closure(func, gen_func)
-  return gen_func
+  return _wrap_in_generator(func, source, namer, overload, source_map)
+
+
+def _index_function_defs(node):
+  """Indexes the FunctionDef nodes of a module by qualified name and line.
+
+  Args:
+    node: gast.Module
+
+  Returns:
+    Tuple[Dict[Text, gast.FunctionDef], Dict[int, gast.FunctionDef]], the
+    function definitions keyed by their __qualname__, and by the lines on
+    which they start. The latter includes the lines of any decorators, to match
+    co_firstlineno across Python versions.
+  """
+  by_qualname = {}
+  by_lineno = {}
+
+  def visit(nodes, prefix):
+    for n in nodes:
+      if isinstance(n, gast.ClassDef):
+        visit(n.body, prefix + n.name + '.')
+      elif isinstance(n, gast.FunctionDef):
+        by_qualname[prefix + n.name] = n
+        by_lineno[n.lineno] = n
+        for d in n.decorator_list:
+          by_lineno[d.lineno] = n
+        visit(n.body, prefix + n.name + '.<locals>.')
+      else:
+        for field in ('body', 'orelse', 'finalbody', 'handlers'):
+          visit(getattr(n, field, ()), prefix)
+
+  visit(node.body, '')
+  return by_qualname, by_lineno
+
+
+def _find_function_def(func, by_qualname, by_lineno):
+  """Looks up the FunctionDef node of func. See _index_function_defs."""
+  node = by_qualname.get(getattr(func, '__qualname__', None))
+  if node is None:
+    node = by_lineno.get(six.get_function_code(func).co_firstlineno)
+  if node is None or node.name != func.__name__:
+    raise ValueError('could not find the source code of {} in {}'.format(
+        func, func.__module__))
+  return node
+
+
+def _resolve_function(module, func):
+  """Returns func, or the function named func (a qualified name) in module."""
+  if not isinstance(func, six.string_types):
+    return func
+  obj = module
+  for name in func.split('.'):
+    obj = getattr(obj, name)
+  return six.get_unbound_function(obj)
+
+
+def _transform_module_functions(module, overload_module, transformers,
+                                functions):
+  """Converts functions of the same module into the AST of a generated module.
+
+  See convert_module.
+
+  Args:
+    module: the module containing the functions to be converted
+    overload_module: module containing overloaded functionality
+    transformers: list of transformers to be applied
+    functions: Optional[Iterable[Union[Callable, Text]]], see convert_module
+
+  Returns:
+    Tuple[config.VirtualizationConfig, List[Tuple[Callable, Text]],
+    List[gast.AST]], the overload config, the converted functions along with
+    the name of their generator functions, and the nodes of the generated
+    module.
+  """
+  if functions is None:
+    functions = [
+        f for _, f in inspect.getmembers(module, inspect.isfunction)
+        if f.__module__ == module.__name__
+    ]
+
+  node, _ = parsing.parse_module(module)
+  by_qualname, by_lineno = _index_function_defs(node)
+
+  # Generator functions share the generated module's namespace. Everything else
+  # is local to each generator, so every function gets its own Namer; sharing
+  # one would make symbol generation slower as more functions are converted.
+  module_namer = naming.Namer({})
+  overload_name = module_namer.new_symbol('overload', set())
+  overload = config.VirtualizationConfig(overload_module, overload_name)
+
+  converted = []
+  generator_nodes = []
+  for func in functions:
+    func = _resolve_function(module, func)
+    fn_node = _find_function_def(func, by_qualname, by_lineno)
+
+    entity_info = transformer.EntityInfo(
+        source_code=fn_node,
+        source_file=getattr(module, '__file__', '<fragment>'),
+        namespace={},
+        arg_values=None,
+        arg_types={},
+        owner_type=None)
+    namer = naming.Namer({})
+    namer.generated_names.add(overload_name)
+    ctx = transformer.EntityContext(namer, entity_info)
+
+    source = _transform(gast.Module(body=[fn_node]), ctx, overload,
+                        transformers)
+    gen_fun_name, gen_node = _generator_node(func, source, module_namer,
+                                             overload)
+    generator_nodes.extend(gen_node)
+    converted.append((func, gen_fun_name))
+
+  return overload, converted, generator_nodes
+
+
+def qualified_name(func):
+  """Returns the name by which convert_module reports a function."""
+  return getattr(func, '__qualname__', func.__name__)
+
+
+def convert_module(module, overload_module, transformers, functions=None):
+  """Converts multiple functions of the same module at once.
+
+  The module's source file is parsed a single time, and all the converted
+  functions are compiled into a single generated module. This is considerably
+  cheaper than calling convert on each function individually.
+
+  Args:
+    module: the module containing the functions to be converted
+    overload_module: module containing overloaded functionality
+    transformers: list of transformers to be applied
+    functions: Optional[Iterable[Union[Callable, Text]]], the functions to be
+      converted, either as function objects or as the qualified names of
+      functions and methods defined in module. Defaults to all the functions
+      defined at the top level of module.
+
+  Returns:
+    Dict[Text, Callable], the converted functions keyed by qualified name.
+  """
+  overload, converted, generator_nodes = _transform_module_functions(
+      module, overload_module, transformers, functions)
+
+  converted_module, _ = parsing.ast_to_object(generator_nodes)
+
+  results = {}
+  for func, gen_fun_name in converted:
+    gen_func = getattr(converted_module, gen_fun_name)(overload.module)
+    results[qualified_name(func)] = _attach_closure(func, gen_func)
+  return results
+
+
+def _convert_module_functions_to_source(module_name, qualnames,
+                                        overload_module_name,
+                                        transformer_specs):
+  """Worker for convert_many. Arguments and return values are picklable.
+
+  Args:
+    module_name: Text, the module containing the functions to be converted
+    qualnames: List[Text], the qualified names of the functions to be converted
+    overload_module_name: Text, module containing overloaded functionality
+    transformer_specs: List[Union[Text, Any]], the transformers to be applied:
+      the names of transformer modules, or other transformers, like
+      transformer.Configured objects, as they are
+
+  Returns:
+    Tuple[Text, List[Text]], the generated source code, and the names of the
+    generator function of each converted function.
+  """
+  module = importlib.import_module(module_name)
+  overload_module = importlib.import_module(overload_module_name)
+  transformers = [
+      importlib.import_module(t) if isinstance(t, six.string_types) else t
+      for t in transformer_specs
+  ]
+  _, converted, generator_nodes = _transform_module_functions(
+      module, overload_module, transformers, qualnames)
+  return (parsing.ast_to_source(generator_nodes),
+          [gen_fun_name for _, gen_fun_name in converted])
+
+
+def _is_importable(func):
+  return '<locals>' not in qualified_name(func) and func.__module__ is not None
+
+
+def convert_many(funcs, overload_module, transformers, workers=None):
+  """Converts multiple functions in parallel, using a process pool.
+
+  Parsing, analysis, transformation and code generation run in worker
+  processes, which return the generated source code. Only loading the code and
+  binding the converted functions happens in the calling process.
+
+  Workers re-import the functions by module and qualified name, so they must
+  be reachable from their module's namespace. Other functions, e.g. closures,
+  are converted sequentially in the calling process. Transformer modules are
+  also re-imported by name; other transformers, like transformer.Configured
+  objects, must be picklable.
+
+  Args:
+    funcs: Iterable[Callable], functions to be converted
+    overload_module: module containing overloaded functionality
+    transformers: list of transformers to be applied
+    workers: Optional[int], the number of worker processes. Defaults to the
+      number of processors. If 1, the conversion runs in the calling process.
+
+  Returns:
+    List[Callable], the converted functions, in the order of funcs.
+  """
+  funcs = list(funcs)
+  if workers is None:
+    workers = multiprocessing.cpu_count()
+
+  by_module = collections.OrderedDict()
+  results = [None] * len(funcs)
+  for i, func in enumerate(funcs):
+    if _is_importable(func):
+      by_module.setdefault(func.__module__, []).append(i)
+    else:
+      results[i] = convert(func, overload_module, transformers)
+
+  # Each task parses its module once, so functions are grouped by module and
+  # only split as much as needed to keep all the workers busy.
+  tasks = []
+  for module_name, indices in by_module.items():
+    chunk_size = max(1, -(-len(indices) // workers))
+    for start in range(0, len(indices), chunk_size):
+      tasks.append((module_name, indices[start:start + chunk_size]))
+
+  overload_module_name = overload_module.__name__
+  transformer_specs = [
+      t.__name__ if isinstance(t, types.ModuleType) else t
+      for t in transformers
+  ]
+  task_args = [(module_name, [qualified_name(funcs[i]) for i in indices],
+                overload_module_name, transformer_specs)
+               for module_name, indices in tasks]
+
+  if workers == 1 or len(task_args) < 2:
+    outputs = [_convert_module_functions_to_source(*a) for a in task_args]
+  else:
+    with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+      outputs = list(
+          executor.map(_convert_module_functions_to_source, *zip(*task_args)))
+
+  for (_, indices), (source, gen_fun_names) in zip(tasks, outputs):
+    converted_module = parsing.source_to_object(source)
+    for i, gen_fun_name in zip(indices, gen_fun_names):
+      gen_func = getattr(converted_module, gen_fun_name)(overload_module)
+      results[i] = _attach_closure(funcs[i], gen_func)
+  return results
 
 
 def apply_(node, ctx, transformer_module, overload):
@@ -18,10 +18,21 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import gc
+import inspect
+import sys
+import threading
+import time
+import weakref
+
 from absl.testing import absltest as test
 from pyctr.api import conversion
 from pyctr.overloads import py_defaults
 from pyctr.overloads.testing import dictionary_variables
+from pyctr.overloads.testing import reverse_conditional_logic as rev_cond
+from pyctr.transformers.optimization import unrolling
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import variables
 
 
 def check_cond(i):
@@ -34,6 +45,43 @@ def check_cond(i):
   return v
 
 
+def check_cond_twice(i):
+  return check_cond(i) + check_cond(i + 5)
+
+
+def sum_range():
+  s = 0
+  for i in range(3):
+    s = s + i
+  return s
+
+
+class Counter(object):
+
+  def __init__(self):
+    self.count = 0
+
+  def incr(self, i):
+    if i > 0:
+      self.count += i
+    else:
+      self.count -= i
+    return self.count
+
+
+class SlowTransformer(object):
+  """Stands in for a transformer module, counting its invocations."""
+
+  def __init__(self):
+    self.calls = 0
+
+  def transform(self, node, ctx, overload):
+    del ctx, overload
+    self.calls += 1
+    time.sleep(0.1)
+    return node
+
+
 class ConversionTest(test.TestCase):
 
   def test_noop(self):
@@ -52,6 +100,201 @@ class ConversionTest(test.TestCase):
     self.assertListEqual(converted_check_cond(1), [1])
     self.assertListEqual(check_cond(5), [2])
 
+  def test_convert_source_map(self):
+    converted = conversion.convert(check_cond, py_defaults,
+                                   [variables, control_flow], source_map=True)
+    _, first_line = inspect.getsourcelines(check_cond)
+
+    origin_lines = set()
+    for loc, origin in converted.ag_source_map__.items():
+      self.assertEqual(loc.filename, converted.__code__.co_filename)
+      self.assertEqual(origin.loc.filename, check_cond.__code__.co_filename)
+      origin_lines.add(origin.loc.lineno - first_line)
+    # All lines but the blank one and the else.
+    self.assertSetEqual(origin_lines, {0, 1, 3, 4, 6, 7})
+
+  def test_convert_without_source_map(self):
+    converted = conversion.convert(check_cond, py_defaults,
+                                   [variables, control_flow])
+    self.assertFalse(hasattr(converted, 'ag_source_map__'))
+    self.assertListEqual(converted(1), [1])
+
+  def test_convert_is_memoized(self):
+    converted = conversion.convert(check_cond, rev_cond, [control_flow])
+    self.assertIs(
+        conversion.convert(check_cond, rev_cond, [control_flow]), converted)
+    self.assertIsNot(
+        conversion.convert(check_cond, py_defaults, [control_flow]), converted)
+
+  def test_convert_shares_code_between_closures(self):
+
+    def make_adder(n):
+
+      def add(x):
+        return x + n
+
+      return add
+
+    transformer = SlowTransformer()
+    add_one = conversion.convert(make_adder(1), py_defaults, [transformer])
+    add_two = conversion.convert(make_adder(2), py_defaults, [transformer])
+
+    self.assertEqual(transformer.calls, 1)
+    self.assertEqual(add_one(1), 2)
+    self.assertEqual(add_two(1), 3)
+
+  def test_convert_releases_self_referencing_closures(self):
+
+    def make_factorial():
+
+      def factorial(n):
+        if n > 1:
+          return n * factorial(n - 1)
+        return 1
+
+      return factorial
+
+    for source_map in (False, True):
+      factorial = make_factorial()
+      converted = conversion.convert(factorial, py_defaults, [],
+                                     source_map=source_map)
+      self.assertEqual(converted(4), 24)
+
+      ref = weakref.ref(factorial)
+      del factorial, converted
+      gc.collect()
+      self.assertIsNone(ref())
+
+  def test_convert_concurrently(self):
+
+    def test_fn(i):
+      return i + 1
+
+    transformer = SlowTransformer()
+    num_threads = 8
+    barrier = threading.Barrier(num_threads)
+    results = [None] * num_threads
+
+    def convert(i):
+      barrier.wait()
+      results[i] = conversion.convert(test_fn, py_defaults, [transformer])
+
+    threads = [
+        threading.Thread(target=convert, args=(i,)) for i in range(num_threads)
+    ]
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join()
+
+    self.assertEqual(transformer.calls, 1)
+    for r in results:
+      self.assertIs(r, results[0])
+    self.assertEqual(results[0](1), 2)
+
+  def test_convert_concurrently_propagates_errors(self):
+
+    def test_fn(i):
+      return i + 1
+
+    class FailingTransformer(object):
+
+      def transform(self, node, ctx, overload):
+        del node, ctx, overload
+        time.sleep(0.1)
+        raise ValueError('conversion failed')
+
+    transformers = [FailingTransformer()]
+    errors = []
+
+    def convert():
+      try:
+        conversion.convert(test_fn, py_defaults, transformers)
+      except ValueError as e:
+        errors.append(e)
+
+    threads = [threading.Thread(target=convert) for _ in range(4)]
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join()
+
+    self.assertEqual(len(errors), 4)
+
+  def test_convert_module(self):
+    module = sys.modules[__name__]
+    converted = conversion.convert_module(
+        module, rev_cond, [control_flow],
+        functions=[check_cond, check_cond_twice, 'Counter.incr'])
+
+    self.assertSetEqual(
+        set(converted), {'check_cond', 'check_cond_twice', 'Counter.incr'})
+    self.assertListEqual(converted['check_cond'](1), [2])
+    self.assertListEqual(converted['check_cond'](5), [1])
+    # Calls to other module functions are not converted.
+    self.assertListEqual(converted['check_cond_twice'](1), [1, 2])
+
+    c = Counter()
+    self.assertEqual(converted['Counter.incr'](c, 2), -2)
+
+  def test_convert_module_defaults_to_all_functions(self):
+    module = sys.modules[__name__]
+    converted = conversion.convert_module(module, py_defaults, [control_flow])
+
+    self.assertIn('check_cond', converted)
+    self.assertIn('check_cond_twice', converted)
+    self.assertNotIn('Counter.incr', converted)
+    self.assertListEqual(converted['check_cond'](1), check_cond(1))
+
+  def test_convert_module_local_function(self):
+
+    def local_fn(i):
+      if i > 0:
+        return 1
+      return 2
+
+    converted = conversion.convert_module(
+        sys.modules[__name__], py_defaults, [], functions=[local_fn])
+
+    fn = converted[local_fn.__qualname__]
+    self.assertEqual(fn(1), 1)
+    self.assertEqual(fn(0), 2)
+
+  def test_convert_module_function_from_other_module(self):
+    with self.assertRaises(ValueError):
+      conversion.convert_module(sys.modules[__name__], py_defaults, [],
+                                functions=[py_defaults.not_])
+
+  def test_convert_many(self):
+
+    def local_fn(i):
+      v = []
+      if i < 5:
+        v.append(3)
+      return v
+
+    funcs = [check_cond, Counter.incr, local_fn, check_cond_twice]
+    for workers in (1, 2):
+      converted = conversion.convert_many(
+          funcs, rev_cond, [control_flow], workers=workers)
+
+      self.assertEqual(len(converted), 4)
+      self.assertListEqual(converted[0](1), [2])
+      self.assertEqual(converted[1](Counter(), 2), -2)
+      self.assertListEqual(converted[2](1), [])
+      self.assertListEqual(converted[2](5), [3])
+      self.assertListEqual(converted[3](1), [1, 2])
+
+  def test_convert_many_configured_transformers(self):
+    transformers = [unrolling.with_budget(max_iterations=4), control_flow]
+    for workers in (1, 2):
+      converted = conversion.convert_many(
+          [check_cond, sum_range], rev_cond, transformers, workers=workers)
+
+      self.assertListEqual(converted[0](1), [2])
+      self.assertEqual(converted[1](), 3)
+      self.assertNotIn('for ', inspect.getsource(converted[1]))
+
 
 if __name__ == '__main__':
   test.main()
@@ -0,0 +1,269 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Attributes profiles of converted code to the original source.
+
+Converted code runs from generated modules, in functions such as `if_body_3`
+or `while_test_1`. The functions here use the source maps of those modules to
+fold the generated frames back onto the original function names and lines, so
+the functions must be converted with `source_map=True`.
+
+Example:
+
+  converted_fn = conversion.convert(fn, overload, transformers,
+                                    source_map=True)
+  profile = cProfile.Profile()
+  profile.runcall(converted_fn, x)
+  profiling.fold_stats(profile).sort_stats('cumtime').print_stats(10)
+
+  with profiling.SamplingProfiler() as profiler:
+    converted_fn(x)
+  print(profiler.collapsed())  # Input for flamegraph.pl.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import pstats
+import sys
+import threading
+
+from pyctr.core import origin_info
+
+
+def fold_frame(filename, lineno, function_name):
+  """Maps a location in generated code to its origin.
+
+  Args:
+    filename: Text
+    lineno: int
+    function_name: Text
+
+  Returns:
+    Tuple[Text, int, Text], the original file, line and function name, or the
+    arguments unchanged if the location has no known origin.
+  """
+  origin = origin_info.lookup(filename, lineno)
+  if origin is None:
+    return filename, lineno, function_name
+  return (origin.loc.filename, origin.loc.lineno, origin.function_name or
+          function_name)
+
+
+def _add_stats(existing, new):
+  return tuple(a + b for a, b in zip(existing, new))
+
+
+def _fold_callers(callers):
+  folded = {}
+  for func, caller_stats in callers.items():
+    func = fold_frame(*func)
+    if func in folded:
+      folded[func] = _add_stats(folded[func], caller_stats)
+    else:
+      folded[func] = caller_stats
+  return folded
+
+
+def fold_stats_dict(stats):
+  """Folds generated functions in a pstats dictionary onto their origin.
+
+  Generated functions that originate from the same line are merged, e.g. the
+  test and body of the same if statement.
+
+  Args:
+    stats: Dict, in the format of pstats.Stats.stats: maps (filename, lineno,
+      function name) to (primitive calls, calls, total time, cumulative time,
+      callers).
+
+  Returns:
+    Dict, in the same format.
+  """
+  folded = {}
+  for func, (cc, nc, tt, ct, callers) in stats.items():
+    func = fold_frame(*func)
+    callers = _fold_callers(callers)
+    if func in folded:
+      old_cc, old_nc, old_tt, old_ct, old_callers = folded[func]
+      for caller, caller_stats in callers.items():
+        if caller in old_callers:
+          old_callers[caller] = _add_stats(old_callers[caller], caller_stats)
+        else:
+          old_callers[caller] = caller_stats
+      folded[func] = (old_cc + cc, old_nc + nc, old_tt + tt, old_ct + ct,
+                      old_callers)
+    else:
+      folded[func] = (cc, nc, tt, ct, callers)
+  return folded
+
+
+class _StatsContainer(object):
+  """Quacks like a profile.Profile, which pstats.Stats can load from."""
+
+  def __init__(self, stats):
+    self.stats = stats
+
+  def create_stats(self):
+    pass
+
+
+def stats_from_dict(stats):
+  """Creates a pstats.Stats object from a dict in the format of its stats."""
+  return pstats.Stats(_StatsContainer(stats))
+
+
+def fold_stats(profile):
+  """Folds generated functions in a profile onto their origin.
+
+  Args:
+    profile: Union[cProfile.Profile, pstats.Stats, Text], a profile or the
+      path to a file written by its dump_stats method.
+
+  Returns:
+    pstats.Stats
+  """
+  if not isinstance(profile, pstats.Stats):
+    profile = pstats.Stats(profile)
+  return stats_from_dict(fold_stats_dict(profile.stats))
+
+
+class SamplingProfiler(object):
+  """Periodically samples the stack of a thread.
+
+  A background thread records the stack of the profiled thread every
+  `interval` seconds. The samples are folded onto the original code when they
+  are reported.
+
+  Attributes:
+    interval: float, in seconds.
+    samples: Counter[Tuple[Tuple[Text, int, Text], ...]], the raw samples,
+      as stacks of (filename, lineno, function name), outermost first.
+  """
+
+  def __init__(self, interval=0.001, thread_id=None):
+    """Creates a profiler.
+
+    Args:
+      interval: float, the time between samples, in seconds.
+      thread_id: Optional[int], the identifier of the thread to sample.
+        Defaults to the thread which calls start.
+    """
+    self.interval = interval
+    self.samples = collections.Counter()
+    self._thread_id = thread_id
+    self._stop = threading.Event()
+    self._sampler = None
+
+  def _sample(self):
+    while not self._stop.wait(self.interval):
+      frame = sys._current_frames().get(self._thread_id)  # pylint:disable=protected-access
+      stack = []
+      while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_filename, frame.f_lineno, code.co_name))
+        frame = frame.f_back
+      if stack:
+        self.samples[tuple(reversed(stack))] += 1
+
+  def start(self):
+    if self._sampler is not None:
+      raise ValueError('profiler already started')
+    if self._thread_id is None:
+      self._thread_id = threading.current_thread().ident
+    self._stop.clear()
+    self._sampler = threading.Thread(target=self._sample, name='pyctr-sampler')
+    self._sampler.daemon = True
+    self._sampler.start()
+
+  def stop(self):
+    self._stop.set()
+    if self._sampler is not None:
+      self._sampler.join()
+      self._sampler = None
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.stop()
+
+  def stacks(self, fold=True):
+    """Returns the number of samples of each distinct stack.
+
+    Args:
+      fold: bool, whether to fold generated frames onto their origin. Frames
+        of generated helpers like `if_body` then appear as the function
+        containing the statement, at the statement's line.
+
+    Returns:
+      Counter[Tuple[Tuple[Text, int, Text], ...]]
+    """
+    if not fold:
+      return collections.Counter(self.samples)
+    result = collections.Counter()
+    for stack, count in self.samples.items():
+      result[tuple(fold_frame(*frame) for frame in stack)] += count
+    return result
+
+  def line_counts(self, fold=True):
+    """Returns the number of samples in which each line was executing.
+
+    Args:
+      fold: bool, see stacks.
+
+    Returns:
+      Counter[Tuple[Text, int, Text]], keyed by the innermost frame of the
+      samples.
+    """
+    result = collections.Counter()
+    for stack, count in self.stacks(fold).items():
+      result[stack[-1]] += count
+    return result
+
+  def collapsed(self, fold=True):
+    """Returns the samples in the collapsed format used by flame graph tools.
+
+    Args:
+      fold: bool, see stacks.
+
+    Returns:
+      Text, one line per distinct stack: the frames, outermost first, separated
+      by semicolons, followed by the number of samples.
+    """
+    lines = []
+    for stack, count in sorted(self.stacks(fold).items()):
+      frames = ';'.join('{}:{}:{}'.format(name, filename, lineno)
+                        for filename, lineno, name in stack)
+      lines.append('{} {}'.format(frames, count))
+    return '\n'.join(lines)
+
+
+def sample(func, *args, **kwargs):
+  """Calls func under a SamplingProfiler.
+
+  Args:
+    func: Callable
+    *args: arguments to call func with.
+    **kwargs: keyword arguments to call func with.
+
+  Returns:
+    Tuple[Any, SamplingProfiler], the return value of func and the profiler.
+  """
+  profiler = SamplingProfiler()
+  with profiler:
+    result = func(*args, **kwargs)
+  return result, profiler
@@ -0,0 +1,131 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for profiling module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import cProfile
+import inspect
+import os
+import tempfile
+import time
+
+from absl.testing import absltest as test
+from pyctr.api import conversion
+from pyctr.api import profiling
+from pyctr.overloads import py_defaults
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import variables
+
+TRANSFORMERS = [variables, functions, control_flow]
+
+
+def count_up(n):
+  i = 0
+  total = 0
+  while i < n:
+    if i % 2 == 0:
+      total = total + abs(i)
+    i = i + 1
+  return total
+
+
+def spin(n):
+  deadline = time.time() + n
+  while time.time() < deadline:
+    pass
+
+
+class ProfilingTest(test.TestCase):
+
+  def setUp(self):
+    super(ProfilingTest, self).setUp()
+    self.converted = conversion.convert(
+        count_up, py_defaults, TRANSFORMERS, source_map=True)
+    _, self.first_line = inspect.getsourcelines(count_up)
+    self.filename = count_up.__code__.co_filename
+    self.generated_filename = self.converted.__code__.co_filename
+
+  def test_fold_frame(self):
+    self.assertEqual(
+        profiling.fold_frame(self.generated_filename,
+                             self.converted.__code__.co_firstlineno,
+                             'count_up'),
+        (self.filename, self.first_line, 'count_up'))
+    self.assertEqual(
+        profiling.fold_frame('other.py', 3, 'f'), ('other.py', 3, 'f'))
+
+  def test_fold_stats(self):
+    profile = cProfile.Profile()
+    profile.runcall(self.converted, 10)
+
+    stats = profiling.fold_stats(profile)
+
+    for filename, _, _ in stats.stats:
+      self.assertNotEqual(filename, self.generated_filename)
+    if_line = self.first_line + 4
+    _, calls, _, _, callers = stats.stats[(self.filename, if_line, 'count_up')]
+    # The test, body and else of the if statement, called 10, 5 and 5 times.
+    self.assertEqual(calls, 20)
+    self.assertIn(('~', 0, '<built-in method builtins.abs>'), stats.stats)
+    self.assertIn(py_defaults.if_stmt.__code__.co_filename,
+                  [filename for filename, _, _ in callers])
+    self.assertEqual(
+        stats.stats[(self.filename, self.first_line, 'count_up')][1], 1)
+
+  def test_fold_stats_file(self):
+    profile = cProfile.Profile()
+    profile.runcall(self.converted, 10)
+    path = os.path.join(tempfile.mkdtemp(), 'profile.prof')
+    profile.dump_stats(path)
+
+    stats = profiling.fold_stats(path)
+
+    self.assertIn((self.filename, self.first_line, 'count_up'), stats.stats)
+
+  def test_sampling_profiler(self):
+    spin_converted = conversion.convert(
+        spin, py_defaults, TRANSFORMERS, source_map=True)
+    _, spin_first_line = inspect.getsourcelines(spin)
+
+    _, profiler = profiling.sample(spin_converted, 0.1)
+
+    self.assertNotEmpty(profiler.samples)
+    lines = profiler.line_counts()
+    spin_lines = [(f, l) for f, l, name in lines if name == 'spin']
+    self.assertNotEmpty(spin_lines)
+    for filename, lineno in spin_lines:
+      self.assertEqual(filename, spin.__code__.co_filename)
+      self.assertIn(lineno - spin_first_line, (1, 2, 3))
+    for stack in profiler.stacks():
+      for filename, _, _ in stack:
+        self.assertNotEqual(filename, spin_converted.__code__.co_filename)
+
+    unfolded = profiler.stacks(fold=False)
+    self.assertIn(spin_converted.__code__.co_filename,
+                  [f for stack in unfolded for f, _, _ in stack])
+
+  def test_collapsed(self):
+    profiler = profiling.SamplingProfiler()
+    profiler.samples[(('a.py', 1, 'f'), ('b.py', 2, 'g'))] = 3
+
+    self.assertEqual(profiler.collapsed(), 'f:a.py:1;g:b.py:2 3')
+
+
+if __name__ == '__main__':
+  test.main()
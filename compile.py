@@ -0,0 +1,83 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Converts functions ahead of time, into an importable package.
+
+Example:
+
+  python -m pyctr.compile \
+      --module=my_project.model \
+      --functions=rnn,Model.step \
+      --overload=pyctr.examples.numpy.numpy_to_tf \
+      --transformers=variables,functions,control_flow \
+      --output_dir=build/
+
+This writes the package build/model_converted, which exposes the converted
+`rnn` function, and both functions in its `converted_functions__` dict.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import importlib
+
+from absl import app
+from absl import flags
+from pyctr.api import aot
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string('module', None, 'Module containing the functions to '
+                    'convert.')
+flags.DEFINE_list('functions', None, 'Qualified names of the functions to '
+                  'convert. Defaults to all the top level functions.')
+flags.DEFINE_string('overload', None, 'Module containing the overloads.')
+flags.DEFINE_list('transformers', ['variables', 'functions', 'control_flow'],
+                  'Transformers to apply, in order. Short names refer to '
+                  'modules in pyctr.transformers.virtualization.')
+flags.DEFINE_string('output_dir', None, 'Directory to write the package to.')
+flags.DEFINE_string('package', None, 'Name of the generated package. Defaults '
+                    'to the module name suffixed with "_converted".')
+
+_TRANSFORMERS_PACKAGE = 'pyctr.transformers.virtualization'
+
+
+def _import_transformer(name):
+  if '.' not in name:
+    name = '{}.{}'.format(_TRANSFORMERS_PACKAGE, name)
+  return importlib.import_module(name)
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  module = importlib.import_module(FLAGS.module)
+  overload_module = importlib.import_module(FLAGS.overload)
+  transformers = [_import_transformer(t) for t in FLAGS.transformers]
+
+  package_dir = aot.compile_module(
+      module,
+      overload_module,
+      transformers,
+      FLAGS.output_dir,
+      package_name=FLAGS.package,
+      functions=FLAGS.functions)
+  print('Wrote {}'.format(package_dir))
+
+
+if __name__ == '__main__':
+  flags.mark_flags_as_required(['module', 'overload', 'output_dir'])
+  app.run(main)
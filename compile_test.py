@@ -0,0 +1,63 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the compile command."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import importlib
+import os
+import sys
+
+from absl.testing import absltest as test
+from absl.testing import flagsaver
+from pyctr import compile as compile_command
+
+
+def count_to(n):
+  i = 0
+  while i < n:
+    i = i + 1
+  return i
+
+
+class CompileTest(test.TestCase):
+
+  def test_main(self):
+    output_dir = self.create_tempdir().full_path
+    with flagsaver.flagsaver(
+        module='pyctr.compile_test',
+        functions=['count_to'],
+        overload='pyctr.overloads.py_defaults',
+        transformers=['variables', 'control_flow'],
+        output_dir=output_dir,
+        package='compile_test_count_to'):
+      compile_command.main(['compile'])
+
+    sys.path.insert(0, output_dir)
+    try:
+      package = importlib.import_module('compile_test_count_to')
+    finally:
+      sys.path.pop(0)
+    self.assertEqual(
+        os.path.dirname(package.__file__),
+        os.path.join(output_dir, 'compile_test_count_to'))
+    self.assertEqual(package.count_to(3), 3)
+    self.assertIsNot(package.count_to, count_to)
+
+
+if __name__ == '__main__':
+  test.main()
@@ -86,6 +86,8 @@ class Static(NoValue):
       'Symbols defined when entering the node. See reaching_definitions.py.')
   LIVE_VARS_OUT = ('Symbols live when exiting the node. See liveness.py.')
   LIVE_VARS_IN = ('Symbols live when entering the node. See liveness.py.')
+  REDUCTIONS = ('The variables that a loop updates only by reduction'
+                ' statements, like `total = total + x`. See reductions.py.')
 
 
 FAIL = object()
@@ -19,6 +19,7 @@ from __future__ import division
 from __future__ import print_function
 
 import ast
+import collections
 
 import gast
 from pyctr.core import anno
@@ -255,6 +256,94 @@ def apply_to_single_assignments(targets, values, apply_fn):
       apply_fn(target, values)
 
 
+def name_nodes(node):
+  """Returns the Name nodes in node, including node itself.
+
+  Args:
+    node: ast.AST
+
+  Returns:
+    List[gast.Name], in the order of gast.walk.
+  """
+  return [n for n in gast.walk(node) if isinstance(n, gast.Name)]
+
+
+def dotted_name(node):
+  """Returns the dotted name of a Name or Attribute chain, else None."""
+  if isinstance(node, gast.Name):
+    return node.id
+  if isinstance(node, gast.Attribute):
+    parent = dotted_name(node.value)
+    if parent is not None:
+      return '{}.{}'.format(parent, node.attr)
+  return None
+
+
+def reference_names(node):
+  """Returns the names of the variables which node may evaluate to, or alias."""
+  if isinstance(node, gast.Name):
+    return {node.id}
+  if isinstance(node, (gast.Attribute, gast.Subscript, gast.Starred)):
+    return reference_names(node.value)
+  if isinstance(node, (gast.Tuple, gast.List, gast.Set)):
+    return set().union(*[reference_names(e) for e in node.elts])
+  if isinstance(node, gast.Dict):
+    return set().union(*[reference_names(v) for v in node.values])
+  if isinstance(node, gast.IfExp):
+    return reference_names(node.body) | reference_names(node.orelse)
+  if isinstance(node, gast.BoolOp):
+    return set().union(*[reference_names(v) for v in node.values])
+  return set()
+
+
+def aliases(node):
+  """Returns the names of the variables which may alias each other.
+
+  Two variables may alias when one is assigned a reference to the other, e.g.
+  `v = w`, `v = w[0]` or `for v in w`, anywhere in node.
+
+  Args:
+    node: gast.AST
+
+  Returns:
+    Dict[Text, Set[Text]], the variables which may alias each variable.
+  """
+  result = collections.defaultdict(set)
+  for n in gast.walk(node):
+    if isinstance(n, gast.Assign):
+      targets, value = n.targets, n.value
+    elif isinstance(n, gast.For):
+      targets, value = [n.target], n.iter
+    else:
+      continue
+    names = reference_names(value)
+    if not names:
+      continue
+    for target in targets:
+      names |= reference_names(target)
+    for name in names:
+      result[name] |= names
+  return result
+
+
+def is_overload_call(node, overload_name, attr):
+  """Checks whether node calls a function of the overload, e.g. overload.read.
+
+  Args:
+    node: ast.AST
+    overload_name: Optional[Text], the name of the overload in the code. If
+      None, the code is not virtualized and no call matches.
+    attr: Text, the name of the overload function.
+
+  Returns:
+    bool
+  """
+  return (overload_name is not None and isinstance(node, gast.Call) and
+          isinstance(node.func, gast.Attribute) and
+          node.func.attr == attr and isinstance(node.func.value, gast.Name) and
+          node.func.value.id == overload_name)
+
+
 def parallel_walk(node, other):
   """Walks two ASTs in parallel.
 
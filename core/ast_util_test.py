@@ -156,6 +156,25 @@ class AstUtilTest(test.TestCase):
         ('c', 'f'): 1,
     })
 
+  def test_name_nodes(self):
+    node = parsing.parse_str(
+        textwrap.dedent("""
+      def f(a):
+        return a.b + c[d]
+    """))
+    names = ast_util.name_nodes(node)
+    self.assertCountEqual([n.id for n in names], ['a', 'a', 'c', 'd'])
+    self.assertEqual(ast_util.name_nodes(names[0]), [names[0]])
+
+  def test_is_overload_call(self):
+    node = parsing.parse_expression('overload.read(x)')
+    self.assertTrue(ast_util.is_overload_call(node, 'overload', 'read'))
+    self.assertFalse(ast_util.is_overload_call(node, 'overload', 'assign'))
+    self.assertFalse(ast_util.is_overload_call(node, 'other', 'read'))
+    self.assertFalse(ast_util.is_overload_call(node, None, 'read'))
+    self.assertFalse(
+        ast_util.is_overload_call(node.args[0], 'overload', 'read'))
+
   def test_parallel_walk(self):
     node = parsing.parse_str(
         textwrap.dedent("""
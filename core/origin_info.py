@@ -21,10 +21,10 @@ from __future__ import print_function
 import collections
 import inspect
 import tokenize
+import weakref
 
 import gast
 from pyctr.core import anno
-from pyctr.core import ast_util
 from pyctr.core import parsing
 import six
 
@@ -74,38 +74,166 @@ class OriginInfo(
             self.source_code_line)
 
 
-# TODO(mdanatg): This source map should be a class - easier to refer to.
-def create_source_map(nodes, code, filename, indices_in_code):
-  """Creates a source map between an annotated AST and the code it compiles to.
+class _OriginSource(object):
+  """The source code shared by all the CompactOrigin objects of an entity.
+
+  Everything other than the raw source text is computed on first use. Most
+  conversions never need to map an error back to its origin, so tokenizing the
+  source or looking up the function's file would usually be wasted work.
+
+  The function is only referenced weakly: the origins end up in the source
+  maps of converted functions, which must not keep the original alive.
+  """
+
+  def __init__(self, source, function):
+    self.source = source
+    self.function_name = function.__name__ if function else None
+    self._function_ref = weakref.ref(function) if function else None
+    self._lines = None
+    self._comment_map = None
+    self._function_location = None
+
+  def _get_function_location(self):
+    if self._function_location is None:
+      function = self._function_ref() if self._function_ref else None
+      if function:
+        _, function_lineno = inspect.getsourcelines(function)
+        function_filepath = inspect.getsourcefile(function)
+        # Body line numbers are 1-based and start at the function's own line.
+        self._function_location = (function_filepath, function_lineno - 1)
+      else:
+        self._function_location = (None, 0)
+    return self._function_location
+
+  def location(self, lineno_in_body, col_offset):
+    filepath, lineno_offset = self._get_function_location()
+    return Location(filepath, lineno_offset + lineno_in_body, col_offset)
+
+  def line(self, lineno_in_body):
+    if self._lines is None:
+      self._lines = self.source.split('\n')
+    return self._lines[lineno_in_body - 1]
+
+  def comment(self, lineno_in_body):
+    if self._comment_map is None:
+      # TODO(mdanatg): Pull this to a separate utility.
+      code_reader = six.StringIO(self.source)
+      comment_map = {}
+      for token in tokenize.generate_tokens(code_reader.readline):
+        tok_type, tok_string, loc, _, _ = token
+        srow, _ = loc
+        if tok_type == tokenize.COMMENT:
+          comment_map[srow] = tok_string.strip()[1:].strip()
+      self._comment_map = comment_map
+    return self._comment_map.get(lineno_in_body)
+
+
+class CompactOrigin(object):
+  """Compact form of OriginInfo, as attached to nodes by resolve.
+
+  Only the position of the node in its entity's source is stored. The other
+  OriginInfo fields are computed when accessed, from the source shared by all
+  the nodes of the entity.
+
+  Attributes:
+    lineno: int, 1-based, relative to the entity's source code
+    col_offset: int
+    loc: Location
+    function_name: Optional[Text]
+    source_code_line: Text
+    comment: Optional[Text]
+  """
+
+  __slots__ = ('_source', 'lineno', 'col_offset')
+
+  def __init__(self, source, lineno, col_offset):
+    self._source = source
+    self.lineno = lineno
+    self.col_offset = col_offset
+
+  @property
+  def loc(self):
+    return self._source.location(self.lineno, self.col_offset)
+
+  @property
+  def function_name(self):
+    return self._source.function_name
+
+  @property
+  def source_code_line(self):
+    return self._source.line(self.lineno)
+
+  @property
+  def comment(self):
+    return self._source.comment(self.lineno)
+
+  def expand(self):
+    """Returns the equivalent OriginInfo."""
+    return OriginInfo(self.loc, self.function_name, self.source_code_line,
+                      self.comment)
+
+  def as_frame(self):
+    """Returns a 4-tuple consistent with the return of traceback.extract_tb."""
+    return self.expand().as_frame()
+
+  def __repr__(self):
+    return 'CompactOrigin(lineno={}, col_offset={})'.format(
+        self.lineno, self.col_offset)
+
+
+def _collect_origins(nodes):
+  """Records the origin annotations of nodes, in gast.walk order.
 
   Args:
-    nodes: Iterable[ast.AST, ...]
-    code: Text
-    filename: Optional[Text]
-    indices_in_code: Union[int, Iterable[int, ...]], the positions at which
-      nodes appear in code. The parsing always returns a module when parsing
-      code. This argument indicates the position in that module's body at which
-      the corresponding of node should appear.
+    nodes: Union[ast.AST, Iterable[ast.AST, ...]]
 
   Returns:
-    Dict[CodeLocation, OriginInfo], mapping locations in code to locations
-    indicated by origin annotations in node.
+    Tuple[List[type], List[Tuple[int, Any]]], the type of each node walked, and
+    the position and origin of the nodes which have one.
+  """
+  if not isinstance(nodes, (list, tuple)):
+    nodes = (nodes,)
+
+  node_types = []
+  origins = []
+  for node in nodes:
+    for n in gast.walk(node):
+      origin = anno.getanno(n, anno.Basic.ORIGIN, default=None)
+      if origin is not None:
+        origins.append((len(node_types), origin))
+      node_types.append(type(n))
+  return node_types, origins
+
+
+def _map_origins(node_types, origins, code, filename, indices_in_code):
+  """Creates a source map from the output of _collect_origins.
+
+  See create_source_map.
   """
   reparsed_nodes = parsing.parse_str(code)
   reparsed_nodes = [reparsed_nodes.body[i] for i in indices_in_code]
 
-  resolve(reparsed_nodes, code)
+  walked = []
+  for node in reparsed_nodes:
+    walked.extend(gast.walk(node))
+  if len(walked) != len(node_types):
+    raise ValueError('inconsistent nodes: expected {} nodes, found {}'.format(
+        len(node_types), len(walked)))
+  for before_type, after in zip(node_types, walked):
+    if before_type.__name__ != after.__class__.__name__:
+      raise ValueError('inconsistent nodes: {} and {}'.format(
+          before_type.__name__, after))
+
   result = {}
 
-  for before, after in ast_util.parallel_walk(nodes, reparsed_nodes):
+  for i, origin_info in origins:
     # Note: generated code might not be mapped back to its origin.
     # TODO(mdanatg): Generated code should always be mapped to something.
-    origin_info = anno.getanno(before, anno.Basic.ORIGIN, default=None)
-    final_info = anno.getanno(after, anno.Basic.ORIGIN, default=None)
-    if origin_info is None or final_info is None:
+    after = walked[i]
+    if not hasattr(after, 'lineno'):
       continue
 
-    line_loc = LineLocation(filename, final_info.loc.lineno)
+    line_loc = LineLocation(filename, after.lineno)
 
     existing_origin = result.get(line_loc)
     if existing_origin is not None:
@@ -127,60 +255,132 @@ def create_source_map(nodes, code, filename, indices_in_code):
   return result
 
 
+def create_source_map(nodes, code, filename, indices_in_code):
+  """Creates a source map between an annotated AST and the code it compiles to.
+
+  Args:
+    nodes: Iterable[ast.AST, ...]
+    code: Text
+    filename: Optional[Text]
+    indices_in_code: Union[int, Iterable[int, ...]], the positions at which
+      nodes appear in code. The parsing always returns a module when parsing
+      code. This argument indicates the position in that module's body at which
+      the corresponding of node should appear.
+
+  Returns:
+    Dict[LineLocation, Union[OriginInfo, CompactOrigin]], mapping locations in
+    code to locations indicated by origin annotations in node.
+  """
+  node_types, origins = _collect_origins(nodes)
+  return _map_origins(node_types, origins, code, filename, indices_in_code)
+
+
+class SourceMap(object):
+  """Read-only mapping between generated code and its origin.
+
+  Behaves like the dict returned by create_source_map, but is only computed
+  when first accessed. Constructing it merely records the origin annotations
+  found in the AST, so that the generated code is reparsed only when a location
+  actually needs to be mapped, e.g. when handling an error.
+  """
+
+  def __init__(self, nodes, code, filename, indices_in_code):
+    self._node_types, self._origins = _collect_origins(nodes)
+    self._code = code
+    self._filename = filename
+    self._indices_in_code = tuple(indices_in_code)
+    self._map = None
+
+  @property
+  def is_built(self):
+    return self._map is not None
+
+  def _get_map(self):
+    if self._map is None:
+      self._map = _map_origins(self._node_types, self._origins, self._code,
+                               self._filename, self._indices_in_code)
+      self._node_types = None
+      self._origins = None
+      self._code = None
+    return self._map
+
+  def __getitem__(self, key):
+    return self._get_map()[key]
+
+  def __contains__(self, key):
+    return key in self._get_map()
+
+  def __iter__(self):
+    return iter(self._get_map())
+
+  def __len__(self):
+    return len(self._get_map())
+
+  def get(self, key, default=None):
+    return self._get_map().get(key, default)
+
+  def items(self):
+    return self._get_map().items()
+
+
+# Source maps of the generated modules, keyed by file name. Entries go away
+# along with the modules that own them.
+_source_maps = weakref.WeakValueDictionary()
+
+
+def register_source_map(filename, source_map):
+  """Makes a source map available to lookup, see parsing.ast_to_object."""
+  _source_maps[filename] = source_map
+
+
+def get_source_map(filename):
+  """Returns the source map of a generated file, or None if it has none."""
+  return _source_maps.get(filename)
+
+
+def lookup(filename, lineno):
+  """Maps a line of generated code to its origin.
+
+  Args:
+    filename: Text, the file containing the generated code, e.g. a frame's
+      `f_code.co_filename`.
+    lineno: int, 1-based
+
+  Returns:
+    The origin annotation of the line, or None if the file has no registered
+    source map or the line has no origin.
+  """
+  source_map = _source_maps.get(filename)
+  if source_map is None:
+    return None
+  return source_map.get(LineLocation(filename, lineno))
+
+
 # TODO(znado): Consider refactoring this into a Visitor.
 # TODO(mdanatg): Does this work correctly with inner functions?
 def resolve(nodes, source, function=None):
   """Adds an origin information to all nodes inside the body of function.
 
+  Each node is annotated with a CompactOrigin, which only holds the node's
+  position. The source code line, comment and file location are looked up when
+  first accessed.
+
   Args:
     nodes: Union[ast.AST, Iterable[ast.AST, ...]]
     source: Text, the source code string for the function whose body nodes will
       be annotated.
     function: Callable, the function that will have all nodes inside of it
-      annotation with an OriginInfo annotation with key anno.Basic.ORIGIN.  If
-      it is None then only the line numbers and column offset will be set in the
+      annotation with an origin annotation with key anno.Basic.ORIGIN.  If it
+      is None then only the line numbers and column offset will be set in the
       annotation, with the rest of the information being None.
-
-  Returns:
-    A tuple of the AST node for function and a String containing its source
-    code.
   """
   if not isinstance(nodes, (list, tuple)):
     nodes = (nodes,)
 
-  if function:
-    _, function_lineno = inspect.getsourcelines(function)
-    function_filepath = inspect.getsourcefile(function)
-  else:
-    function_lineno = None
-    function_filepath = None
-
-  # TODO(mdanatg): Pull this to a separate utility.
-  code_reader = six.StringIO(source)
-  comment_map = {}
-  for token in tokenize.generate_tokens(code_reader.readline):
-    tok_type, tok_string, loc, _, _ = token
-    srow, _ = loc
-    if tok_type == tokenize.COMMENT:
-      comment_map[srow] = tok_string.strip()[1:].strip()
-
-  source_lines = source.split('\n')
+  origin_source = _OriginSource(source, function)
   for node in nodes:
     for n in gast.walk(node):
       if not hasattr(n, 'lineno'):
         continue
-
-      lineno_in_body = n.lineno
-
-      source_code_line = source_lines[lineno_in_body - 1]
-      if function:
-        source_lineno = function_lineno + lineno_in_body
-        function_name = function.__name__
-      else:
-        source_lineno = lineno_in_body
-        function_name = None
-
-      location = Location(function_filepath, source_lineno, n.col_offset)
-      origin = OriginInfo(location, function_name, source_code_line,
-                          comment_map.get(source_lineno))
-      anno.setanno(n, anno.Basic.ORIGIN, origin)
+      anno.setanno(n, anno.Basic.ORIGIN,
+                   CompactOrigin(origin_source, n.lineno, n.col_offset))
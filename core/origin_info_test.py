@@ -91,6 +91,73 @@ class OriginInfoTest(test.TestCase):
     self.assertEqual(origin.source_code_line, '  return x  # comment')
     self.assertEqual(origin.comment, 'comment')
 
+  def test_resolve_is_compact(self):
+
+    def test_fn(x):
+      return x  # comment
+
+    node, source = parsing.parse_entity(test_fn)
+    fn_node = node.body[0]
+
+    origin_info.resolve(fn_node, source, test_fn)
+
+    origin = anno.getanno(fn_node.body[0], anno.Basic.ORIGIN)
+    self.assertIsInstance(origin, origin_info.CompactOrigin)
+    self.assertEqual(origin.lineno, 2)
+    self.assertEqual(origin.col_offset, 2)
+    # Comments are only looked up on first access.
+    self.assertIsNone(origin._source._comment_map)
+
+    expanded = origin.expand()
+    self.assertIsInstance(expanded, origin_info.OriginInfo)
+    self.assertEqual(expanded.function_name, 'test_fn')
+    self.assertEqual(expanded.source_code_line, '  return x  # comment')
+    self.assertEqual(expanded.comment, 'comment')
+    self.assertEqual(expanded.loc.filename, __file__.replace('.pyc', '.py'))
+    self.assertEqual(expanded.loc.lineno,
+                     test_fn.__code__.co_firstlineno + 1)
+
+  def test_source_map_is_lazy(self):
+
+    def test_fn(x):
+      return x + 1
+
+    node, source = parsing.parse_entity(test_fn)
+    fn_node = node.body[0]
+    origin_info.resolve(fn_node, source)
+    converted_code = parsing.ast_to_source(fn_node)
+
+    source_map = origin_info.SourceMap(fn_node, converted_code,
+                                       'test_filename', [0])
+    self.assertFalse(source_map.is_built)
+
+    loc = origin_info.LineLocation('test_filename', 2)
+    self.assertIn(loc, source_map)
+    self.assertTrue(source_map.is_built)
+    self.assertEqual(source_map[loc].lineno, 2)
+    self.assertEqual(
+        dict(source_map.items()),
+        origin_info.create_source_map(fn_node, converted_code,
+                                      'test_filename', [0]))
+
+  def test_lookup(self):
+
+    def test_fn(x):
+      return x + 1
+
+    node, source = parsing.parse_entity(test_fn)
+    fn_node = node.body[0]
+    origin_info.resolve(fn_node, source, test_fn)
+    module, _ = parsing.ast_to_object(fn_node, include_source_map=True)
+
+    origin = origin_info.lookup(module.__file__, 2)
+    self.assertEqual(origin.loc.filename, test_fn.__code__.co_filename)
+    self.assertEqual(origin.source_code_line, '  return x + 1')
+    self.assertIs(
+        origin_info.get_source_map(module.__file__), module.ag_source_map__)
+    self.assertIsNone(origin_info.lookup(module.__file__, 100))
+    self.assertIsNone(origin_info.lookup('not_generated', 2))
+
 
 if __name__ == '__main__':
   test.main()
@@ -27,11 +27,33 @@ import inspect
 import os
 import tempfile
 import textwrap
+import threading
 
 import astor
 import gast
 import six
 
+# Temporary files created by source_to_object, to be deleted on exit. A single
+# exit handler is registered for all of them, rather than mutating the global
+# atexit state on every conversion.
+_temp_files = []
+_temp_files_lock = threading.Lock()
+# Prefixes the names of the files created by source_to_object, see
+# is_generated. Recognizing them by name needs no per-file state, which would
+# otherwise grow with every conversion.
+_GENERATED_FILE_PREFIX = 'pyctr_generated_'
+
+
+@atexit.register
+def _remove_temp_files():
+  with _temp_files_lock:
+    for name in _temp_files:
+      try:
+        os.remove(name)
+      except OSError:
+        pass
+    del _temp_files[:]
+
 
 def parse_entity(entity):
   """Returns the AST of given entity."""
@@ -93,6 +115,24 @@ def parse_entity(entity):
            ' source to:\n{}\nBut that did not work.'.format(new_source))
 
 
+def parse_module(module):
+  """Returns the AST and source code of the given module.
+
+  Unlike parse_entity, the whole file is parsed at once, which makes it
+  cheaper than repeated calls to parse_entity when multiple entities of the
+  same module are needed.
+
+  Args:
+    module: types.ModuleType
+
+  Returns:
+    Tuple[gast.Module, Text], the parsed module and its source code. The line
+    numbers in the AST match those in the module's file.
+  """
+  source = inspect.getsource(module)
+  return parse_str(source), source
+
+
 def parse_str(src):
   """Returns the AST of given piece of code."""
   # TODO(mdanatg): This should exclude the module things are autowrapped in.
@@ -172,6 +212,41 @@ def ast_to_source(node, indentation='  '):
   return code
 
 
+def source_to_object(source, delete_on_exit=True):
+  """Return the Python module represented by given source code.
+
+  The code is loaded from a temporary file, which ensures that it is readable
+  by e.g. `pdb` or `inspect`.
+
+  Args:
+    source: Text, the source code to compile.
+    delete_on_exit: bool, whether to delete the temporary file used for
+      compilation on exit.
+
+  Returns:
+    A module object containing the compiled source code.
+  """
+  with tempfile.NamedTemporaryFile(
+      mode='w', prefix=_GENERATED_FILE_PREFIX, suffix='.py',
+      delete=False) as f:
+    module_name = os.path.basename(f.name[:-3])
+    f.write(source)
+
+  # TODO(mdanatg): Try flush() and delete=False instead.
+  if delete_on_exit:
+    with _temp_files_lock:
+      _temp_files.append(f.name)
+  return imp.load_source(module_name, f.name)
+
+
+def is_generated(filename):
+  """True if filename contains code compiled by source_to_object."""
+  dirname, basename = os.path.split(filename)
+  return (dirname == tempfile.gettempdir() and
+          basename.startswith(_GENERATED_FILE_PREFIX) and
+          basename.endswith('.py'))
+
+
 def ast_to_object(nodes,
                   indentation='  ',
                   include_source_map=False,
@@ -187,7 +262,8 @@ def ast_to_object(nodes,
       object.
     indentation: Text, the string to use for indentation.
     include_source_map: bool, whether to attach a source map to the compiled
-      object. Also see origin_info.py.
+      object. The map is only computed when first accessed. Also see
+      origin_info.py.
     source_prefix: Optional[Text], string to print as-is into the source file.
     delete_on_exit: bool, whether to delete the temporary file used for
       compilation on exit.
@@ -207,24 +283,18 @@ def ast_to_object(nodes,
   if source_prefix:
     source = source_prefix + '\n' + source
 
-  with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-    module_name = os.path.basename(f.name[:-3])
-    f.write(source)
+  compiled_nodes = source_to_object(source, delete_on_exit=delete_on_exit)
 
+  if include_source_map:
     if isinstance(nodes, (list, tuple)):
       indices = range(-len(nodes), 0)
     else:
       indices = (-1,)
 
-    if include_source_map:
-      # TODO(mdanatg): Break this dependency cycle.
-      from pyctr.core import origin_info  # pylint:disable=g-import-not-at-top
-      source_map = origin_info.create_source_map(nodes, source, f.name, indices)
-
-  # TODO(mdanatg): Try flush() and delete=False instead.
-  if delete_on_exit:
-    atexit.register(lambda: os.remove(f.name))
-  compiled_nodes = imp.load_source(module_name, f.name)
+    # TODO(mdanatg): Break this dependency cycle.
+    from pyctr.core import origin_info  # pylint:disable=g-import-not-at-top
+    source_map = origin_info.SourceMap(nodes, source, compiled_nodes.__file__,
+                                       indices)
 
   # TODO(znado): Clean this up so we don't need to attach it to the namespace.
   # We cannot get the rewritten function name until it is too late so templating
@@ -238,5 +308,6 @@ def ast_to_object(nodes,
         'cannot convert %s because it has namespace attribute "%s", which is '
         'reserved for AutoGraph.') % (compiled_nodes, source_map_name)
     compiled_nodes.__dict__[source_map_name] = source_map
+    origin_info.register_source_map(compiled_nodes.__file__, source_map)
 
   return compiled_nodes, source
@@ -135,6 +135,8 @@ string""")
     """
     self.assertEqual(textwrap.dedent(expected_source).strip(), source.strip())
     self.assertEqual(2, module.f(1))
+    self.assertTrue(parsing.is_generated(module.__file__))
+    self.assertFalse(parsing.is_generated(__file__))
     with open(module.__file__, 'r') as temp_output:
       self.assertEqual(
           textwrap.dedent(expected_source).strip(),
@@ -116,6 +116,18 @@ class QN(object):
       raise ValueError('Cannot get parent of simple name "%s".' % self.qn[0])
     return self._parent
 
+  @property
+  def root(self):
+    """Returns the simple QN that this QN is based on.
+
+    Examples:
+      'a.b[c]' and 'a' both have the root 'a'
+    """
+    qn = self
+    while qn.is_composite():
+      qn = qn.parent
+    return qn
+
   @property
   def owner_set(self):
     """Returns all the symbols (simple or composite) that own this QN.
@@ -178,6 +178,15 @@ class QNTest(test.TestCase):
     self.assertSetEqual(a_dot_b_dot_c.support_set, set((a,)))
     self.assertSetEqual(a_dot_b_sub_c.support_set, set((a, c)))
 
+  def test_root(self):
+    a = QN('a')
+    a_dot_b = QN(a, attr='b')
+    a_dot_b_sub_c = QN(a_dot_b, subscript=QN('c'))
+
+    self.assertEqual(a.root, a)
+    self.assertEqual(a_dot_b.root, a)
+    self.assertEqual(a_dot_b_sub_c.root, a)
+
 
 class QNResolverTest(test.TestCase):
 
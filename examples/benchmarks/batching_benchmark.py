@@ -0,0 +1,76 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark comparing a per-example loop with the batched function."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+from pyctr.examples.benchmarks import benchmark_base
+from pyctr.overloads import batching
+
+
+def collatz_steps(n):
+  steps = 0
+  while n != 1:
+    if n % 2 == 0:
+      n = n // 2
+    else:
+      n = 3 * n + 1
+    steps = steps + 1
+  return steps
+
+
+def mlp(x, w1, w2):
+  h = np.tanh(np.dot(x, w1))
+  y = np.dot(h, w2)
+  if np.sum(y) < 0:
+    y = -y
+  return y
+
+
+class BatchingBenchmark(benchmark_base.ReportingBenchmark):
+  """Times a Python loop over the examples against batching.batch."""
+
+  def __init__(self, batch_size=256, units=16, iters=None, warmup_iters=None):
+    super(BatchingBenchmark, self).__init__(iters, warmup_iters)
+    self.batch_size = batch_size
+    self.units = units
+
+  def benchmark_collatz(self):
+    ns = np.arange(1, self.batch_size + 1)
+    extras = {'batch_size': self.batch_size}
+    batched = batching.batch(collatz_steps)
+
+    self.time_execution('collatz_loop',
+                        lambda: [collatz_steps(n) for n in ns], extras=extras)
+    self.time_execution('collatz_batched', lambda: batched(ns), extras=extras)
+
+  def benchmark_mlp(self):
+    xs = np.random.randn(self.batch_size, self.units)
+    w1 = np.random.randn(self.units, self.units)
+    w2 = np.random.randn(self.units, self.units)
+    extras = {'batch_size': self.batch_size, 'units': self.units}
+    batched = batching.batch(mlp, in_axes=(0, None, None))
+
+    self.time_execution('mlp_loop', lambda: [mlp(x, w1, w2) for x in xs],
+                        extras=extras)
+    self.time_execution('mlp_batched', lambda: batched(xs, w1, w2),
+                        extras=extras)
+
+
+if __name__ == '__main__':
+  benchmark_base.main()
@@ -0,0 +1,297 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Common benchmarking code.
+
+Benchmarks subclass ReportingBenchmark and define methods whose name starts
+with `benchmark`, which call `time_execution`. Running the benchmark module
+through `main` executes them and optionally writes the results as JSON:
+
+  python -m pyctr.examples.benchmarks.queens_benchmark --output_json=new.json
+
+Two result files can then be compared, flagging regressions:
+
+  python -m pyctr.examples.benchmarks.benchmark_base \
+      --baseline=old.json --current=new.json --threshold=0.1
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import inspect
+import json
+import math
+import platform
+import re
+import sys
+import time
+import timeit
+
+from absl import app
+from absl import flags
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string('benchmark_filter', None,
+                    'Regex selecting the benchmark methods to run.')
+flags.DEFINE_integer('iters', None, 'Overrides the number of timed runs.')
+flags.DEFINE_integer('warmup_iters', None,
+                     'Overrides the number of untimed warmup runs.')
+flags.DEFINE_string('output_json', None, 'File to write the results to.')
+flags.DEFINE_string('baseline', None, 'Results to compare against.')
+flags.DEFINE_string('current', None, 'Results to compare.')
+flags.DEFINE_float('threshold', 0.05,
+                   'Relative slowdown of the median reported as regression.')
+
+DEFAULT_ITERS = 30
+DEFAULT_WARMUP_ITERS = 3
+
+
+def _percentile(sorted_values, p):
+  """Nearest-rank percentile of a sorted, non-empty list."""
+  rank = int(math.ceil(p / 100.0 * len(sorted_values)))
+  return sorted_values[max(rank, 1) - 1]
+
+
+def _first_not_none(*values):
+  for v in values:
+    if v is not None:
+      return v
+  return None
+
+
+def summarize(times):
+  """Computes summary statistics over a list of run times.
+
+  Args:
+    times: List[float], non-empty, in seconds.
+
+  Returns:
+    Dict[Text, float], containing the median, p95, mean, stddev (sample), min
+    and max of times.
+  """
+  n = len(times)
+  sorted_times = sorted(times)
+  mean = sum(times) / n
+  if n > 1:
+    stddev = math.sqrt(sum((t - mean)**2 for t in times) / (n - 1))
+  else:
+    stddev = 0.0
+  if n % 2:
+    median = sorted_times[n // 2]
+  else:
+    median = (sorted_times[n // 2 - 1] + sorted_times[n // 2]) / 2
+  return {
+      'median': median,
+      'p95': _percentile(sorted_times, 95),
+      'mean': mean,
+      'stddev': stddev,
+      'min': sorted_times[0],
+      'max': sorted_times[-1],
+  }
+
+
+class ReportingBenchmark(object):
+  """Base class for benchmarks which report timing statistics.
+
+  Attributes:
+    results: List[Dict[Text, Any]], one entry per call to time_execution, in
+      the format written by write_results.
+  """
+
+  def __init__(self, iters=None, warmup_iters=None):
+    self.iters = iters
+    self.warmup_iters = warmup_iters
+    self.results = []
+
+  def iters_and_warmup(self, iters=None, warmup_iters=None):
+    """Returns the run counts to use, honoring flags and instance defaults."""
+    flags_parsed = FLAGS.is_parsed()
+    iters = _first_not_none(iters, FLAGS.iters if flags_parsed else None,
+                            self.iters, DEFAULT_ITERS)
+    warmup_iters = _first_not_none(
+        warmup_iters, FLAGS.warmup_iters if flags_parsed else None,
+        self.warmup_iters, DEFAULT_WARMUP_ITERS)
+    return iters, warmup_iters
+
+  def time_execution(self, name, target, iters=None, warmup_iters=None,
+                     iter_volume=None, iter_unit=None, extras=None):
+    """Times repeated runs of target and records the results.
+
+    Args:
+      name: Union[Text, Tuple], the benchmark name. Tuples are joined with
+        underscores.
+      target: Callable[[], Any], the code to time.
+      iters: Optional[int], the number of timed runs.
+      warmup_iters: Optional[int], the number of runs before timing starts.
+      iter_volume: Optional[float], the amount of work done by each run, used
+        to report throughput.
+      iter_unit: Optional[Text], the unit of iter_volume, e.g. 'examples'.
+      extras: Optional[Dict[Text, Any]], JSON-serializable metadata to report
+        along with the timings.
+
+    Returns:
+      Dict[Text, Any], the recorded result.
+    """
+    iters, warmup_iters = self.iters_and_warmup(iters, warmup_iters)
+    for _ in range(warmup_iters):
+      target()
+    times = [timeit.timeit(target, number=1) for _ in range(iters)]
+    return self.report(
+        name,
+        times,
+        warmup_iters=warmup_iters,
+        iter_volume=iter_volume,
+        iter_unit=iter_unit,
+        extras=extras)
+
+  def report(self, name, times, warmup_iters=0, iter_volume=None,
+             iter_unit=None, extras=None):
+    """Records run times measured by the caller.
+
+    This is useful when a single run measures several things at once, e.g.
+    the individual phases of a pipeline.
+
+    Args:
+      name: Union[Text, Tuple], see time_execution.
+      times: List[float], non-empty, in seconds.
+      warmup_iters: int, the number of untimed runs that preceded times.
+      iter_volume: Optional[float], see time_execution.
+      iter_unit: Optional[Text], see time_execution.
+      extras: Optional[Dict[Text, Any]], see time_execution.
+
+    Returns:
+      Dict[Text, Any], the recorded result.
+    """
+    if isinstance(name, tuple):
+      name = '_'.join(str(n) for n in name)
+    iters = len(times)
+    result = {
+        'name': name,
+        'iters': iters,
+        'warmup_iters': warmup_iters,
+        'times': list(times),
+        'extras': dict(extras or {}),
+    }
+    result.update(summarize(times))
+    message = '{}: median {:.6f}s, p95 {:.6f}s, stddev {:.6f}s ({} runs)'.format(
+        name, result['median'], result['p95'], result['stddev'], iters)
+    if iter_volume is not None and result['median']:
+      result['throughput'] = iter_volume / result['median']
+      result['throughput_unit'] = '{}/s'.format(iter_unit or 'items')
+      message += ', {:.2f} {}'.format(result['throughput'],
+                                     result['throughput_unit'])
+    self.results.append(result)
+    print(message)
+    return result
+
+  def run_benchmarks(self, name_filter=None):
+    """Runs all the methods of this object whose name starts with benchmark."""
+    for name, method in inspect.getmembers(self, inspect.ismethod):
+      if not name.startswith('benchmark'):
+        continue
+      if name_filter and not re.search(name_filter, name):
+        continue
+      method()
+
+  def write_results(self, path):
+    write_results(path, self.results)
+
+
+def write_results(path, results):
+  """Writes benchmark results as JSON.
+
+  Args:
+    path: Text
+    results: List[Dict[Text, Any]], see ReportingBenchmark.results.
+  """
+  report = {
+      'metadata': {
+          'timestamp': time.time(),
+          'python': platform.python_version(),
+          'platform': platform.platform(),
+      },
+      'benchmarks': results,
+  }
+  with open(path, 'w') as f:
+    json.dump(report, f, indent=2, sort_keys=True)
+
+
+def read_results(path):
+  """Reads results written by write_results, keyed by benchmark name."""
+  with open(path) as f:
+    report = json.load(f)
+  return {r['name']: r for r in report['benchmarks']}
+
+
+def compare(baseline, current, threshold=0.05):
+  """Compares two sets of results.
+
+  Args:
+    baseline: Dict[Text, Dict[Text, Any]], as returned by read_results.
+    current: Dict[Text, Dict[Text, Any]], as returned by read_results.
+    threshold: float, the relative increase of the median run time above which
+      a benchmark is considered to have regressed.
+
+  Returns:
+    List[Tuple[Text, float, float, float, bool]], for each benchmark present in
+    both sets, its name, baseline and current medians, the ratio between them,
+    and whether it regressed.
+  """
+  comparison = []
+  for name in sorted(set(baseline) & set(current)):
+    before = baseline[name]['median']
+    after = current[name]['median']
+    ratio = after / before if before else float('inf')
+    comparison.append((name, before, after, ratio, ratio > 1 + threshold))
+  return comparison
+
+
+def main(argv=None):
+  """Runs all the ReportingBenchmark subclasses defined in __main__."""
+
+  def run(argv):
+    del argv
+    module = sys.modules['__main__']
+    results = []
+    for _, cls in inspect.getmembers(module, inspect.isclass):
+      if (issubclass(cls, ReportingBenchmark) and
+          cls.__module__ == module.__name__):
+        benchmark = cls()
+        benchmark.run_benchmarks(FLAGS.benchmark_filter)
+        results.extend(benchmark.results)
+    if FLAGS.output_json:
+      write_results(FLAGS.output_json, results)
+
+  app.run(run, argv=argv)
+
+
+def _compare_main(argv):
+  del argv
+  if not FLAGS.baseline or not FLAGS.current:
+    raise app.UsageError('Both --baseline and --current are required.')
+  comparison = compare(
+      read_results(FLAGS.baseline), read_results(FLAGS.current),
+      FLAGS.threshold)
+  regressed = False
+  for name, before, after, ratio, is_regression in comparison:
+    print('{:<60} {:>12.6f}s {:>12.6f}s {:>7.3f}x{}'.format(
+        name, before, after, ratio, '  REGRESSION' if is_regression else ''))
+    regressed = regressed or is_regression
+  return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+  app.run(_compare_main)
@@ -0,0 +1,101 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for benchmark_base module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import tempfile
+
+from absl.testing import absltest as test
+from pyctr.examples.benchmarks import benchmark_base
+
+
+class FakeBenchmark(benchmark_base.ReportingBenchmark):
+
+  def __init__(self):
+    super(FakeBenchmark, self).__init__(iters=4, warmup_iters=2)
+    self.calls = 0
+
+  def _target(self):
+    self.calls += 1
+
+  def benchmark_first(self):
+    self.time_execution(('first', 1), self._target, extras={'size': 1})
+
+  def benchmark_second(self):
+    self.time_execution('second', self._target, iter_volume=10,
+                        iter_unit='examples')
+
+
+class BenchmarkBaseTest(test.TestCase):
+
+  def test_summarize(self):
+    stats = benchmark_base.summarize([4.0, 1.0, 3.0, 2.0])
+    self.assertEqual(stats['median'], 2.5)
+    self.assertEqual(stats['p95'], 4.0)
+    self.assertEqual(stats['mean'], 2.5)
+    self.assertAlmostEqual(stats['stddev'], 1.2909944)
+    self.assertEqual(stats['min'], 1.0)
+    self.assertEqual(stats['max'], 4.0)
+
+  def test_summarize_single(self):
+    stats = benchmark_base.summarize([3.0])
+    self.assertEqual(stats['median'], 3.0)
+    self.assertEqual(stats['stddev'], 0.0)
+
+  def test_run_benchmarks(self):
+    benchmark = FakeBenchmark()
+    benchmark.run_benchmarks()
+
+    self.assertEqual(benchmark.calls, 12)
+    first, second = benchmark.results
+    self.assertEqual(first['name'], 'first_1')
+    self.assertEqual(first['iters'], 4)
+    self.assertEqual(first['warmup_iters'], 2)
+    self.assertLen(first['times'], 4)
+    self.assertDictEqual(first['extras'], {'size': 1})
+    self.assertNotIn('throughput', first)
+    self.assertEqual(second['throughput_unit'], 'examples/s')
+
+  def test_run_benchmarks_filter(self):
+    benchmark = FakeBenchmark()
+    benchmark.run_benchmarks('second')
+
+    self.assertEqual([r['name'] for r in benchmark.results], ['second'])
+
+  def test_write_and_compare(self):
+    benchmark = FakeBenchmark()
+    benchmark.run_benchmarks()
+    path = os.path.join(tempfile.mkdtemp(), 'results.json')
+    benchmark.write_results(path)
+
+    baseline = benchmark_base.read_results(path)
+    self.assertCountEqual(baseline, ('first_1', 'second'))
+
+    current = {
+        'first_1': dict(baseline['first_1']),
+        'second': dict(baseline['second'], median=0.0),
+    }
+    current['first_1']['median'] = baseline['first_1']['median'] * 2 + 1
+    comparison = benchmark_base.compare(baseline, current, threshold=0.1)
+    self.assertEqual([(c[0], c[4]) for c in comparison], [('first_1', True),
+                                                          ('second', False)])
+
+
+if __name__ == '__main__':
+  test.main()
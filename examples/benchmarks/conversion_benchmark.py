@@ -0,0 +1,335 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark timing each phase of conversion on synthetic functions.
+
+The functions are generated with a controlled size and shape, see
+FunctionShape. Each phase of the pipeline used by conversion.convert is timed
+separately, and for each phase the benchmark reports how its run time scales
+with the number of statements. An exponent noticeably above 1 points to
+super-linear behavior.
+
+  python -m pyctr.examples.benchmarks.conversion_benchmark --iters=3
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import importlib
+import math
+import os
+import sys
+import tempfile
+import timeit
+
+from absl import flags
+from pyctr.analysis import activity
+from pyctr.analysis import reductions
+from pyctr.api import config
+from pyctr.api import conversion
+from pyctr.core import naming
+from pyctr.core import parsing
+from pyctr.core import qual_names
+from pyctr.examples.benchmarks import benchmark_base
+from pyctr.overloads import py_defaults
+from pyctr.sct import transformer
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import logical_ops
+from pyctr.transformers.virtualization import variables
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_list('statement_counts', ['10', '100', '1000', '10000'],
+                  'Sizes of the synthetic functions, in statements.')
+
+# A block is closed after this many statements, so that compound statements
+# do not swallow the rest of the function.
+_BLOCK_SIZE = 4
+
+FunctionShape = collections.namedtuple(
+    'FunctionShape',
+    ('num_statements', 'depth', 'num_ifs', 'num_loops', 'num_calls',
+     'num_locals'))
+
+
+def default_shape(num_statements):
+  """A mix of 10% conditionals, 5% loops and 20% calls, nested 3 deep."""
+  return FunctionShape(
+      num_statements=num_statements,
+      depth=3,
+      num_ifs=num_statements // 10,
+      num_loops=num_statements // 20,
+      num_calls=num_statements // 5,
+      num_locals=max(1, min(num_statements // 4, 50)))
+
+
+def _statement_kinds(shape):
+  """Spreads the compound statements and calls evenly across the function."""
+  kinds = ['assign'] * shape.num_statements
+  for kind, count in (('if', shape.num_ifs), ('loop', shape.num_loops),
+                      ('call', shape.num_calls)):
+    if not count:
+      continue
+    stride = shape.num_statements / count
+    for k in range(count):
+      i = int(k * stride)
+      # Find the next free slot, wrapping around.
+      while kinds[i] != 'assign':
+        i = (i + 1) % shape.num_statements
+      kinds[i] = kind
+  return kinds
+
+
+def make_source(name, shape):
+  """Generates the source code of a function with the given shape.
+
+  Args:
+    name: Text, the name of the function
+    shape: FunctionShape
+
+  Returns:
+    Text, the source code. The function takes arguments `n` and `x`. Compound
+    statements which would exceed the nesting depth are replaced with
+    assignments, so the function may contain fewer than requested.
+  """
+  if shape.num_ifs + shape.num_loops + shape.num_calls > shape.num_statements:
+    raise ValueError('too many compound statements and calls: {}'.format(shape))
+
+  local_names = ['v{}'.format(i) for i in range(shape.num_locals)]
+  lines = ['def {}(n, x):'.format(name)]
+  lines.extend('  {} = x'.format(v) for v in local_names)
+
+  # Number of statements emitted so far in each open block.
+  blocks = [0]
+  loops = 0
+  for i, kind in enumerate(_statement_kinds(shape)):
+    while len(blocks) > 1 and blocks[-1] >= _BLOCK_SIZE:
+      blocks.pop()
+    if kind in ('if', 'loop'):
+      while len(blocks) > max(shape.depth, 1) and blocks[-1]:
+        blocks.pop()
+      # Blocks cannot be left empty, so this would nest too deep.
+      if len(blocks) > shape.depth:
+        kind = 'assign'
+
+    indent = '  ' * len(blocks)
+    target = local_names[i % shape.num_locals]
+    operand = local_names[(i * 7 + 3) % shape.num_locals]
+    blocks[-1] += 1
+
+    if kind == 'assign':
+      lines.append('{}{} = {} + {}'.format(indent, target, operand, i))
+    elif kind == 'call':
+      lines.append('{}{} = abs({} - {})'.format(indent, target, operand, i))
+    elif kind == 'if':
+      lines.append('{}if {} > {}:'.format(indent, operand, i))
+      blocks.append(0)
+    elif kind == 'loop':
+      if loops % 2:
+        lines.append('{}while {} < n:'.format(indent, target))
+      else:
+        lines.append('{}for i{} in range(n):'.format(indent, i))
+      loops += 1
+      blocks.append(0)
+
+    # Compound statements need at least one statement in their body.
+    if kind in ('if', 'loop') and i == shape.num_statements - 1:
+      lines.append('{}  pass'.format(indent))
+
+  lines.append('  return {}'.format(' + '.join(local_names)))
+  return '\n'.join(lines) + '\n'
+
+
+def make_function(shape):
+  """Writes a function with the given shape to a module and imports it."""
+  name = 'f_{}'.format('_'.join(str(s) for s in shape))
+  module_dir = tempfile.mkdtemp()
+  module_name = 'conversion_benchmark_{}'.format(name)
+  with open(os.path.join(module_dir, module_name + '.py'), 'w') as f:
+    f.write(make_source(name, shape))
+  sys.path.insert(0, module_dir)
+  try:
+    module = importlib.import_module(module_name)
+  finally:
+    sys.path.pop(0)
+  return getattr(module, name)
+
+
+class _Pipeline(object):
+  """The steps of conversion.convert, split into individually timed phases.
+
+  Each phase takes the output of the previous one. The phases match the
+  transformers, with the analyses run by control_flow split out.
+  """
+
+  def __init__(self, func, overload_module):
+    self.func = func
+    self.overload_module = overload_module
+
+  def parse(self, _):
+    source, _ = parsing.parse_entity(self.func)
+    entity_info = transformer.EntityInfo(
+        source_code=source,
+        source_file='<fragment>',
+        namespace={},
+        arg_values=None,
+        arg_types={},
+        owner_type=None)
+    self.namer = naming.Namer(entity_info.namespace)
+    self.ctx = transformer.EntityContext(self.namer, entity_info)
+    self.overload = config.VirtualizationConfig(
+        self.overload_module, self.namer.new_symbol('overload', set()))
+    return source
+
+  def variables(self, node):
+    return variables.transform(node, self.ctx, self.overload)
+
+  def functions(self, node):
+    return functions.transform(node, self.ctx, self.overload)
+
+  def logical_ops(self, node):
+    return logical_ops.transform(node, self.ctx, self.overload)
+
+  def qual_names(self, node):
+    return qual_names.resolve(node)
+
+  def activity(self, node):
+    return activity.resolve(
+        node, self.ctx, parent_scope=None, overload=self.overload)
+
+  def reductions(self, node):
+    return reductions.resolve(node, self.overload.symbol_name)
+
+  def control_flow(self, node):
+    return control_flow.ControlFlowTransformer(self.ctx,
+                                               self.overload).visit(node)
+
+  def codegen(self, node):
+    self.gen_fun_name, nodes = conversion._generator_node(  # pylint:disable=protected-access
+        self.func, node, self.namer, self.overload)
+    return parsing.ast_to_source(nodes)
+
+  def load(self, source):
+    module = parsing.source_to_object(source)
+    gen_func = getattr(module, self.gen_fun_name)(self.overload_module)
+    return conversion._attach_closure(self.func, gen_func)  # pylint:disable=protected-access
+
+  PHASES = ('parse', 'variables', 'functions', 'logical_ops', 'qual_names',
+            'activity', 'reductions', 'control_flow', 'codegen', 'load')
+
+  def run(self):
+    """Runs all phases once.
+
+    Returns:
+      Tuple[Callable, Dict[Text, float]], the converted function and the run
+      time of each phase.
+    """
+    times = {}
+    value = None
+    for phase in self.PHASES:
+      step = getattr(self, phase)
+      start = timeit.default_timer()
+      value = step(value)
+      times[phase] = timeit.default_timer() - start
+    return value, times
+
+
+def time_phases(func, overload_module, iters):
+  """Converts func iters times, collecting the run times of each phase.
+
+  Returns:
+    Dict[Text, List[float]], the run times of each phase, keyed by phase name.
+    The key 'total' contains the sum over all phases.
+  """
+  all_times = collections.defaultdict(list)
+  for _ in range(iters):
+    _, times = _Pipeline(func, overload_module).run()
+    for phase, t in times.items():
+      all_times[phase].append(t)
+    all_times['total'].append(sum(times.values()))
+  return all_times
+
+
+def scaling_exponent(sizes, times):
+  """Least-squares slope of log(times) against log(sizes).
+
+  A value around 1 indicates linear scaling, around 2 quadratic.
+  """
+  points = [(math.log(s), math.log(t)) for s, t in zip(sizes, times) if t > 0]
+  if len(points) < 2:
+    return None
+  mean_x = sum(x for x, _ in points) / len(points)
+  mean_y = sum(y for _, y in points) / len(points)
+  var_x = sum((x - mean_x)**2 for x, _ in points)
+  if not var_x:
+    return None
+  return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+class ConversionBenchmark(benchmark_base.ReportingBenchmark):
+  """Times the conversion phases as the function size grows."""
+
+  def __init__(self, sizes=None, iters=3, warmup_iters=1):
+    super(ConversionBenchmark, self).__init__(
+        iters=iters, warmup_iters=warmup_iters)
+    if sizes is None:
+      flag = FLAGS['statement_counts']
+      sizes = [int(s) for s in (flag.value if FLAGS.is_parsed() else
+                                flag.default)]
+    self.sizes = sizes
+
+  def _benchmark_shapes(self, prefix, shapes):
+    iters, warmup_iters = self.iters_and_warmup()
+    results = collections.defaultdict(list)
+    for shape in shapes:
+      func = make_function(shape)
+      time_phases(func, py_defaults, warmup_iters)
+      all_times = time_phases(func, py_defaults, iters)
+      for phase in _Pipeline.PHASES + ('total',):
+        result = self.report((prefix, phase, shape.num_statements),
+                             all_times[phase],
+                             warmup_iters=warmup_iters,
+                             iter_volume=shape.num_statements,
+                             iter_unit='statements',
+                             extras=dict(shape._asdict(), phase=phase))
+        results[phase].append(result)
+
+    sizes = [s.num_statements for s in shapes]
+    for phase in _Pipeline.PHASES + ('total',):
+      exponent = scaling_exponent(sizes,
+                                  [r['median'] for r in results[phase]])
+      if exponent is None:
+        continue
+      print('{}_{} scales as n^{:.2f}'.format(prefix, phase, exponent))
+      for result in results[phase]:
+        result['extras']['scaling_exponent'] = exponent
+
+  def benchmark_flat(self):
+    self._benchmark_shapes(
+        'flat', [FunctionShape(n, 0, 0, 0, 0, 10) for n in self.sizes])
+
+  def benchmark_mixed(self):
+    self._benchmark_shapes('mixed', [default_shape(n) for n in self.sizes])
+
+  def benchmark_deep(self):
+    self._benchmark_shapes('deep', [
+        FunctionShape(n, 8, n // 4, n // 8, 0, 10) for n in self.sizes
+    ])
+
+
+if __name__ == '__main__':
+  benchmark_base.main()
@@ -0,0 +1,86 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for conversion_benchmark module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest as test
+import gast
+from pyctr.examples.benchmarks import conversion_benchmark as cb
+from pyctr.overloads import py_defaults
+
+
+class ConversionBenchmarkTest(test.TestCase):
+
+  def _count(self, source, node_types):
+    return sum(
+        isinstance(n, node_types) for n in gast.walk(gast.parse(source)))
+
+  def test_make_source_shape(self):
+    shape = cb.FunctionShape(
+        num_statements=40,
+        depth=2,
+        num_ifs=4,
+        num_loops=2,
+        num_calls=8,
+        num_locals=5)
+    source = cb.make_source('f', shape)
+
+    self.assertEqual(self._count(source, gast.If), 4)
+    self.assertEqual(self._count(source, (gast.For, gast.While)), 2)
+    self.assertEqual(self._count(source, gast.Call), 8 + 1)  # Plus range().
+    # The locals are initialized, then 40 statements, minus the compound ones.
+    self.assertEqual(self._count(source, gast.Assign), 5 + 40 - 6)
+
+  def test_make_source_respects_depth(self):
+    source = cb.make_source('f', cb.FunctionShape(20, 1, 10, 0, 0, 3))
+    module = gast.parse(source)
+    for node in gast.walk(module):
+      if isinstance(node, gast.If):
+        self.assertFalse(
+            any(isinstance(n, gast.If) for n in gast.walk(node) if n is not node))
+
+  def test_make_source_too_many_statements(self):
+    with self.assertRaises(ValueError):
+      cb.make_source('f', cb.FunctionShape(2, 1, 2, 2, 0, 1))
+
+  def test_pipeline(self):
+    func = cb.make_function(cb.FunctionShape(10, 2, 2, 0, 2, 3))
+    converted, times = cb._Pipeline(func, py_defaults).run()
+
+    self.assertEqual(converted(0, 3), func(0, 3))
+    self.assertEqual(converted(0, -3), func(0, -3))
+    self.assertCountEqual(times, cb._Pipeline.PHASES)
+
+  def test_scaling_exponent(self):
+    sizes = [10, 100, 1000]
+    self.assertAlmostEqual(cb.scaling_exponent(sizes, [1, 10, 100]), 1.0)
+    self.assertAlmostEqual(cb.scaling_exponent(sizes, [1, 100, 10000]), 2.0)
+    self.assertIsNone(cb.scaling_exponent([10], [1]))
+
+  def test_benchmark(self):
+    benchmark = cb.ConversionBenchmark(sizes=(5, 10), iters=1, warmup_iters=0)
+    benchmark.run_benchmarks('mixed')
+
+    names = [r['name'] for r in benchmark.results]
+    self.assertIn('mixed_activity_10', names)
+    self.assertIn('mixed_total_5', names)
+    self.assertIn('scaling_exponent', benchmark.results[0]['extras'])
+
+
+if __name__ == '__main__':
+  test.main()
@@ -0,0 +1,115 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark comparing sequential and parallel conversion of many functions."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+import importlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+from pyctr.api import conversion
+from pyctr.examples.benchmarks import benchmark_base
+from pyctr.overloads import py_defaults
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import logical_ops
+from pyctr.transformers.virtualization import variables
+
+TRANSFORMERS = [variables, functions, logical_ops, control_flow]
+
+_FUNCTION_TEMPLATE = '''
+def f_{i}(n, x):
+  total = 0
+  i = 0
+  while i < n:
+    if i % 2 == 0 and x > 0:
+      total = total + abs(x - i)
+    else:
+      total = total - min(i, x)
+    i = i + 1
+  for j in range(n):
+    if not j > x:
+      total = total + j
+  return total
+'''
+
+
+@contextlib.contextmanager
+def synthetic_module(num_functions):
+  """Writes and imports a module with num_functions synthetic functions.
+
+  The module stays importable in the context, e.g. by the workers of
+  convert_many. It is removed on exit.
+
+  Args:
+    num_functions: int
+
+  Yields:
+    List[Callable], the functions of the module.
+  """
+  module_dir = tempfile.mkdtemp()
+  module_name = 'convert_many_benchmark_{}'.format(num_functions)
+  with open(os.path.join(module_dir, module_name + '.py'), 'w') as f:
+    for i in range(num_functions):
+      f.write(_FUNCTION_TEMPLATE.format(i=i))
+  sys.path.insert(0, module_dir)
+  try:
+    module = importlib.import_module(module_name)
+    yield [getattr(module, 'f_{}'.format(i)) for i in range(num_functions)]
+  finally:
+    sys.path.remove(module_dir)
+    sys.modules.pop(module_name, None)
+    shutil.rmtree(module_dir)
+
+
+class ConvertManyBenchmark(benchmark_base.ReportingBenchmark):
+  """Compares sequential and parallel conversion of many functions."""
+
+  def _convert_sequential(self, funcs):
+    # convert memoizes its results, which would make repeated runs free.
+    conversion.clear_cache()
+    return [conversion.convert(f, py_defaults, TRANSFORMERS) for f in funcs]
+
+  def benchmark_convert_many(self):
+    workers = multiprocessing.cpu_count()
+    for num_functions in (10, 100, 1000):
+      with synthetic_module(num_functions) as funcs:
+        extras = {'num_functions': num_functions, 'workers': workers}
+
+        self.time_execution(
+            ('convert', num_functions),
+            lambda: self._convert_sequential(funcs),  # pylint:disable=cell-var-from-loop
+            iters=1,
+            warmup_iters=0,
+            extras=extras)
+        for w in sorted({1, workers}):
+          self.time_execution(
+              ('convert_many', num_functions, w),
+              lambda: conversion.convert_many(  # pylint:disable=cell-var-from-loop
+                  funcs, py_defaults, TRANSFORMERS, workers=w),
+              iters=1,
+              warmup_iters=0,
+              extras=dict(extras, workers=w))
+
+
+if __name__ == '__main__':
+  benchmark_base.main()
@@ -0,0 +1,72 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark for z3 conjunctions and disjunctions over many operands."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from pyctr.examples.benchmarks import benchmark_base
+from pyctr.examples.z3py import z3py
+import z3
+
+# Numbers of operands.
+SIZES = (10, 100, 1000, 10000, 100000)
+
+
+def can_solve(f):
+  s = z3.Solver()
+  s.add(f)
+  return s.check() == z3.sat
+
+
+class LogicalOpsBenchmark(benchmark_base.ReportingBenchmark):
+  """Times building and solving `and` and `or` expressions of k operands.
+
+  The operands are passed as thunks, like in code converted by the
+  logical_ops transformer. Hash-consing is disabled, as it would turn the
+  repeated builds of the same term into lookups.
+  """
+
+  def _benchmark(self, name, op, k):
+    atoms = z3.Bools(' '.join('{}_{}'.format(name, i) for i in range(k)))
+    # Half of the operands are constants which do not determine the result,
+    # and which the overload drops.
+    constant = op is z3py.and_
+    operands = tuple((lambda a=a: a) if i % 2 else (lambda: constant)
+                     for i, a in enumerate(atoms[1:]))
+
+    z3py.HASH_CONSING = False
+    try:
+      expr = op(atoms[0], operands)
+      self.time_execution((name, 'build', k),
+                          lambda: op(atoms[0], operands),
+                          extras={'k': k, 'num_args': expr.num_args()})
+    finally:
+      z3py.HASH_CONSING = True
+    self.time_execution((name, 'solve', k), lambda: can_solve(expr),
+                        extras={'k': k})
+
+  def benchmark_and(self):
+    for k in SIZES:
+      self._benchmark('and', z3py.and_, k)
+
+  def benchmark_or(self):
+    for k in SIZES:
+      self._benchmark('or', z3py.or_, k)
+
+
+if __name__ == '__main__':
+  benchmark_base.main()
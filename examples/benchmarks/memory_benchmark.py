@@ -0,0 +1,332 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark comparing the memory allocated by converted and original code.
+
+Each function is called under tracemalloc, which gives the peak and retained
+memory of each call. A line tracer additionally attributes the memory
+allocated between consecutive line events to the line that was executing, so
+that allocations in the generated code can be mapped back to the original
+lines through the converted function's source map.
+
+  python -m pyctr.examples.benchmarks.memory_benchmark --iters=10
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import linecache
+import sys
+import timeit
+import tracemalloc
+
+from pyctr.api import conversion
+from pyctr.core import origin_info
+from pyctr.examples.benchmarks import benchmark_base
+from pyctr.examples.models import dynamic_rnn_minimal
+from pyctr.examples.models import eight_queens
+from pyctr.examples.z3py import z3py
+from pyctr.overloads import py_defaults
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import logical_ops
+from pyctr.transformers.virtualization import variables
+
+
+class LineStats(object):
+  """Memory allocated while executing a line of code.
+
+  Attributes:
+    hits: int, the number of times the line started executing.
+    bytes: int, the number of bytes allocated.
+    blocks: int, the number of memory blocks allocated.
+    net_bytes: int, bytes allocated minus bytes freed. This can be negative.
+  """
+
+  __slots__ = ('hits', 'bytes', 'blocks', 'net_bytes')
+
+  def __init__(self):
+    self.hits = 0
+    self.bytes = 0
+    self.blocks = 0
+    self.net_bytes = 0
+
+  def add(self, other):
+    self.hits += other.hits
+    self.bytes += other.bytes
+    self.blocks += other.blocks
+    self.net_bytes += other.net_bytes
+
+  def as_dict(self):
+    return {k: getattr(self, k) for k in self.__slots__}
+
+
+class LineAllocations(object):
+  """Context manager attributing memory allocations to lines of code.
+
+  Only code from the given files is traced. Memory allocated by untraced code,
+  e.g. overloads or library functions, is attributed to the traced line which
+  called it. Allocations are measured at line granularity: memory allocated
+  and freed while executing the same line is not counted.
+
+  Example:
+
+    with LineAllocations([f.__code__.co_filename]) as allocations:
+      f()
+    allocations.stats  # Maps (filename, lineno) to LineStats.
+
+  Attributes:
+    stats: Dict[Tuple[Text, int], LineStats]
+  """
+
+  def __init__(self, filenames):
+    self.filenames = frozenset(filenames)
+    self.stats = collections.defaultdict(LineStats)
+    self._location = None
+    self._bytes = 0
+    self._blocks = 0
+    self._started_tracemalloc = False
+
+  def _reset_counters(self):
+    self._bytes = tracemalloc.get_traced_memory()[0]
+    self._blocks = sys.getallocatedblocks()
+
+  def _charge(self):
+    """Attributes the memory allocated since the last event."""
+    allocated_bytes = tracemalloc.get_traced_memory()[0] - self._bytes
+    allocated_blocks = sys.getallocatedblocks() - self._blocks
+    if self._location is not None:
+      stats = self.stats[self._location]
+      stats.net_bytes += allocated_bytes
+      stats.bytes += max(allocated_bytes, 0)
+      stats.blocks += max(allocated_blocks, 0)
+
+  def _caller_location(self, frame):
+    while frame is not None:
+      if frame.f_code.co_filename in self.filenames:
+        return frame.f_code.co_filename, frame.f_lineno
+      frame = frame.f_back
+    return None
+
+  def _trace_call(self, frame, event, arg):
+    del event, arg
+    if frame.f_code.co_filename in self.filenames:
+      return self._trace_line
+    return None
+
+  def _trace_line(self, frame, event, arg):
+    del arg
+    if event == 'line':
+      self._charge()
+      self._location = (frame.f_code.co_filename, frame.f_lineno)
+      self.stats[self._location].hits += 1
+      self._reset_counters()
+    elif event == 'return':
+      self._charge()
+      self._location = self._caller_location(frame.f_back)
+      self._reset_counters()
+    return self._trace_line
+
+  def __enter__(self):
+    if not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self._started_tracemalloc = True
+    self._reset_counters()
+    sys.settrace(self._trace_call)
+    return self
+
+  def __exit__(self, *exc_info):
+    sys.settrace(None)
+    self._charge()
+    self._location = None
+    if self._started_tracemalloc:
+      tracemalloc.stop()
+      self._started_tracemalloc = False
+
+
+def map_to_origin(stats, source_map):
+  """Aggregates line statistics of generated code by original line.
+
+  Args:
+    stats: Dict[Tuple[Text, int], LineStats], see LineAllocations.
+    source_map: Optional[Mapping[origin_info.LineLocation, Any]], the source
+      map of the generated code, see conversion.convert. Lines missing from it
+      are kept as they are.
+
+  Returns:
+    Dict[Tuple[Text, int], LineStats], keyed by original file and line.
+  """
+  result = collections.defaultdict(LineStats)
+  for (filename, lineno), line_stats in stats.items():
+    origin = None
+    if source_map is not None:
+      origin = source_map.get(origin_info.LineLocation(filename, lineno))
+    if origin is not None:
+      key = (origin.loc.filename, origin.loc.lineno)
+    else:
+      key = (filename, lineno)
+    result[key].add(line_stats)
+  return dict(result)
+
+
+MemoryProfile = collections.namedtuple(
+    'MemoryProfile',
+    ('times', 'peak_bytes', 'retained_bytes', 'retained_blocks', 'lines'))
+
+
+def profile_memory(func, args=(), kwargs=None, calls=10):
+  """Measures the memory allocated by calls to a function.
+
+  Args:
+    func: Callable, the function to profile. If it was converted with a source
+      map, its lines are mapped back to the original through its
+      `ag_source_map__` attribute.
+    args: Tuple, the positional arguments to call func with.
+    kwargs: Optional[Dict[Text, Any]], the keyword arguments to call func with.
+    calls: int, the number of calls.
+
+  Returns:
+    MemoryProfile. All fields except `lines` are lists with one element per
+    call; `lines` maps (filename, lineno) to the LineStats summed over all
+    calls.
+  """
+  kwargs = kwargs or {}
+  times = []
+  peak_bytes = []
+  retained_bytes = []
+  retained_blocks = []
+
+  started_tracemalloc = not tracemalloc.is_tracing()
+  if started_tracemalloc:
+    tracemalloc.start()
+  try:
+    for _ in range(calls):
+      # Clearing the traces also resets the peak.
+      tracemalloc.clear_traces()
+      blocks_before = sys.getallocatedblocks()
+      start = timeit.default_timer()
+      result = func(*args, **kwargs)
+      times.append(timeit.default_timer() - start)
+      current, peak = tracemalloc.get_traced_memory()
+      retained_blocks.append(sys.getallocatedblocks() - blocks_before)
+      peak_bytes.append(peak)
+      retained_bytes.append(current)
+      del result
+
+    with LineAllocations([func.__code__.co_filename]) as allocations:
+      for _ in range(calls):
+        func(*args, **kwargs)
+  finally:
+    if started_tracemalloc:
+      tracemalloc.stop()
+
+  lines = map_to_origin(allocations.stats,
+                        getattr(func, 'ag_source_map__', None))
+  return MemoryProfile(times, peak_bytes, retained_bytes, retained_blocks,
+                       lines)
+
+
+def format_line_table(original, converted, calls, limit=20):
+  """Formats a table comparing allocations per call, by original line.
+
+  Args:
+    original: Dict[Tuple[Text, int], LineStats], see MemoryProfile.lines.
+    converted: Dict[Tuple[Text, int], LineStats], see MemoryProfile.lines.
+    calls: int, the number of calls the statistics were collected over.
+    limit: int, the maximum number of lines shown, largest first.
+
+  Returns:
+    Text
+  """
+  empty = LineStats()
+  keys = sorted(
+      set(original) | set(converted),
+      key=lambda k: converted.get(k, empty).bytes,
+      reverse=True)
+  rows = ['{:>6} {:>12} {:>12} {:>10} {:>10}  {}'.format(
+      'line', 'bytes/call', 'conv. b/c', 'blocks/c', 'conv. bl/c', 'source')]
+  for filename, lineno in keys[:limit]:
+    before = original.get((filename, lineno), empty)
+    after = converted.get((filename, lineno), empty)
+    rows.append('{:>6} {:>12.0f} {:>12.0f} {:>10.1f} {:>10.1f}  {}'.format(
+        lineno, before.bytes / calls, after.bytes / calls,
+        before.blocks / calls, after.blocks / calls,
+        linecache.getline(filename, lineno).strip()))
+  return '\n'.join(rows)
+
+
+class MemoryBenchmark(benchmark_base.ReportingBenchmark):
+  """Compares the memory used by converted functions and their originals."""
+
+  def __init__(self, iters=10, warmup_iters=1):
+    super(MemoryBenchmark, self).__init__(
+        iters=iters, warmup_iters=warmup_iters)
+
+  def _compare(self, name, func, overload_module, transformers, args=(),
+               baseline=None):
+    """Profiles func, converted, against baseline, which defaults to func."""
+    iters, warmup_iters = self.iters_and_warmup()
+    converted = conversion.convert(
+        func, overload_module, transformers, source_map=True)
+    profiles = {}
+    for variant, f in (('original', baseline or func),
+                       ('converted', converted)):
+      for _ in range(warmup_iters):
+        f(*args)
+      profile = profile_memory(f, args, calls=iters)
+      profiles[variant] = profile
+      total = LineStats()
+      for line_stats in profile.lines.values():
+        total.add(line_stats)
+      self.report(
+          ('memory', name, variant),
+          profile.times,
+          warmup_iters=warmup_iters,
+          extras={
+              'peak_bytes': benchmark_base.summarize(profile.peak_bytes),
+              'retained_bytes': benchmark_base.summarize(
+                  profile.retained_bytes),
+              'retained_blocks': benchmark_base.summarize(
+                  profile.retained_blocks),
+              'bytes_per_call': total.bytes / iters,
+              'blocks_per_call': total.blocks / iters,
+              'lines': [
+                  dict(stats.as_dict(), filename=filename, lineno=lineno)
+                  for (filename, lineno), stats in sorted(profile.lines.items())
+              ],
+          })
+    print(
+        format_line_table(profiles['original'].lines,
+                          profiles['converted'].lines, iters))
+
+  def benchmark_eight_queens(self):
+    # z3_python only works once converted, so it is compared against the
+    # equivalent implementation using the Z3 API directly.
+    self._compare(
+        'eight_queens',
+        eight_queens.z3_python,
+        z3py, [logical_ops, control_flow],
+        baseline=eight_queens.z3_queens)
+
+  def benchmark_dynamic_rnn_minimal(self):
+    args = dynamic_rnn_minimal.random_inputs_numpy(
+        batch_size=8, max_seq_len=16, input_size=16, hidden_size=32)
+    self._compare('dynamic_rnn_minimal', dynamic_rnn_minimal.numpy,
+                  py_defaults, [variables, functions, control_flow], args)
+
+
+if __name__ == '__main__':
+  benchmark_base.main()
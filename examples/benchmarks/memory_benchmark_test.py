@@ -0,0 +1,80 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for memory_benchmark module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import inspect
+
+from absl.testing import absltest as test
+from pyctr.api import conversion
+from pyctr.examples.benchmarks import memory_benchmark
+from pyctr.overloads import py_defaults
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import variables
+
+
+def allocate(n):
+  small = [0]
+  if n > 0:
+    large = [0] * n
+  else:
+    large = []
+  return small, large
+
+
+class MemoryBenchmarkTest(test.TestCase):
+
+  def _line(self, func, offset):
+    _, first_line = inspect.getsourcelines(func)
+    return func.__code__.co_filename, first_line + offset
+
+  def test_line_allocations(self):
+    with memory_benchmark.LineAllocations(
+        [allocate.__code__.co_filename]) as allocations:
+      allocate(10000)
+
+    large = allocations.stats[self._line(allocate, 3)]
+    self.assertEqual(large.hits, 1)
+    self.assertGreaterEqual(large.bytes, 10000 * 8)
+    self.assertLess(allocations.stats[self._line(allocate, 1)].bytes,
+                    10000 * 8)
+
+  def test_profile_memory_maps_to_origin(self):
+    converted = conversion.convert(allocate, py_defaults,
+                                   [variables, control_flow], source_map=True)
+    profile = memory_benchmark.profile_memory(converted, (10000,), calls=3)
+
+    self.assertLen(profile.times, 3)
+    self.assertLen(profile.peak_bytes, 3)
+    self.assertGreaterEqual(min(profile.peak_bytes), 10000 * 8)
+    large = profile.lines[self._line(allocate, 3)]
+    self.assertEqual(large.hits, 3)
+    # Lists freed on the same line, e.g. by previous calls, offset some bytes.
+    self.assertGreaterEqual(large.bytes, 3 * 10000 * 4)
+    for filename, _ in profile.lines:
+      self.assertEqual(filename, allocate.__code__.co_filename)
+
+  def test_format_line_table(self):
+    original = memory_benchmark.profile_memory(allocate, (100,), calls=2)
+    table = memory_benchmark.format_line_table(original.lines, original.lines,
+                                               2)
+    self.assertIn('large = [0] * n', table)
+
+
+if __name__ == '__main__':
+  test.main()
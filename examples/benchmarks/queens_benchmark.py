@@ -19,14 +19,17 @@ from __future__ import division
 from __future__ import print_function
 
 from pyctr.api import conversion
+from pyctr.examples.benchmarks import benchmark_base
 from pyctr.examples.models import eight_queens
-from pyctr.examples.sysml2019 import benchmark_base
 from pyctr.examples.z3py import z3py
 from pyctr.transformers.virtualization import control_flow
 from pyctr.transformers.virtualization import functions
 from pyctr.transformers.virtualization import logical_ops
 import z3
 
+# Board sizes of the scaled benchmarks.
+SCALED_SIZES = (8, 16, 32, 64)
+
 
 def can_solve(f):
   s = z3.Solver()
@@ -42,7 +45,7 @@ class QueensBenchmark(benchmark_base.ReportingBenchmark):
     self.time_execution('queens_z3', lambda: can_solve(constraints))
 
   def _benchmark_naive_queens(self):
-    converted_fn = conversion.convert(eight_queens.naive, z3py,
+    converted_fn = conversion.convert(eight_queens.z3_python, z3py,
                                       [logical_ops, control_flow])
     constraints = converted_fn()
     self.time_execution('queens_naive', lambda: can_solve(constraints))
@@ -53,6 +56,49 @@ class QueensBenchmark(benchmark_base.ReportingBenchmark):
     constraints = converted_fn()
     self.time_execution('queens_simplified', lambda: can_solve(constraints))
 
+  def benchmark_simplified_construction(self):
+    converted_fn = conversion.convert(eight_queens.simplified, z3py,
+                                      [logical_ops, functions])
+    z3py.call.clear()
+    result = self.time_execution('queens_simplified_construction',
+                                 converted_fn)
+    # Repeated runs build equal terms, so most calls to abs are cached.
+    result['extras']['abs_hit_rate'] = z3py.call.stats(abs).hit_rate
+
+  def _benchmark_scaled_construction(self, name, converted_fn):
+    """Times rebuilding the constraints, with and without hash-consing."""
+    for n in SCALED_SIZES:
+      for hash_consing in (False, True):
+        z3py.HASH_CONSING = hash_consing
+        try:
+          # Keeps the constraints of the previous run alive, like a caller
+          # holding on to them, so that hash-consing can share their terms.
+          live = [converted_fn(n)]
+
+          def build():
+            live[0] = converted_fn(n)  # pylint:disable=cell-var-from-loop
+
+          stats = (z3py.term_stats.hits, z3py.term_stats.misses)
+          result = self.time_execution(
+              (name, n, 'hash_consed' if hash_consing else 'plain'), build)
+          result['extras'].update(
+              n=n,
+              hash_consing=hash_consing,
+              term_hits=z3py.term_stats.hits - stats[0],
+              term_misses=z3py.term_stats.misses - stats[1])
+        finally:
+          z3py.HASH_CONSING = True
+
+  def benchmark_scaled_queens(self):
+    self._benchmark_scaled_construction(
+        'queens_naive_construction',
+        conversion.convert(eight_queens.z3_python, z3py,
+                           [logical_ops, control_flow]))
+    self._benchmark_scaled_construction(
+        'queens_simplified_construction',
+        conversion.convert(eight_queens.simplified, z3py,
+                           [logical_ops, functions]))
+
   def benchmark_queens(self):
     self._benchmark_z3_queens()
     self._benchmark_naive_queens()
@@ -60,4 +106,4 @@ class QueensBenchmark(benchmark_base.ReportingBenchmark):
 
 
 if __name__ == '__main__':
-  QueensBenchmark().benchmark_queens()
+  benchmark_base.main()
@@ -20,8 +20,8 @@ from __future__ import print_function
 
 import numpy as np
 from pyctr.api import conversion
+from pyctr.examples.benchmarks import benchmark_base
 from pyctr.examples.pytorch import pytorch
-from pyctr.examples.sysml2019 import benchmark_base
 from pyctr.transformers.virtualization import control_flow
 from pyctr.transformers.virtualization import functions
 from pyctr.transformers.virtualization import variables
@@ -163,4 +163,4 @@ class RNNBenchmark(benchmark_base.ReportingBenchmark):
 
 
 if __name__ == '__main__':
-  tf.test.main()
+  benchmark_base.main()
@@ -0,0 +1,84 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark comparing virtualized execution with replaying a traced graph."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import timeit
+
+import numpy as np
+from pyctr.api import conversion
+from pyctr.examples.benchmarks import benchmark_base
+from pyctr.overloads import py_defaults
+from pyctr.overloads import tracing
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import variables
+
+TRANSFORMERS = [variables, functions, control_flow]
+
+
+def rnn(inputs, w, u, steps):
+  # The repeated product leaves work for common subexpression elimination.
+  h = np.zeros((inputs.shape[1], u.shape[0]))
+  for t in range(steps):
+    h = np.tanh(np.dot(inputs[t], w) + np.dot(h, u) + np.dot(h, u) * 0)
+  return h
+
+
+class TracingBenchmark(benchmark_base.ReportingBenchmark):
+  """Times the virtualized code against replays of its trace."""
+
+  def __init__(self, steps=20, batch_size=4, units=8, iters=None,
+               warmup_iters=None):
+    super(TracingBenchmark, self).__init__(iters, warmup_iters)
+    self.steps = steps
+    self.batch_size = batch_size
+    self.units = units
+
+  def benchmark_rnn(self):
+    inputs = np.random.randn(self.steps, self.batch_size, self.units)
+    w = np.random.randn(self.units, self.units)
+    u = np.random.randn(self.units, self.units)
+    args = (inputs, w, u, self.steps)
+    extras = {'steps': self.steps}
+
+    virtualized = conversion.convert(rnn, py_defaults, TRANSFORMERS)
+    self.time_execution('rnn_virtualized', lambda: virtualized(*args),
+                        extras=extras)
+
+    traced = conversion.convert(rnn, tracing, TRANSFORMERS)
+    start = timeit.default_timer()
+    graph = tracing.trace(traced, args, static_argnums=(3,))
+    trace_time = timeit.default_timer() - start
+    start = timeit.default_timer()
+    optimized = tracing.optimize(graph)
+    optimize_time = timeit.default_timer() - start
+
+    self.time_execution(
+        'rnn_replay',
+        lambda: graph(*args[:3]),
+        extras=dict(extras, nodes=len(graph), trace_time=trace_time))
+    self.time_execution(
+        'rnn_replay_optimized',
+        lambda: optimized(*args[:3]),
+        extras=dict(extras, nodes=len(optimized),
+                    optimize_time=optimize_time))
+
+
+if __name__ == '__main__':
+  benchmark_base.main()
@@ -0,0 +1,88 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark comparing staged loops with unrolled straight-line code."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+from pyctr.api import conversion
+from pyctr.examples.benchmarks import benchmark_base
+from pyctr.examples.jax import jit
+from pyctr.examples.numpy import numpy_to_jax
+from pyctr.examples.numpy import numpy_to_tf
+from pyctr.examples.tf import trace_cache
+from pyctr.transformers.optimization import unrolling
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import variables
+
+LOOP_TRANSFORMERS = (variables, functions, control_flow)
+UNROLLED_TRANSFORMERS = (unrolling,) + LOOP_TRANSFORMERS
+
+
+def recurrence(x, w):
+  h = x
+  for _ in range(8):
+    h = np.tanh(np.dot(h, w))
+  return h
+
+
+class UnrollingBenchmark(benchmark_base.ReportingBenchmark):
+  """Times a staged for loop over range(8) against its unrolled form."""
+
+  def __init__(self, batch_size=16, units=64, iters=None, warmup_iters=None):
+    super(UnrollingBenchmark, self).__init__(iters, warmup_iters)
+    self.batch_size = batch_size
+    self.units = units
+
+  def _args(self):
+    x = np.random.randn(self.batch_size, self.units).astype(np.float32)
+    w = np.random.randn(self.units, self.units).astype(np.float32)
+    return x, w
+
+  def benchmark_tf(self):
+    args = self._args()
+    for name, transformers in (('loop', LOOP_TRANSFORMERS),
+                               ('unrolled', UNROLLED_TRANSFORMERS)):
+      converted = conversion.convert(recurrence, numpy_to_tf,
+                                     list(transformers))
+      staged = trace_cache.StagedFunction(converted)
+      trace = staged.get_trace(*args)
+      self.time_execution(
+          'tf_' + name,
+          lambda: staged(*args),  # pylint:disable=cell-var-from-loop
+          extras={
+              'ops': len(trace.graph.get_operations()),
+              'trace_time': staged.trace_times[0],
+          })
+      staged.close()
+
+  def benchmark_jax(self):
+    args = self._args()
+    for name, transformers in (('loop', LOOP_TRANSFORMERS),
+                               ('unrolled', UNROLLED_TRANSFORMERS)):
+      jitted = jit.convert_and_jit(
+          recurrence, overload_module=numpy_to_jax, transformers=transformers)
+      jitted(*args)
+      self.time_execution(
+          'jax_' + name,
+          lambda: jitted(*args),  # pylint:disable=cell-var-from-loop
+          extras={'compile_time': jitted.stats()[0]['compile_time']})
+
+
+if __name__ == '__main__':
+  benchmark_base.main()
@@ -0,0 +1,99 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Registers JAX arrays and functions with the batching overloads.
+
+Importing this module lets batching.batch run on JAX arrays. Batched control
+flow inspects its conditions, so it runs eagerly rather than under jax.jit.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from jax import numpy as jnp
+from pyctr.overloads import batching
+
+_ELEMENTWISE = frozenset(
+    id(f) for f in (jnp.abs, jnp.add, jnp.cos, jnp.exp, jnp.log, jnp.maximum,
+                    jnp.minimum, jnp.multiply, jnp.negative, jnp.sin,
+                    jnp.sqrt, jnp.square, jnp.subtract, jnp.tanh, jnp.where,
+                    jnp.zeros_like, jnp.ones_like))
+
+
+class JaxBackend(batching.Backend):
+  """Batching operations implemented with jax.numpy."""
+
+  def asarray(self, x):
+    return jnp.asarray(x)
+
+  def ndim(self, x):
+    return jnp.ndim(x)
+
+  def shape(self, x):
+    return tuple(jnp.shape(x))
+
+  def reshape(self, x, shape):
+    return jnp.reshape(x, shape)
+
+  def broadcast_to(self, x, shape):
+    return jnp.broadcast_to(x, shape)
+
+  def moveaxis(self, x, source, destination):
+    return jnp.moveaxis(x, source, destination)
+
+  def stack(self, values, axis=0):
+    return jnp.stack(values, axis=axis)
+
+  def concatenate(self, values, axis=0):
+    return jnp.concatenate(values, axis=axis)
+
+  def equal(self, x, y):
+    return jnp.equal(x, y)
+
+  def not_equal(self, x, y):
+    return jnp.not_equal(x, y)
+
+  def where(self, cond, x, y):
+    return jnp.where(cond, x, y)
+
+  def to_mask(self, x):
+    return jnp.asarray(x).astype(bool)
+
+  def logical_and(self, x, y):
+    return jnp.logical_and(x, y)
+
+  def logical_not(self, x):
+    return jnp.logical_not(x)
+
+  def any(self, x):
+    return bool(jnp.any(x))
+
+  def all(self, x):
+    return bool(jnp.all(x))
+
+  def matmul(self, x, y):
+    return jnp.matmul(x, y)
+
+  def is_elementwise(self, func):
+    return id(func) in _ELEMENTWISE
+
+
+batching.register_backend(jnp.ndarray, JaxBackend())
+
+for _func in (jnp.sum, jnp.mean, jnp.prod, jnp.amax, jnp.amin, jnp.argmax,
+              jnp.argmin):
+  batching.lift_reduction(_func)
+for _func in (jnp.dot, jnp.matmul):
+  batching.lift_matmul(_func)
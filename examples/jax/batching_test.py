@@ -0,0 +1,64 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the JAX batching backend."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest as test
+import jax.numpy as jnp
+import numpy as np
+from pyctr.examples.jax import batching as jax_batching  # pylint:disable=unused-import
+from pyctr.overloads import batching
+
+
+def collatz_steps(n):
+  steps = 0
+  while n != 1:
+    if n % 2 == 0:
+      n = n // 2
+    else:
+      n = 3 * n + 1
+    steps = steps + 1
+  return steps
+
+
+def with_doubles(x):
+  return np.stack([x, x * 2.])
+
+
+class JaxBatchingTest(test.TestCase):
+
+  def test_while_stmt(self):
+    batched = batching.batch(collatz_steps)
+
+    result = batched(jnp.arange(1, 10))
+
+    self.assertListEqual([int(n) for n in result],
+                         [0, 1, 7, 2, 5, 8, 16, 3, 19])
+
+  def test_stack_uses_jax(self):
+    batched = batching.batch(with_doubles)
+
+    result = batched(jnp.array([[1., 2.], [3., 4.]]))
+
+    self.assertIsInstance(result, jnp.ndarray)
+    self.assertTrue(
+        np.allclose(result, [[[1., 2.], [2., 4.]], [[3., 4.], [6., 8.]]]))
+
+
+if __name__ == '__main__':
+  test.main()
@@ -18,6 +18,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import threading
+
 from jax import lax
 from pyctr.overloads import py_defaults
 from pyctr.overloads import staging
@@ -25,13 +28,80 @@ from pyctr.overloads import staging
 
 init = py_defaults.init
 assign = py_defaults.assign
-read = py_defaults.read
-call = py_defaults.call
+
+
+class _ScanScope(object):
+  """Tracks the list appends made while tracing the body of a scan.
+
+  Lists which the loop body reads from variables it doesn't reassign exist
+  before the loop. Appends to them are recorded as per-iteration outputs of
+  the scan instead of being executed. The lists therefore don't change until
+  the scan completes, so reading a list which the body appends to, other than
+  to append to it, is an error.
+
+  Attributes:
+    local_writes: List[py_defaults.Variable], the variables the loop assigns.
+    lists: Dict[int, list], the lists created before the loop, by id.
+    reads: Dict[int, List[py_defaults.Variable]], the variables each list was
+      read from, once per read.
+    appends: List[Tuple[list, Any]], the recorded appends, in order.
+  """
+
+  def __init__(self, local_writes):
+    self.local_writes = local_writes
+    self.lists = {}
+    self.reads = collections.defaultdict(list)
+    self.appends = []
+
+  def check_reads(self):
+    """Raises if the body read a list it appends to, other than to append."""
+    appends = collections.Counter(id(owner) for owner, _ in self.appends)
+    for list_id, count in appends.items():
+      # Each append reads the list once, to look up its append method.
+      reads = self.reads[list_id]
+      if len(reads) > count:
+        raise ValueError(
+            '{} is appended to in a loop lowered to lax.scan, so it can only be'
+            ' read after the loop'.format(reads[0].name))
+
+
+class _ScanScopes(threading.local):
+
+  def __init__(self):
+    super(_ScanScopes, self).__init__()
+    self.stack = []
+
+
+_scan_scopes = _ScanScopes()
+
+
+def read(var):
+  value = py_defaults.read(var)
+  if _scan_scopes.stack and isinstance(value, list):
+    scope = _scan_scopes.stack[-1]
+    if not any(var is w for w in scope.local_writes):
+      scope.lists[id(value)] = value
+      scope.reads[id(value)].append(var)
+  return value
+
+
+def call(func, args, kwargs):
+  if _scan_scopes.stack:
+    scope = _scan_scopes.stack[-1]
+    owner = getattr(func, '__self__', None)
+    if (isinstance(owner, list) and getattr(func, '__name__', None) == 'append'
+        and id(owner) in scope.lists and len(args) == 1 and not kwargs):
+      scope.appends.append((owner, args[0]))
+      return None
+  return py_defaults.call(func, args, kwargs)
 
 
 def if_stmt(cond, body, orelse, local_writes):
   """Functional form of an if statement.
 
+  Python boolean conditions, like the guards added by the loop_invariants
+  transformer, run the taken branch only, rather than staging a lax.cond.
+
   Args:
     cond: Callable with no arguments, predicate of conditional.
     body: Callable with no arguments, and outputs of the positive (if) branch as
@@ -46,6 +116,8 @@ def if_stmt(cond, body, orelse, local_writes):
   """
 
   cond_result = cond()
+  if isinstance(cond_result, bool):
+    return py_defaults.if_stmt(lambda: cond_result, body, orelse, local_writes)
 
   def if_body(*_):
     modified_vals, _ = staging.execute_isolated(body, local_writes)
@@ -90,13 +162,8 @@ def while_stmt(cond, body, _, local_writes):
   return result_values
 
 
-def for_stmt(target, iter_, body, orelse, modified_vars):
-  """Functional form of a for statement."""
-  del orelse
-
-  modified_vars = [
-      var for var in modified_vars if not py_defaults.is_undefined(var.val)
-  ]
+def _for_stmt_fori(target, iter_, body, modified_vars):
+  """Lowers a for loop to a fori_loop, indexing iter_ on each iteration."""
 
   def for_body(idx, state):
     for var, s in zip(modified_vars, state):
@@ -109,3 +176,62 @@ def for_stmt(target, iter_, body, orelse, modified_vars):
                           [var.val for var in modified_vars])
   for var, val in zip(modified_vars, results):
     var.val = val
+
+
+def _for_stmt_scan(target, iter_, body, modified_vars, local_writes):
+  """Lowers a for loop over the leading axis of an array to a scan.
+
+  Appends to lists which exist before the loop become outputs of the scan.
+  The body may not otherwise read these lists, see _ScanScope. Once the scan
+  completes, the variables through which the body appends to an empty list,
+  once per iteration, are rebound to the stacked outputs. These index like the
+  list would, and need no unstacking, but the list itself is left empty. Other
+  lists are extended with the slices of the outputs.
+  """
+  scope = _ScanScope(local_writes)
+
+  def scan_body(state, x):
+    for var, s in zip(modified_vars, state):
+      var.val = s
+    target.val = x
+    del scope.appends[:]
+    scope.reads.clear()
+    _scan_scopes.stack.append(scope)
+    try:
+      modified_vals, _ = staging.execute_isolated(body, modified_vars)
+    finally:
+      _scan_scopes.stack.pop()
+    scope.check_reads()
+    return modified_vals, tuple(value for _, value in scope.appends)
+
+  results, outputs = lax.scan(scan_body, [var.val for var in modified_vars],
+                              iter_)
+  for var, val in zip(modified_vars, results):
+    var.val = val
+  appended = collections.OrderedDict()
+  for (owner, _), output in zip(scope.appends, outputs):
+    appended.setdefault(id(owner), (owner, []))[1].append(output)
+  for list_id, (owner, list_outputs) in appended.items():
+    if not owner and len(list_outputs) == 1:
+      for var in scope.reads[list_id]:
+        var.val = list_outputs[0]
+    else:
+      for i in range(iter_.shape[0]):
+        owner.extend(output[i] for output in list_outputs)
+
+
+def for_stmt(target, iter_, body, orelse, local_writes):
+  """Functional form of a for statement.
+
+  Loops over arrays are lowered to lax.scan, other loops to lax.fori_loop.
+  """
+  del orelse
+
+  modified_vars = [
+      var for var in local_writes if not py_defaults.is_undefined(var.val)
+  ]
+
+  if getattr(iter_, 'ndim', 0) >= 1:
+    _for_stmt_scan(target, iter_, body, modified_vars, local_writes)
+  else:
+    _for_stmt_fori(target, iter_, body, modified_vars)
@@ -25,6 +25,7 @@ from jax import lax
 from pyctr.api import conversion
 from pyctr.examples.jax import jax as jax_
 from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
 from pyctr.transformers.virtualization import variables
 
 
@@ -289,6 +290,61 @@ class JaxTest(parameterized.TestCase):
     self.assertEqual(jitted(jax.numpy.arange(n)), test_fn(range(n)))
     self.assertEqual(jitted(jax.numpy.arange(n)), test_jax(n))
 
+  def test_for_loop_scan_outputs(self):
+
+    def test_fn(xs):
+      s = 0.
+      outputs = []
+      for x in xs:
+        s = s + x
+        outputs.append(s * 2.)
+      return s, jax.numpy.stack(outputs)
+
+    converted_fn = conversion.convert(test_fn, jax_,
+                                      [variables, functions, control_flow])
+    xs = jax.numpy.arange(4.)
+    expected_sum, expected_outputs = test_fn(list(xs))
+    for fn in (converted_fn, jax.api.jit(converted_fn)):
+      total, outputs = fn(xs)
+      self.assertEqual(float(total), float(expected_sum))
+      self.assertEqual([float(o) for o in outputs],
+                       [float(o) for o in expected_outputs])
+
+  def test_for_loop_scan_outputs_not_unstacked(self):
+
+    def test_fn(xs):
+      outputs = []
+      for x in xs:
+        outputs.append(x * 2.)
+      return outputs
+
+    converted_fn = conversion.convert(test_fn, jax_,
+                                      [variables, functions, control_flow])
+
+    def num_eqns(n):
+      jaxpr = jax.make_jaxpr(converted_fn)(jax.numpy.arange(float(n)))
+      return len(jaxpr.jaxpr.eqns)
+
+    self.assertEqual(num_eqns(4), num_eqns(64))
+    self.assertEqual([float(o) for o in converted_fn(jax.numpy.arange(4.))],
+                     [0., 2., 4., 6.])
+
+  def test_for_loop_scan_reads_appended_list(self):
+
+    def test_fn(xs):
+      sums = [0.]
+      for x in xs:
+        last = sums[-1]
+        sums.append(last + x)
+      return sums
+
+    converted_fn = conversion.convert(test_fn, jax_,
+                                      [variables, functions, control_flow])
+    # The appends only apply once the scan completes, so sums[-1] would be
+    # stale.
+    with self.assertRaisesRegex(ValueError, 'sums'):
+      converted_fn(jax.numpy.arange(4.))
+
 
 if __name__ == '__main__':
   test.main()
@@ -0,0 +1,157 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Converts functions with the JAX overloads and compiles them with jax.jit.
+
+Example:
+
+  jitted = jit.convert_and_jit(f, static_argnums=(1,))
+  jitted(x, 3)  # Traces and compiles.
+  jitted(x + 1, 3)  # Runs the compiled executable.
+  print(jitted.stats())
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import threading
+import timeit
+
+import jax
+import numpy as np
+from pyctr.api import conversion
+from pyctr.examples.jax import jax as jax_
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import variables
+
+DEFAULT_TRANSFORMERS = (variables, control_flow)
+
+
+def _abstract_value(arg):
+  dtype = getattr(arg, 'dtype', None)
+  if dtype is None:
+    dtype = np.asarray(arg).dtype
+  return np.shape(arg), np.dtype(dtype).str
+
+
+def _block_until_ready(outputs):
+  leaves, _ = jax.tree_util.tree_flatten(outputs)
+  for leaf in leaves:
+    if hasattr(leaf, 'block_until_ready'):
+      leaf.block_until_ready()
+  return outputs
+
+
+class JitFunction(object):
+  """Compiles a function with jax.jit, timing compilation and execution.
+
+  jax.jit compiles an executable for each abstract signature: the shapes and
+  dtypes of the arguments, and the values of the static ones. The first call
+  with a new signature traces and compiles the function; its duration is
+  reported as the compile time, and includes that first run. Later calls with
+  the same signature run the cached executable, and count as executions.
+
+  Attributes:
+    fn: the compiled function.
+    static_argnums: Tuple[int, ...], the positions of the arguments which are
+      Python values rather than arrays. Each new value triggers a
+      recompilation.
+    compile_times: Dict[Tuple, float], the compile time of each signature.
+    execute_times: Dict[Tuple, List[float]], the execution times of each
+      signature.
+  """
+
+  def __init__(self, fn, static_argnums=(), backend='cpu'):
+    """Creates a JitFunction.
+
+    Args:
+      fn: Callable
+      static_argnums: Iterable[int], see jax.jit.
+      backend: Optional[Text], the XLA backend to compile for. None uses the
+        default backend.
+    """
+    self.fn = fn
+    self.static_argnums = tuple(static_argnums)
+    self.compile_times = {}
+    self.execute_times = collections.defaultdict(list)
+    jit_kwargs = {'static_argnums': self.static_argnums}
+    if backend is not None:
+      jit_kwargs['backend'] = backend
+    self._jitted = jax.jit(fn, **jit_kwargs)
+    self._lock = threading.Lock()
+
+  def signature(self, args):
+    """Returns the abstract signature of a call with the given arguments."""
+    return tuple(('static', arg) if i in self.static_argnums else
+                 ('array',) + _abstract_value(arg)
+                 for i, arg in enumerate(args))
+
+  @property
+  def compile_count(self):
+    return len(self.compile_times)
+
+  def __call__(self, *args):
+    key = self.signature(args)
+    start = timeit.default_timer()
+    outputs = _block_until_ready(self._jitted(*args))
+    elapsed = timeit.default_timer() - start
+    with self._lock:
+      if key in self.compile_times:
+        self.execute_times[key].append(elapsed)
+      else:
+        self.compile_times[key] = elapsed
+    return outputs
+
+  def stats(self):
+    """Returns the timings of each signature.
+
+    Returns:
+      List[Dict[Text, Any]], with keys 'signature', 'compile_time', 'executions'
+      and 'mean_execute_time', in seconds.
+    """
+    with self._lock:
+      result = []
+      for key, compile_time in self.compile_times.items():
+        times = self.execute_times.get(key, ())
+        result.append({
+            'signature': key,
+            'compile_time': compile_time,
+            'executions': len(times),
+            'mean_execute_time': sum(times) / len(times) if times else None,
+        })
+      return result
+
+
+def convert_and_jit(fn,
+                    overload_module=jax_,
+                    transformers=DEFAULT_TRANSFORMERS,
+                    static_argnums=(),
+                    backend='cpu'):
+  """Converts fn to JAX and compiles it with jax.jit.
+
+  Args:
+    fn: Callable, the function to convert.
+    overload_module: the overloads to convert with, e.g. the JAX overloads or
+      numpy_to_jax.
+    transformers: Iterable, the transformers to convert with.
+    static_argnums: Iterable[int], see JitFunction.
+    backend: Optional[Text], see JitFunction.
+
+  Returns:
+    JitFunction
+  """
+  converted = conversion.convert(fn, overload_module, list(transformers))
+  return JitFunction(converted, static_argnums=static_argnums, backend=backend)
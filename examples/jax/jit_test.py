@@ -0,0 +1,65 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for jit module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest as test
+import jax.numpy as jnp
+from pyctr.examples.jax import jit
+
+
+def repeat_add(x, n):
+  i = 0
+  while i < n:
+    x = x + 1.0
+    i = i + 1
+  return x
+
+
+class JitTest(test.TestCase):
+
+  def test_caches_per_signature(self):
+    jitted = jit.convert_and_jit(repeat_add)
+
+    self.assertEqual(float(jitted(1.0, 3)), 4.0)
+    self.assertEqual(float(jitted(2.0, 5)), 7.0)
+    self.assertEqual(jitted.compile_count, 1)
+    self.assertEqual(float(jitted(jnp.ones(2), 1)[0]), 2.0)
+    self.assertEqual(jitted.compile_count, 2)
+
+  def test_static_argnums(self):
+    jitted = jit.convert_and_jit(repeat_add, static_argnums=(1,))
+
+    self.assertEqual(float(jitted(1.0, 3)), 4.0)
+    self.assertEqual(float(jitted(2.0, 3)), 5.0)
+    self.assertEqual(float(jitted(2.0, 4)), 6.0)
+    self.assertEqual(jitted.compile_count, 2)
+
+  def test_stats(self):
+    jitted = jit.convert_and_jit(repeat_add)
+    for _ in range(3):
+      jitted(1.0, 2)
+
+    stats, = jitted.stats()
+    self.assertEqual(stats['executions'], 2)
+    self.assertGreater(stats['compile_time'], 0)
+    self.assertGreater(stats['mean_execute_time'], 0)
+
+
+if __name__ == '__main__':
+  test.main()
@@ -20,27 +20,41 @@ from __future__ import print_function
 import z3
 
 
-def z3_queens():
-  """Z3 implementation from https://ericpony.github.io/z3py-tutorial/guide-examples.htm."""
-  queens = [z3.Int('Q_%i' % (q + 1)) for q in range(8)]
+def z3_queens(n=8):
+  """Z3 implementation from https://ericpony.github.io/z3py-tutorial/guide-examples.htm.
+
+  Args:
+    n: int, the size of the board.
+
+  Returns:
+    Constraints for the n queens problem.
+  """
+  queens = [z3.Int('Q_%i' % (q + 1)) for q in range(n)]
   single_queen_per_column = [z3.Distinct(queens)]
-  queen_in_column = [z3.And(1 <= queens[i], queens[i] <= 8) for i in range(8)]
+  queen_in_column = [z3.And(1 <= queens[i], queens[i] <= n) for i in range(n)]
   diagonal_constraint = [
       z3.And(queens[i] - queens[j] != i - j, queens[i] - queens[j] != j - i)
-      for i in range(8)
+      for i in range(n)
       for j in range(i)
   ]
 
   return queen_in_column + single_queen_per_column + diagonal_constraint
 
 
-def z3_python():
-  """Implementation of eight queens using idiomatic Python."""
-  queens = [z3.Int('Q_%i' % (q + 1)) for q in range(8)]
+def z3_python(n=8):
+  """Implementation of eight queens using idiomatic Python.
+
+  Args:
+    n: int, the size of the board.
+
+  Returns:
+    Constraints for the n queens problem.
+  """
+  queens = [z3.Int('Q_%i' % (q + 1)) for q in range(n)]
   single_queen_per_column = [z3.Distinct(queens)]
-  queen_in_column = [(1 <= queens[i] and queens[i] <= 8) for i in range(8)]
+  queen_in_column = [(1 <= queens[i] and queens[i] <= n) for i in range(n)]
   diagonal_constraint = []
-  for i in range(8):
+  for i in range(n):
     for j in range(i):
       diagonal_constraint.append((queens[i] - queens[j] != i - j) and
                                  (queens[i] - queens[j] != j - i))
@@ -48,20 +62,23 @@ def z3_python():
   return queen_in_column + single_queen_per_column + diagonal_constraint
 
 
-def simplified():
+def simplified(n=8):
   """Implementation of eight queens which uses abs.
 
   Note: while this appears optimized compared to previous implementations, the
   generated IR is actually more complex due to abs returning a z3.If node.
 
+  Args:
+    n: int, the size of the board.
+
   Returns:
-    Constraints for eight queens problem.
+    Constraints for the n queens problem.
   """
-  queens = [z3.Int('Q_%i' % (q + 1)) for q in range(8)]
+  queens = [z3.Int('Q_%i' % (q + 1)) for q in range(n)]
   single_queen_per_column = [z3.Distinct(queens)]
-  queen_in_column = [(1 <= queens[i] and queens[i] <= 8) for i in range(8)]
+  queen_in_column = [(1 <= queens[i] and queens[i] <= n) for i in range(n)]
   diagonal_constraint = []
-  for i in range(8):
+  for i in range(n):
     for j in range(i):
       diagonal_constraint.append(abs(queens[i] - queens[j]) != abs(i - j))
 
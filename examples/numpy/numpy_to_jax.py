@@ -35,10 +35,10 @@ def read(var):
   assert isinstance(var, py_defaults.Variable)
   if isinstance(var.val, np.ndarray):
     return jnp.array(var.val)
-  return py_defaults.read(var)
+  return jax.read(var)
 
 
-call = staging.RewritingCallOverload(py_defaults.call)
+call = staging.RewritingCallOverload(jax.call)
 
 
 @call.replaces(np.transpose)
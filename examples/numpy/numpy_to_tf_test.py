@@ -23,6 +23,7 @@ from absl.testing import parameterized
 import numpy as np
 from pyctr.api import conversion
 from pyctr.examples.numpy import numpy_to_tf
+from pyctr.transformers.optimization import loop_invariants
 from pyctr.transformers.virtualization import control_flow
 from pyctr.transformers.virtualization import functions
 from pyctr.transformers.virtualization import variables
@@ -56,6 +57,33 @@ class NumPyTest(parameterized.TestCase):
         unconverted_result = test_fn(3)
         self.assertEqual(sess.run(converted_result), unconverted_result)
 
+  def test_loop_invariants_hoisted_from_staged_loops(self):
+
+    def test_fn(n, w):
+      s = np.zeros(())
+      i = np.zeros(())
+      while i < n:
+        s = s + np.amax(w)
+        i = i + 1
+      for _ in range(n):
+        s = s + np.amax(w)
+      return s
+
+    converted_fn = conversion.convert(
+        test_fn, numpy_to_tf,
+        [loop_invariants, variables, control_flow, functions])
+
+    w = np.array([1., 3., 2.])
+    with tf.Graph().as_default() as graph:
+      with tf.Session() as sess:
+        converted_result = sess.run(converted_fn(3, w))
+    self.assertEqual(converted_result, test_fn(3, w))
+    loop_ops = [
+        op for op in graph.get_operations()
+        if op.type == 'Max' and 'while' in op.name
+    ]
+    self.assertEmpty(loop_ops)
+
 
 if __name__ == '__main__':
   test.main()
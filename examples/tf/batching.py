@@ -0,0 +1,113 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Registers TF tensors and functions with the batching overloads.
+
+Importing this module lets batching.batch run on eager tensors. Batched
+control flow inspects its conditions, so it requires eager execution, and
+tensors with static shapes.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+from pyctr.overloads import batching
+import tensorflow as tf
+
+_ELEMENTWISE = frozenset(
+    id(f) for f in (tf.abs, tf.add, tf.cos, tf.exp, tf.log, tf.maximum,
+                    tf.minimum, tf.multiply, tf.negative, tf.sigmoid, tf.sin,
+                    tf.sqrt, tf.square, tf.subtract, tf.tanh, tf.zeros_like,
+                    tf.ones_like))
+
+
+def _broadcast_shape(*shapes):
+  return np.broadcast(*[np.empty(s, dtype=bool) for s in shapes]).shape
+
+
+class TfBackend(batching.Backend):
+  """Batching operations implemented with TF."""
+
+  def asarray(self, x):
+    return tf.convert_to_tensor(x)
+
+  def ndim(self, x):
+    if tf.is_tensor(x):
+      return x.shape.ndims
+    return np.ndim(x)
+
+  def shape(self, x):
+    if tf.is_tensor(x):
+      return tuple(x.shape.as_list())
+    return tuple(np.shape(x))
+
+  def reshape(self, x, shape):
+    return tf.reshape(x, shape)
+
+  def broadcast_to(self, x, shape):
+    return tf.broadcast_to(x, shape)
+
+  def moveaxis(self, x, source, destination):
+    perm = list(range(self.ndim(x)))
+    perm.insert(destination, perm.pop(source))
+    return tf.transpose(x, perm)
+
+  def stack(self, values, axis=0):
+    return tf.stack(values, axis=axis)
+
+  def concatenate(self, values, axis=0):
+    return tf.concat(values, axis)
+
+  def equal(self, x, y):
+    return tf.equal(x, y)
+
+  def not_equal(self, x, y):
+    return tf.not_equal(x, y)
+
+  def where(self, cond, x, y):
+    shape = _broadcast_shape(self.shape(cond), self.shape(x), self.shape(y))
+    return tf.where(
+        tf.broadcast_to(cond, shape), tf.broadcast_to(x, shape),
+        tf.broadcast_to(y, shape))
+
+  def to_mask(self, x):
+    return tf.cast(x, tf.bool)
+
+  def logical_and(self, x, y):
+    return tf.logical_and(x, y)
+
+  def logical_not(self, x):
+    return tf.logical_not(x)
+
+  def any(self, x):
+    return bool(tf.reduce_any(x))
+
+  def all(self, x):
+    return bool(tf.reduce_all(x))
+
+  def matmul(self, x, y):
+    return tf.linalg.matmul(x, y)
+
+  def is_elementwise(self, func):
+    return id(func) in _ELEMENTWISE
+
+
+batching.register_backend((tf.Tensor, tf.Variable), TfBackend())
+
+for _func in (tf.reduce_sum, tf.reduce_mean, tf.reduce_prod, tf.reduce_max,
+              tf.reduce_min, tf.reduce_any, tf.reduce_all):
+  batching.lift_reduction(_func)
+batching.lift_matmul(tf.linalg.matmul)
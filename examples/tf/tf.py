@@ -18,12 +18,27 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import contextlib
+import threading
+
 from pyctr.overloads import py_defaults
+from pyctr.overloads import reductions
 from pyctr.overloads import staging
 
 import tensorflow as tf
 
 
+# Lowerings of if statements on tensor conditions. COND, the default, stages a
+# tf.cond. SELECT runs both branches and merges their outputs with tf.where,
+# which avoids control flow ops, but computes both branches, so it is only
+# correct when they are cheap, free of side effects, and valid whatever the
+# condition.
+COND = 'cond'
+SELECT = 'select'
+
+_lowering = threading.local()
+
+
 init = py_defaults.init
 assign = py_defaults.assign
 read = py_defaults.read
@@ -40,6 +55,9 @@ def range_(r):
     return range(r)
 
 
+reductions.register_reduction_functions(call)
+
+
 def _filter_undefined(all_symbols):
   """Returns the names of undefined symbols contained in all_symbols."""
   undefined_symbols = [
@@ -72,6 +90,67 @@ def _wrap_in_protection_from_undefined(func, branch_name):
   return protected_func
 
 
+class LoweringHint(object):
+  """A condition annotated with the lowering of its if statement.
+
+  Created by lower_as. The hint is transparent outside of converted code, and
+  to non-tensor conditions.
+  """
+
+  __slots__ = ('cond', 'mode')
+
+  def __init__(self, cond, mode):
+    if mode not in (COND, SELECT):
+      raise ValueError('unknown lowering {!r}'.format(mode))
+    self.cond = cond
+    self.mode = mode
+
+  def __bool__(self):
+    return bool(self.cond)
+
+  __nonzero__ = __bool__
+
+
+def lower_as(cond, mode):
+  """Overrides the lowering of the if statement testing cond.
+
+  Example:
+
+    if tf_.lower_as(x > 0, tf_.SELECT):
+      y = x
+    else:
+      y = -x
+
+  Args:
+    cond: the condition of the if statement.
+    mode: Text, one of COND or SELECT.
+
+  Returns:
+    LoweringHint
+  """
+  return LoweringHint(cond, mode)
+
+
+@contextlib.contextmanager
+def default_lowering(mode):
+  """Sets the lowering of the if statements converted in this context.
+
+  Args:
+    mode: Text, one of COND or SELECT.
+
+  Yields:
+    None
+  """
+  if mode not in (COND, SELECT):
+    raise ValueError('unknown lowering {!r}'.format(mode))
+  previous = getattr(_lowering, 'mode', COND)
+  _lowering.mode = mode
+  try:
+    yield
+  finally:
+    _lowering.mode = previous
+
+
 def _tf_if_stmt(cond, body, orelse):
   """Overload of if_stmt that stages a TF cond."""
   protected_body = _wrap_in_protection_from_undefined(body, branch_name='if')
@@ -81,9 +160,70 @@ def _tf_if_stmt(cond, body, orelse):
   return tf.cond(cond, protected_body, protected_orelse)
 
 
+def _check_defined(local_writes, values, branch_name):
+  undefined_symbols = [
+      var.name for var, val in zip(local_writes, values)
+      if py_defaults.is_undefined(val)
+  ]
+  if undefined_symbols:
+    raise ValueError(
+        'The following symbols must also be initialized in the {} branch: {}.'
+        ' Alternatively, you may initialize them before the if'
+        ' statement.'.format(branch_name, undefined_symbols))
+
+
+def _tf_select(cond, x, y):
+  """Returns tf.where(cond, x, y), broadcasting cond, x and y."""
+  if x is y:
+    return x
+  if tf.is_tensor(x):
+    y = tf.convert_to_tensor(y, dtype=x.dtype)
+  else:
+    x = tf.convert_to_tensor(x, dtype=getattr(y, 'dtype', None))
+    y = tf.convert_to_tensor(y, dtype=x.dtype)
+  shape = tf.broadcast_dynamic_shape(tf.shape(x), tf.shape(y))
+  shape = tf.broadcast_dynamic_shape(tf.shape(cond), shape)
+  return tf.where(
+      tf.broadcast_to(cond, shape), tf.broadcast_to(x, shape),
+      tf.broadcast_to(y, shape))
+
+
+def _if_stmt_select(cond, body, orelse, local_writes):
+  body_vals, _ = staging.execute_isolated(body, local_writes)
+  orelse_vals, _ = staging.execute_isolated(orelse, local_writes)
+  _check_defined(local_writes, body_vals, 'if')
+  _check_defined(local_writes, orelse_vals, 'else')
+  return tuple(
+      _tf_select(cond, x, y) for x, y in zip(body_vals, orelse_vals))
+
+
+def _if_stmt_cond(cond, body, orelse, local_writes):
+
+  def if_body(*_):
+    modified_vals, _ = staging.execute_isolated(body, local_writes)
+    return modified_vals
+
+  def if_orelse(*_):
+    modified_vals, _ = staging.execute_isolated(orelse, local_writes)
+    return modified_vals
+
+  results = _tf_if_stmt(cond, if_body, if_orelse)
+  # TF1's tf.cond unpacks single outputs.
+  if len(local_writes) == 1 and not isinstance(results, (list, tuple)):
+    results = [results]
+  return results
+
+
 def if_stmt(cond, body, orelse, local_writes):
   """Functional form of an if statement.
 
+  Tensor conditions are lowered to a tf.cond, or to a select which runs both
+  branches and merges the variables they assign with tf.where. Non-scalar
+  conditions always lower to a select, which is applied elementwise. Scalar
+  conditions follow the lowering requested with lower_as, else the one set
+  with default_lowering, which is COND by default: only the branch which is
+  taken runs, so it may for instance rely on a guard condition.
+
   Args:
     cond: Boolean.
     body: Callable with no arguments, and outputs of the positive (if) branch as
@@ -97,16 +237,17 @@ def if_stmt(cond, body, orelse, local_writes):
     Tuple containing the statement outputs.
   """
   cond_result = cond()
-  if tf.is_tensor(cond_result):
-    def if_body(*_):
-      modified_vals, _ = staging.execute_isolated(body, local_writes)
-      return modified_vals
-
-    def if_orelse(*_):
-      modified_vals, _ = staging.execute_isolated(orelse, local_writes)
-      return modified_vals
+  mode = getattr(_lowering, 'mode', COND)
+  if isinstance(cond_result, LoweringHint):
+    mode = cond_result.mode
+    cond_result = cond_result.cond
 
-    result_values = _tf_if_stmt(cond_result, if_body, if_orelse)
+  if tf.is_tensor(cond_result):
+    # tf.cond requires a scalar condition.
+    if mode == SELECT or cond_result.shape.ndims:
+      result_values = _if_stmt_select(cond_result, body, orelse, local_writes)
+    else:
+      result_values = _if_stmt_cond(cond_result, body, orelse, local_writes)
 
     for var, val in zip(local_writes, result_values):
       var.val = val
@@ -219,3 +360,108 @@ def for_stmt(target, iter_, body, orelse, local_writes):
       var.val = val
   else:
     py_defaults.for_stmt(target, iter_, body, orelse, local_writes)
+
+
+# Reductions of tensors, and how their result combines with the initial value.
+_TENSOR_REDUCTIONS = {
+    'add': (tf.reduce_sum, tf.add),
+    'mul': (tf.reduce_prod, tf.multiply),
+    'max': (tf.reduce_max, tf.maximum),
+    'min': (tf.reduce_min, tf.minimum),
+    'and_': (tf.reduce_all, tf.logical_and),
+    'or_': (tf.reduce_any, tf.logical_or),
+}
+
+
+def _is_tensor_reduction(value, op):
+  if op not in _TENSOR_REDUCTIONS or py_defaults.is_undefined(value):
+    return False
+  if op in ('and_', 'or_'):
+    return tf.convert_to_tensor(value).dtype == tf.bool
+  return True
+
+
+def _contribution(var, op, initial):
+  """Returns the contribution of an iteration to a reduction variable."""
+  partial = var.val
+  if not (isinstance(partial, reductions.Partial) and partial.terms):
+    raise ValueError(
+        'the reduction statements updating {} must run in every iteration of'
+        ' a loop over a tensor'.format(var.name))
+  contribution = reductions.tree_reduce(
+      reductions.OPERATORS[op], [other for _, other, _ in partial.terms])
+  contribution = tf.convert_to_tensor(contribution, dtype=initial.dtype)
+  return tf.broadcast_to(contribution, tf.shape(initial))
+
+
+def reduce_stmt(target, iter_, body, orelse, local_writes, reductions_):
+  """Functional form of a for statement which updates reduction variables.
+
+  Loops over tensors write the contribution of each iteration to the
+  reductions to a TensorArray, in a tf.while_loop which only carries the
+  other variables. The contributions are then reduced at once, for instance
+  with tf.reduce_sum. The VECTORIZE and TREE strategies are equivalent for
+  tensors. Other loops use reductions.reduce_stmt.
+
+  Args:
+    target: pyct.Variable, the loop target.
+    iter_: the iterable.
+    body: Callable with no arguments.
+    orelse: Callable with no arguments.
+    local_writes: Tuple[pyct.Variable, ...], the variables the loop modifies.
+    reductions_: Tuple[Tuple[pyct.Variable, Text], ...], the reduction
+      variables and their operation.
+  """
+  if not tf.is_tensor(iter_):
+    return reductions.reduce_stmt(target, iter_, body, orelse, local_writes,
+                                  reductions_)
+
+  if (reductions.current_strategy() == reductions.SEQUENTIAL or not all(
+      _is_tensor_reduction(var.val, op) for var, op in reductions_)):
+    return for_stmt(target, iter_, body, orelse, local_writes)
+
+  accumulators = [var for var, _ in reductions_]
+  initial = [tf.convert_to_tensor(var.val) for var in accumulators]
+  local_writes = [
+      var for var in local_writes
+      if var not in accumulators and not py_defaults.is_undefined(var.val)
+  ]
+
+  n = _tf_len(iter_)
+  contributions = [
+      tf.TensorArray(init.dtype, size=n, element_shape=init.shape)
+      for init in initial
+  ]
+
+  def for_test(i, *_):
+    return i < n
+
+  def for_body(iterate_index, arrays, *state):  # pylint: disable=missing-docstring
+    for var, s in zip(local_writes, state):
+      var.val = s
+    target.val = iter_[iterate_index]
+    for var in accumulators:
+      var.val = reductions.Partial()
+    mods, _ = staging.execute_isolated(body, local_writes)
+
+    arrays = [
+        array.write(iterate_index, _contribution(var, op, init))
+        for array, init, (var, op) in zip(arrays, initial, reductions_)
+    ]
+    return [iterate_index + 1, arrays] + mods
+
+  try:
+    result_values = _tf_while_stmt(
+        for_test, for_body,
+        [0, contributions] + [var.val for var in local_writes])
+  finally:
+    for var, init in zip(accumulators, initial):
+      var.val = init
+
+  for var, val in zip(local_writes, result_values[2:]):
+    var.val = val
+  for var, init, array, (_, op) in zip(accumulators, initial, result_values[1],
+                                       reductions_):
+    reduce_fn, combine_fn = _TENSOR_REDUCTIONS[op]
+    var.val = combine_fn(init, reduce_fn(array.stack(), axis=0))
+  orelse()
@@ -23,6 +23,7 @@ from absl.testing import parameterized
 from pyctr.api import conversion
 from pyctr.examples.tf import tf as tf_
 from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
 from pyctr.transformers.virtualization import variables
 
 import tensorflow as tf
@@ -258,6 +259,113 @@ class TfTest(parameterized.TestCase):
     converted_fn = self.convert_tf(test_fn)
     self.assertEqualUnconvertedConverted(test_fn, converted_fn, (l,))
 
+  def _staged_op_types(self, converted_fn, *args):
+    with tf.Graph().as_default() as graph:
+      with tf.Session() as sess:
+        result = sess.run(converted_fn(*[tf.constant(x) for x in args]))
+    return result, set(op.type for op in graph.get_operations())
+
+  @parameterized.parameters((-1), (1))
+  def test_if_lowered_to_select(self, n):
+
+    def test_fn(n):
+      a = 0
+      if n > 0:
+        a = n * 2
+      return a
+
+    with tf_.default_lowering(tf_.SELECT):
+      result, op_types = self._staged_op_types(self.convert_tf(test_fn), n)
+
+    self.assertEqual(result, test_fn(n))
+    self.assertIn('Select', op_types)
+    self.assertNotIn('Switch', op_types)
+
+  def test_if_lowering_override(self):
+
+    def test_fn(n):
+      a = 0
+      if tf_.lower_as(n > 0, tf_.SELECT):
+        a = n
+      return a
+
+    result, op_types = self._staged_op_types(self.convert_tf(test_fn), 3)
+
+    self.assertEqual(result, 3)
+    self.assertIn('Select', op_types)
+    self.assertNotIn('Switch', op_types)
+
+    def default_fn(n):
+      a = 0
+      if n > 0:
+        a = n
+      return a
+
+    _, op_types = self._staged_op_types(self.convert_tf(default_fn), 3)
+    self.assertIn('Switch', op_types)
+    self.assertNotIn('Select', op_types)
+
+  def test_if_guard_lowered_to_cond(self):
+
+    def test_fn(x):
+      y = 0.
+      if tf.size(x) > 0:
+        y = x[0]
+      return y
+
+    converted_fn = self.convert_tf(test_fn)
+    with tf.Graph().as_default():
+      x = tf.placeholder(tf.float32, shape=(None,))
+      y = converted_fn(x)
+      with tf.Session() as sess:
+        self.assertEqual(sess.run(y, feed_dict={x: []}), 0.)
+        self.assertEqual(sess.run(y, feed_dict={x: [2.]}), 2.)
+
+  def test_if_elementwise(self):
+
+    def test_fn(x):
+      y = x
+      if x > 0:
+        y = x * 2
+      else:
+        y = -x
+      return y
+
+    result, _ = self._staged_op_types(self.convert_tf(test_fn), [-1, 2, -3])
+
+    self.assertListEqual(list(result), [1, 4, 3])
+
+  def test_for_reductions(self):
+
+    def test_fn(l):
+      s = 0.
+      m = -10.
+      for e in l:
+        s = s + e * e
+        m = max(m, e)
+      return s, m
+
+    converted_fn = self._convert(test_fn, [variables, functions, control_flow])
+    result, op_types = self._staged_op_types(converted_fn, [1., -2., 3.])
+
+    self.assertEqual(tuple(result), test_fn([1., -2., 3.]))
+    self.assertIn('Sum', op_types)
+    self.assertIn('Max', op_types)
+
+  def test_for_conditional_update(self):
+
+    def test_fn(l):
+      s = 0.
+      for e in l:
+        if e > 0:
+          s = s + e
+      return s
+
+    converted_fn = self._convert(test_fn, [variables, functions, control_flow])
+    result, _ = self._staged_op_types(converted_fn, [1., -2., 3.])
+
+    self.assertEqual(result, test_fn([1., -2., 3.]))
+
 
 if __name__ == '__main__':
   test.main()
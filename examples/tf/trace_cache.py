@@ -0,0 +1,161 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Caches the graphs staged by converted functions, keyed by signature.
+
+Calling a function converted with the TF overloads in graph mode runs its
+Python code and stages new ops each time. StagedFunction stages it once per
+input signature, with placeholders for the array arguments, and afterwards
+only runs the staged graph:
+
+  converted = conversion.convert(f, tf_, transformers)
+  staged = trace_cache.StagedFunction(converted)
+  staged(np.ones((2, 3)), 5)  # Traces.
+  staged(np.zeros((2, 3)), 5)  # Runs the cached graph.
+  staged(np.zeros((4, 3)), 5)  # Retraces: new shape.
+
+The signature of a call consists of the dtype and shape of its array
+arguments, and the values of all other arguments, which must be hashable.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import threading
+import timeit
+
+import numpy as np
+import tensorflow as tf
+
+_Trace = collections.namedtuple('_Trace',
+                                ('graph', 'session', 'placeholders', 'outputs'))
+
+
+def _is_array(value):
+  return isinstance(value, (np.ndarray, np.generic))
+
+
+def signature(args):
+  """Returns the cache key of a call with the given arguments.
+
+  Args:
+    args: Sequence, the arguments of the call.
+
+  Returns:
+    Tuple, hashable.
+
+  Raises:
+    TypeError: if an argument is neither an array nor hashable.
+  """
+  key = []
+  for i, arg in enumerate(args):
+    if _is_array(arg):
+      key.append(('array', np.dtype(arg.dtype).str, np.shape(arg)))
+    else:
+      try:
+        hash(arg)
+      except TypeError:
+        raise TypeError(
+            'argument {} must be an array or hashable, got {}'.format(
+                i, type(arg)))
+      key.append(('value', type(arg), arg))
+  return tuple(key)
+
+
+class StagedFunction(object):
+  """Wraps a converted function, staging it once per call signature.
+
+  Each signature gets its own tf.Graph and tf.Session. The function must
+  return tensors, or nested structures of tensors supported by Session.run.
+
+  Attributes:
+    fn: the wrapped function.
+    trace_times: List[float], the time taken by each trace, in seconds.
+  """
+
+  def __init__(self, fn, config=None):
+    """Creates a StagedFunction.
+
+    Args:
+      fn: Callable, a function converted with the TF overloads.
+      config: Optional[tf.ConfigProto], used to create the sessions.
+    """
+    self.fn = fn
+    self.trace_times = []
+    self._config = config
+    self._traces = {}
+    self._lock = threading.Lock()
+
+  @property
+  def trace_count(self):
+    """The number of times the function was traced."""
+    return len(self.trace_times)
+
+  @property
+  def retrace_count(self):
+    """The number of traces after the first, caused by new signatures."""
+    return max(0, self.trace_count - 1)
+
+  def signatures(self):
+    """Returns the signatures traced so far."""
+    return list(self._traces)
+
+  def _trace(self, args):
+    """Stages fn in a new graph, with placeholders for the array arguments."""
+    start = timeit.default_timer()
+    graph = tf.Graph()
+    with graph.as_default():
+      placeholders = []
+      staged_args = []
+      for i, arg in enumerate(args):
+        if _is_array(arg):
+          placeholder = tf.placeholder(
+              tf.as_dtype(arg.dtype),
+              shape=np.shape(arg),
+              name='arg{}'.format(i))
+          placeholders.append(placeholder)
+          staged_args.append(placeholder)
+        else:
+          staged_args.append(arg)
+      outputs = self.fn(*staged_args)
+    session = tf.Session(graph=graph, config=self._config)
+    self.trace_times.append(timeit.default_timer() - start)
+    return _Trace(graph, session, placeholders, outputs)
+
+  def get_trace(self, *args):
+    """Returns the trace for the signature of args, tracing if needed."""
+    key = signature(args)
+    trace = self._traces.get(key)
+    if trace is None:
+      with self._lock:
+        trace = self._traces.get(key)
+        if trace is None:
+          trace = self._trace(args)
+          self._traces[key] = trace
+    return trace
+
+  def __call__(self, *args):
+    trace = self.get_trace(*args)
+    arrays = [arg for arg in args if _is_array(arg)]
+    return trace.session.run(trace.outputs,
+                             feed_dict=dict(zip(trace.placeholders, arrays)))
+
+  def close(self):
+    """Closes the sessions of all traces, and clears the cache."""
+    with self._lock:
+      for trace in self._traces.values():
+        trace.session.close()
+      self._traces.clear()
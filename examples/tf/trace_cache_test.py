@@ -0,0 +1,80 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for trace_cache module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest as test
+import numpy as np
+from pyctr.api import conversion
+from pyctr.examples.tf import tf as tf_
+from pyctr.examples.tf import trace_cache
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import variables
+
+
+def scale_positive(x, factor):
+  y = x
+  if x[0] > 0:
+    y = x * factor
+  return y
+
+
+class TraceCacheTest(test.TestCase):
+
+  def setUp(self):
+    super(TraceCacheTest, self).setUp()
+    converted = conversion.convert(scale_positive, tf_,
+                                   [variables, control_flow])
+    self.staged = trace_cache.StagedFunction(converted)
+
+  def tearDown(self):
+    self.staged.close()
+    super(TraceCacheTest, self).tearDown()
+
+  def test_traces_once_per_signature(self):
+    x = np.array([1, 2], dtype=np.int32)
+
+    self.assertListEqual(list(self.staged(x, 3)), [3, 6])
+    self.assertListEqual(list(self.staged(-x, 3)), [-1, -2])
+    self.assertEqual(self.staged.trace_count, 1)
+    self.assertEqual(self.staged.retrace_count, 0)
+    self.assertLen(self.staged.trace_times, 1)
+
+  def test_retraces_on_new_signature(self):
+    x = np.array([1, 2], dtype=np.int32)
+
+    self.staged(x, 3)
+    self.staged(np.array([1, 2, 3], dtype=np.int32), 3)
+    self.staged(x.astype(np.float32), 3)
+    self.staged(x, 4)
+    self.staged(x, 4)
+
+    self.assertEqual(self.staged.trace_count, 4)
+    self.assertEqual(self.staged.retrace_count, 3)
+    self.assertLen(self.staged.signatures(), 4)
+
+  def test_signature(self):
+    self.assertEqual(
+        trace_cache.signature((np.zeros((2, 3), dtype=np.float32), 1)),
+        (('array', '<f4', (2, 3)), ('value', int, 1)))
+    with self.assertRaises(TypeError):
+      trace_cache.signature(([1, 2],))
+
+
+if __name__ == '__main__':
+  test.main()
@@ -18,32 +18,126 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import operator
+import weakref
+
+from pyctr.overloads import memoization
 from pyctr.overloads import py_defaults
 from pyctr.overloads import staging
 import z3
 
+# Whether the terms built by the overloads are hash-consed.
+HASH_CONSING = True
+
+# The terms built by the overloads, keyed by their operation and the ids of
+# their operands. A term keeps its operands alive, so their ids stay valid
+# while the term is in the table.
+_terms = weakref.WeakValueDictionary()
+
+# Lookups in _terms.
+term_stats = memoization.CacheStats()
+
+
+def _operand_key(x):
+  if isinstance(x, z3.AstRef):
+    return id(x.ctx), x.get_id()
+  return type(x), x
+
+
+def hash_cons(build, *operands):
+  """Returns build(*operands), sharing the terms built from equal operands.
+
+  z3 already shares structurally equal terms internally; this also avoids the
+  API calls and Python objects of rebuilding them, when the converted code
+  builds the same terms repeatedly.
+
+  Args:
+    build: Callable, the function building the term, e.g. z3.And.
+    *operands: the operands of the term; z3 expressions or hashable values.
+
+  Returns:
+    z3.AstRef
+  """
+  if not HASH_CONSING:
+    return build(*operands)
+  key = (build,) + tuple(_operand_key(x) for x in operands)
+  try:
+    term = _terms.get(key)
+  except TypeError:  # Unhashable operands.
+    return build(*operands)
+  if term is not None:
+    term_stats.hits += 1
+    return term
+  term_stats.misses += 1
+  term = build(*operands)
+  _terms[key] = term
+  return term
+
 
 init = py_defaults.init
 assign = py_defaults.assign
 read = py_defaults.read
 
 
-call = staging.RewritingCallOverload(py_defaults.call)
+# Converted code often applies the same functions to equal terms, e.g. abs to
+# the differences of the same variables. Functions registered with
+# call.memoizes, or decorated with memoization.pure, return the same term for
+# equal arguments.
+call = memoization.MemoizingCallOverload(py_defaults.call, max_size=4096)
+call.memoizes(abs)
 
 
 @call.replaces(abs)
 def z3_abs(x):
   if isinstance(x, z3.ArithRef):
-    return z3.If(x < 0, -x, x)
+    return hash_cons(z3.If, hash_cons(operator.lt, x, 0),
+                     hash_cons(operator.neg, x), x)
   else:
     return abs(x)
 
 
+def _logical_op(build, a, b, absorbing):
+  """Evaluates the operands of a logical operator, left to right.
+
+  Args:
+    build: Callable, z3.And or z3.Or.
+    a: the first operand.
+    b: Tuple[Callable[[], Any]], lazy thunks for remaining operands.
+    absorbing: bool, the value of Python operands which determines the
+      result, e.g. False for `and`.
+
+  Returns:
+    A single flat z3 expression over the z3.BoolRef operands, or a Python
+    value when Python operands determine the result.
+  """
+  assert isinstance(b, tuple)
+  terms = []
+  value = a
+  for thunk in b:
+    if isinstance(value, z3.BoolRef):
+      terms.append(value)
+    elif bool(value) == absorbing:
+      return absorbing
+    value = thunk()
+
+  if isinstance(value, z3.BoolRef):
+    terms.append(value)
+  elif not terms:
+    # As in Python, the last operand is the result.
+    return value
+  elif bool(value) == absorbing:
+    return absorbing
+
+  if len(terms) == 1:
+    return terms[0]
+  return hash_cons(build, *terms)
+
+
 def and_(a, b):
   """Overload of `and` which builds z3.And statements.
 
   Eagerly simplifies the expression if any of the operands are Python booleans.
-  Otherwise, a z3.And is generated for z3.BoolRef objects.
+  Otherwise, a single z3.And is generated for all the z3.BoolRef operands.
 
   Args:
     a: Union[bool, z3.BoolRef], first operand of `and`
@@ -53,30 +147,14 @@ def and_(a, b):
   Returns:
     corresponding z3.And expression, or a Python expression if no z3.BoolRefs.
   """
-  assert isinstance(b, tuple)
-  if not b:
-    return a
-  if isinstance(a, z3.BoolRef):
-    return_val = and_(b[0](), b[1:])
-    if isinstance(return_val, z3.BoolRef):
-      return z3.And(a, return_val)
-    else:
-      if return_val:
-        return a
-      else:
-        return False
-  else:
-    if a:
-      return and_(b[0](), b[1:])
-    else:
-      return False
+  return _logical_op(z3.And, a, b, False)
 
 
 def or_(a, b):
   """Overload of `or` which builds z3.Or statements.
 
   Eagerly simplifies the expression if any of the operands are Python booleans.
-  Otherwise, a z3.Or is generated for z3.BoolRef objects.
+  Otherwise, a single z3.Or is generated for all the z3.BoolRef operands.
 
   Args:
     a: Union[bool, z3.BoolRef], first operand of `or`
@@ -86,29 +164,12 @@ def or_(a, b):
   Returns:
     corresponding z3.Or expression, or a Python expression if no z3.BoolRefs.
   """
-  assert isinstance(b, tuple)
-  if not b:
-    return a
-  if isinstance(a, z3.BoolRef):
-    return_val = or_(b[0](), b[1:])
-
-    if isinstance(return_val, z3.BoolRef):
-      return z3.Or(a, return_val)
-    else:
-      if return_val:
-        return True
-      else:
-        return a
-  else:
-    if a:
-      return True
-    else:
-      return or_(b[0](), b[1:])
+  return _logical_op(z3.Or, a, b, True)
 
 
 def not_(x):
   if isinstance(x, z3.BoolRef):
-    return z3.Not(x)
+    return hash_cons(z3.Not, x)
   else:
     return not x
 
@@ -140,6 +201,7 @@ def if_stmt(cond, body, orelse, local_writes):
       # Instead, it expects the results of the body and orelse branches passed
       # as values. As such, each result is the result of the deferred z3.If
       # statement.
-      modified_var.val = z3.If(cond_result, body_result, else_result)
+      modified_var.val = hash_cons(z3.If, cond_result, body_result,
+                                   else_result)
   else:
     py_defaults.if_stmt(lambda: cond_result, body, orelse, local_writes)
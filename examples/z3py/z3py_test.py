@@ -404,6 +404,68 @@ class Z3PyTest(parameterized.TestCase):
     self.assertEqual(can_solve(converted_naive()), can_solve(z3_sudoku()))
     self.assertEqual(can_solve(converted_opt()), can_solve(z3_sudoku()))
 
+  def test_abs_memoized(self):
+
+    def test_fn(x, y):
+      return abs(x - y) + abs(x - y)
+
+    x, y = z3.Ints('x y')
+    converted_fn = conversion.convert(test_fn, z3py, [functions])
+    hits = z3py.call.stats(abs).hits
+
+    result = converted_fn(x, y)
+
+    self.assertEqual(z3py.call.stats(abs).hits, hits + 1)
+    self.assertTrue(result.arg(0).eq(result.arg(1)))
+    self.assertTrue(prove(result >= 0))
+
+  def test_terms_hash_consed(self):
+
+    def test_fn(x, y):
+      return (x > 0 and y > 0) or not x > y
+
+    x, y = z3.Ints('x y')
+    converted_fn = conversion.convert(test_fn, z3py, [logical_ops])
+
+    first = converted_fn(x, y)
+    self.assertIs(converted_fn(x, y), first)
+    conjunction = z3py.and_(x > 0, (lambda: y > 0,))
+    self.assertIs(z3py.and_(x > 0, (lambda: y > 0,)), conjunction)
+    self.assertIsNot(converted_fn(y, x), first)
+
+    z3py.HASH_CONSING = False
+    try:
+      second = converted_fn(x, y)
+    finally:
+      z3py.HASH_CONSING = True
+    self.assertIsNot(second, first)
+    self.assertTrue(second.eq(first))
+
+  def test_flat_logical_ops(self):
+    p, q, r = z3.Bools('p q r')
+    conjunction = z3py.and_(p, (lambda: True, lambda: q, lambda: r))
+    self.assertTrue(z3.is_and(conjunction))
+    self.assertEqual(conjunction.num_args(), 3)
+
+    disjunction = z3py.or_(p, (lambda: False, lambda: q))
+    self.assertTrue(z3.is_or(disjunction))
+    self.assertEqual(disjunction.num_args(), 2)
+
+    evaluated = []
+    self.assertIs(
+        z3py.and_(p, (lambda: False, lambda: evaluated.append(q))), False)
+    self.assertIs(z3py.or_(p, (lambda: 1, lambda: evaluated.append(q))), True)
+    self.assertEmpty(evaluated)
+    self.assertEqual(z3py.and_(1, (lambda: 2,)), 2)
+    self.assertEqual(z3py.or_(0, (lambda: '',)), '')
+
+  def test_many_operands(self):
+    terms = z3.Bools(' '.join('b{}'.format(i) for i in range(5000)))
+    conjunction = z3py.and_(terms[0],
+                            tuple((lambda t=t: t) for t in terms[1:]))
+    self.assertEqual(conjunction.num_args(), 5000)
+    self.assertTrue(can_solve(conjunction))
+
 
 if __name__ == '__main__':
   test.main()
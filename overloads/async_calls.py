@@ -0,0 +1,209 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Overloads which run independent coroutine calls concurrently.
+
+Converts sequential code calling coroutine functions to a coroutine which
+overlaps the calls that do not depend on each other:
+
+  async def lookup(key):
+    ...
+
+  def handler(user_id, item_id):
+    user = lookup(user_id)
+    item = lookup(item_id)
+    return render(user, item)
+
+  converted = async_calls.convert(handler)
+  await converted(1, 2)
+
+call_deferred starts coroutine calls on the event loop, without waiting for
+their result. The variables they are assigned to hold a Pending value, which
+read waits for when the value is used, for instance as an operand or a
+condition. Reads and calls which only pass the value along, to an assignment,
+as the argument of a call or as a returned value, do not wait; see
+transformers/optimization/deferred_reads.py. Other calls, whose value is used
+directly, go through call, which waits for it. Coroutine calls receive their
+Pending arguments once they are done, so chains of calls also run on the
+event loop. Both lookups above run concurrently, and render receives their
+results.
+
+The converted code runs in the default executor of the event loop, and waits
+for values by blocking its thread, while the event loop runs the coroutines.
+Converted functions return once all the coroutine calls they started are
+done, and raise the first error these calls raised.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import asyncio
+import functools
+import inspect
+import sys
+import threading
+
+from concurrent import futures
+from pyctr.api import conversion
+from pyctr.overloads import py_defaults
+from pyctr.transformers.optimization import deferred_reads
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import variables
+
+DEFAULT_TRANSFORMERS = (variables, functions, control_flow, deferred_reads)
+
+_state = threading.local()
+
+
+class Pending(object):
+  """The result of a coroutine call which may not be done.
+
+  Attributes:
+    future: concurrent.futures.Future
+  """
+
+  __slots__ = ('future',)
+
+  def __init__(self, future):
+    self.future = future
+
+  def result(self):
+    return self.future.result()
+
+  def __repr__(self):
+    return 'Pending({!r})'.format(self.future)
+
+
+def _resolve(value):
+  if isinstance(value, Pending):
+    return value.result()
+  return value
+
+
+init = py_defaults.init
+assign = py_defaults.assign
+if_stmt = py_defaults.if_stmt
+while_stmt = py_defaults.while_stmt
+for_stmt = py_defaults.for_stmt
+
+
+def read(var):
+  """Reads the value of var, waiting for it if it is Pending."""
+  return _resolve(py_defaults.read(var))
+
+
+def read_deferred(var):
+  """Reads the value of var, which may be Pending."""
+  return py_defaults.read(var)
+
+
+def _is_coroutine_function(func):
+  while isinstance(func, functools.partial):
+    func = func.func
+  return inspect.iscoroutinefunction(func)
+
+
+async def _resolve_async(value):
+  if isinstance(value, Pending):
+    return await asyncio.wrap_future(value.future)
+  return value
+
+
+async def _call_async(func, args, keywords):
+  args = [await _resolve_async(a) for a in args]
+  keywords = {k: await _resolve_async(v) for k, v in keywords.items()}
+  return await func(*args, **keywords)
+
+
+async def _await(coro):
+  return await coro
+
+
+def _start(coro):
+  future = asyncio.run_coroutine_threadsafe(coro, _state.loop)
+  _state.started.append(future)
+  return Pending(future)
+
+
+def call_deferred(func, args, keywords):
+  """Calls func, starting coroutines on the event loop without waiting."""
+  if getattr(_state, 'loop', None) is None:
+    return py_defaults.call(func, args, keywords)
+
+  if _is_coroutine_function(func):
+    return _start(_call_async(func, args, keywords))
+
+  args = tuple(_resolve(a) for a in args)
+  keywords = {k: _resolve(v) for k, v in keywords.items()}
+  result = py_defaults.call(func, args, keywords)
+  if inspect.isawaitable(result):
+    return _start(_await(result))
+  return result
+
+
+def call(func, args, keywords):
+  """Calls func, waiting for the result of coroutines."""
+  return _resolve(call_deferred(func, args, keywords))
+
+
+def _run(converted, loop, args):
+  """Runs converted in the current thread, starting coroutines on loop."""
+  _state.loop = loop
+  _state.started = started = []
+  try:
+    result = converted(*args)
+    if isinstance(result, tuple):
+      result = tuple(_resolve(r) for r in result)
+    else:
+      result = _resolve(result)
+  except BaseException:
+    # Nothing will read the results of the pending calls.
+    for future in started:
+      future.cancel()
+    raise
+  finally:
+    _state.loop = None
+    _state.started = None
+    # No call outlives the run, whether it succeeded or not.
+    futures.wait(started)
+
+  # Calls whose results were never read still complete before returning.
+  for future in started:
+    future.result()
+  return result
+
+
+def convert(func, transformers=DEFAULT_TRANSFORMERS):
+  """Converts func to a coroutine function running its calls concurrently.
+
+  Args:
+    func: Callable
+    transformers: Iterable, the transformers to convert func with.
+
+  Returns:
+    Callable, an `async def` function taking the positional arguments of
+    func.
+  """
+  converted = conversion.convert(func, sys.modules[__name__],
+                                 list(transformers))
+
+  @functools.wraps(func)
+  async def wrapper(*args):
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        None, functools.partial(_run, converted, loop, args))
+
+  return wrapper
@@ -0,0 +1,182 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for async_calls module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import asyncio
+
+from absl.testing import absltest as test
+from pyctr.overloads import async_calls
+
+log = []
+
+
+async def wait_for(event):
+  await asyncio.wait_for(event.wait(), timeout=5)
+  return 'waited'
+
+
+async def set_event(event):
+  event.set()
+  return 'set'
+
+
+async def double(x):
+  await asyncio.sleep(0)
+  return x * 2
+
+
+async def wait_or_log_cancel(event):
+  try:
+    await wait_for(event)
+  except asyncio.CancelledError:
+    log.append('cancelled')
+    raise
+
+
+async def fail(message):
+  raise ValueError(message)
+
+
+async def lookup_role(user_id):
+  await asyncio.sleep(0)
+  return 'admin' if user_id == 1 else 'user'
+
+
+async def record(x):
+  log.append(x)
+
+
+def raise_error(message):
+  raise ValueError(message)
+
+
+def overlapping(event):
+  # Would never finish if the calls ran sequentially.
+  waited = wait_for(event)
+  was_set = set_event(event)
+  return waited, was_set
+
+
+def chained(x):
+  y = double(x)
+  z = double(y)
+  w = z
+  if w > 10:
+    w = w - 10
+  return y, w
+
+
+def branches(x):
+  y = double(0)
+  if y:
+    x = x + 1
+  z = double(0)
+  while z:
+    x = x + 10
+    z = 0
+  return x
+
+
+def is_admin(user_id):
+  role = 'user'
+  if lookup_role(user_id) == 'admin':
+    role = 'admin'
+  return role
+
+
+def total_price(a, b):
+  return double(a) + double(b)
+
+
+def listed_total(a, b):
+  return sum([double(a), double(b)])
+
+
+def fire_and_forget(xs):
+  for x in xs:
+    record(x)
+  return len(xs)
+
+
+def fails_unread(x):
+  fail('unread')
+  return x
+
+
+def fails_while_pending(event):
+  wait_or_log_cancel(event)
+  raise_error('failed')
+  return 0
+
+
+class AsyncCallsTest(test.TestCase):
+
+  def run_converted(self, f, *args):
+    return asyncio.run(async_calls.convert(f)(*args))
+
+  def test_independent_calls_overlap(self):
+
+    async def run():
+      return await async_calls.convert(overlapping)(asyncio.Event())
+
+    self.assertEqual(asyncio.run(run()), ('waited', 'set'))
+
+  def test_dependent_calls(self):
+    self.assertEqual(self.run_converted(chained, 2), (4, 8))
+    self.assertEqual(self.run_converted(chained, 3), (6, 2))
+
+  def test_control_flow_on_coroutine_results(self):
+    self.assertEqual(self.run_converted(branches, 1), 1)
+
+  def test_coroutine_results_used_directly(self):
+    self.assertEqual(self.run_converted(is_admin, 1), 'admin')
+    self.assertEqual(self.run_converted(is_admin, 2), 'user')
+    self.assertEqual(self.run_converted(total_price, 1, 2), 6)
+    self.assertEqual(self.run_converted(listed_total, 1, 2), 6)
+
+  def test_waits_for_all_calls(self):
+    del log[:]
+    self.assertEqual(self.run_converted(fire_and_forget, [1, 2, 3]), 3)
+    self.assertCountEqual(log, [1, 2, 3])
+
+    with self.assertRaisesRegex(ValueError, 'unread'):
+      self.run_converted(fails_unread, 1)
+
+  def test_cancels_pending_calls_on_error(self):
+
+    async def run():
+      with self.assertRaisesRegex(ValueError, 'failed'):
+        await async_calls.convert(fails_while_pending)(asyncio.Event())
+      # The cancellation may still be in progress.
+      pending = asyncio.all_tasks() - {asyncio.current_task()}
+      if pending:
+        await asyncio.wait(pending, timeout=1)
+      return list(log)
+
+    del log[:]
+    self.assertEqual(asyncio.run(run()), ['cancelled'])
+
+  def test_entry_point_is_coroutine_function(self):
+    converted = async_calls.convert(chained)
+    self.assertTrue(asyncio.iscoroutinefunction(converted))
+    self.assertEqual(converted.__name__, 'chained')
+
+
+if __name__ == '__main__':
+  test.main()
@@ -0,0 +1,738 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Overloads which run a function written for one example on a batch.
+
+Values which differ between examples are wrapped in Batched objects, which
+hold the values of all examples stacked along a leading batch axis. Operators
+and calls on Batched values compute all the examples at once:
+
+  * elementwise operators broadcast the batch axis;
+  * calls are lifted to their batched forms, registered on `call`, or else
+    run once per example;
+  * if statements and conditional expressions on batched conditions run both
+    branches and merge the results with masked selects;
+  * while loops run until the condition is false in all examples, masking out
+    the updates of the examples which are done.
+
+Example:
+
+  batched_fn = batching.batch(f)
+  batched_fn(xs)  # Same as np.stack([f(x) for x in xs]).
+
+The array operations are delegated to a Backend, chosen from the type of the
+batched inputs. NumPy is supported out of the box; other frameworks register
+their Backend with register_backend, and the batched forms of their
+functions with lift_elementwise, lift_reduction or call.replaces.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import operator
+import sys
+
+import numpy as np
+from pyctr.api import conversion
+from pyctr.overloads import py_defaults
+from pyctr.overloads import staging
+from pyctr.transformers.virtualization import conditional_expressions
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import logical_ops
+from pyctr.transformers.virtualization import variables
+
+DEFAULT_TRANSFORMERS = (variables, functions, logical_ops,
+                        conditional_expressions, control_flow)
+
+init = py_defaults.init
+assign = py_defaults.assign
+read = py_defaults.read
+
+
+class BatchingError(Exception):
+  pass
+
+
+class Backend(object):
+  """Array operations used to batch computations, implemented with NumPy.
+
+  Subclasses adapt the operations to other array types. They operate on raw
+  arrays, not Batched values.
+  """
+
+  def asarray(self, x):
+    return np.asarray(x)
+
+  def ndim(self, x):
+    return np.ndim(x)
+
+  def shape(self, x):
+    return tuple(np.shape(x))
+
+  def reshape(self, x, shape):
+    return np.reshape(x, shape)
+
+  def broadcast_to(self, x, shape):
+    return np.broadcast_to(x, shape)
+
+  def moveaxis(self, x, source, destination):
+    return np.moveaxis(x, source, destination)
+
+  def stack(self, values, axis=0):
+    return np.stack(values, axis=axis)
+
+  def concatenate(self, values, axis=0):
+    return np.concatenate(values, axis=axis)
+
+  def equal(self, x, y):
+    return np.equal(x, y)
+
+  def not_equal(self, x, y):
+    return np.not_equal(x, y)
+
+  def where(self, cond, x, y):
+    return np.where(cond, x, y)
+
+  def to_mask(self, x):
+    return np.asarray(x, dtype=bool)
+
+  def logical_and(self, x, y):
+    return np.logical_and(x, y)
+
+  def logical_not(self, x):
+    return np.logical_not(x)
+
+  def any(self, x):
+    return bool(np.any(x))
+
+  def all(self, x):
+    return bool(np.all(x))
+
+  def matmul(self, x, y):
+    return np.matmul(x, y)
+
+  def is_elementwise(self, func):
+    """True if func applies elementwise, broadcasting its arguments."""
+    return isinstance(func, np.ufunc)
+
+
+_backends = []
+_default_backend = Backend()
+
+
+def register_backend(types, backend):
+  """Registers the backend used to batch arrays of the given types.
+
+  Args:
+    types: Union[type, Tuple[type, ...]]
+    backend: Backend
+  """
+  _backends.insert(0, (types, backend))
+
+
+def backend_for(value):
+  for types, backend in _backends:
+    if isinstance(value, types):
+      return backend
+  return _default_backend
+
+
+class Batched(object):
+  """The values of all the examples in a batch, stacked on a leading axis.
+
+  Attributes:
+    value: the stacked values, with a leading batch axis.
+    backend: Backend, operating on value.
+  """
+
+  __slots__ = ('value', 'backend')
+
+  # Makes NumPy defer to the reflected operators of this class.
+  __array_ufunc__ = None
+
+  def __init__(self, value, backend):
+    self.value = value
+    self.backend = backend
+
+  @property
+  def batch_size(self):
+    return self.backend.shape(self.value)[0]
+
+  @property
+  def shape(self):
+    """The shape of each example."""
+    return self.backend.shape(self.value)[1:]
+
+  @property
+  def ndim(self):
+    """The rank of each example."""
+    return self.backend.ndim(self.value) - 1
+
+  @property
+  def dtype(self):
+    return self.value.dtype
+
+  def __repr__(self):
+    return 'Batched({!r})'.format(self.value)
+
+  def __bool__(self):
+    raise BatchingError(
+        'the truth value of a batched value differs between examples; only'
+        ' if statements, loops, conditional expressions and logical operators'
+        ' may depend on it')
+
+  __nonzero__ = __bool__
+
+  def __len__(self):
+    return self.shape[0]
+
+  def __iter__(self):
+    raise BatchingError(
+        'batched values can only be iterated over by converted for loops')
+
+  def __getitem__(self, index):
+    if not isinstance(index, tuple):
+      index = (index,)
+    if any(isinstance(i, Batched) for i in index):
+      raise BatchingError('indices which differ between examples are not'
+                          ' supported')
+    return Batched(self.value[(slice(None),) + index], self.backend)
+
+  def lane(self, i):
+    """Returns the value of the i-th example."""
+    return self.value[i]
+
+
+def _contains_batched(values):
+  """True if values, or the lists and tuples among them, contain a Batched."""
+  for v in values:
+    if isinstance(v, Batched):
+      return True
+    if isinstance(v, (list, tuple)) and _contains_batched(v):
+      return True
+  return False
+
+
+def _first_batched(values):
+  for v in values:
+    if isinstance(v, Batched):
+      return v
+  return None
+
+
+def _align(args):
+  """Returns the raw values of args, broadcastable against each other.
+
+  Batched values get singleton axes after their batch axis, so that the
+  trailing axes of all examples line up with those of the unbatched values.
+
+  Args:
+    args: Sequence[Any], containing at least one Batched value.
+
+  Returns:
+    Tuple[List[Any], Backend]
+  """
+  batched = _first_batched(args)
+  backend = batched.backend
+  rank = max(a.ndim if isinstance(a, Batched) else backend.ndim(a)
+             for a in args)
+  aligned = []
+  for a in args:
+    if isinstance(a, Batched):
+      value = a.value
+      if a.ndim < rank:
+        shape = backend.shape(value)
+        value = backend.reshape(
+            value, shape[:1] + (1,) * (rank - a.ndim) + shape[1:])
+      aligned.append(value)
+    else:
+      aligned.append(a)
+  return aligned, backend
+
+
+def _elementwise(func, args, kwargs=None):
+  kwargs = kwargs or {}
+  if _contains_batched(kwargs.values()):
+    return _call_per_example(func, args, kwargs)
+  aligned, backend = _align(args)
+  return Batched(func(*aligned, **kwargs), backend)
+
+
+def _binary_operator(op):
+
+  def method(self, other):
+    return _elementwise(op, (self, other))
+
+  def reflected(self, other):
+    return _elementwise(op, (other, self))
+
+  return method, reflected
+
+
+def _unary_operator(op):
+
+  def method(self):
+    return Batched(op(self.value), self.backend)
+
+  return method
+
+
+for _name, _op in (('add', operator.add), ('sub', operator.sub),
+                   ('mul', operator.mul), ('truediv', operator.truediv),
+                   ('floordiv', operator.floordiv), ('mod', operator.mod),
+                   ('pow', operator.pow), ('and', operator.and_),
+                   ('or', operator.or_), ('xor', operator.xor)):
+  _method, _reflected = _binary_operator(_op)
+  setattr(Batched, '__{}__'.format(_name), _method)
+  setattr(Batched, '__r{}__'.format(_name), _reflected)
+
+for _name, _op in (('lt', operator.lt), ('le', operator.le),
+                   ('gt', operator.gt), ('ge', operator.ge)):
+  setattr(Batched, '__{}__'.format(_name), _binary_operator(_op)[0])
+
+
+def _equality_operator(name):
+  """Compares elementwise with the backend, as == may compare identities."""
+
+  def method(self, other):
+    return _elementwise(getattr(self.backend, name), (self, other))
+
+  return method
+
+
+Batched.__eq__ = _equality_operator('equal')
+Batched.__ne__ = _equality_operator('not_equal')
+
+for _name, _op in (('neg', operator.neg), ('pos', operator.pos),
+                   ('abs', operator.abs), ('invert', operator.invert)):
+  setattr(Batched, '__{}__'.format(_name), _unary_operator(_op))
+
+Batched.__hash__ = object.__hash__
+
+
+def _select(mask, x, y):
+  """Selects x in the examples where the Batched mask is true, else y."""
+  if x is y:
+    return x
+  return _elementwise(mask.backend.where, (mask, x, y))
+
+
+def _mask(cond):
+  """Returns the truth value of each example of a Batched value."""
+  return Batched(cond.backend.to_mask(cond.value), cond.backend)
+
+
+def if_exp(cond, body, orelse):
+  if not isinstance(cond, Batched):
+    return py_defaults.if_exp(cond, body, orelse)
+  mask = _mask(cond)
+  if cond.backend.all(mask.value):
+    return body()
+  if not cond.backend.any(mask.value):
+    return orelse()
+  return _select(mask, body(), orelse())
+
+
+def if_stmt(cond, body, orelse, local_writes):
+  """Runs both branches of if statements on batched conditions.
+
+  Variables are merged with a masked select, so each example sees the values
+  assigned by its own branch. If the condition agrees in all examples, only
+  that branch runs.
+
+  Args:
+    cond: Callable[[], Any]
+    body: Callable[[], None]
+    orelse: Callable[[], None]
+    local_writes: Tuple[py_defaults.Variable, ...], the variables assigned in
+      either branch.
+  """
+  cond_result = cond()
+  if not isinstance(cond_result, Batched):
+    return py_defaults.if_stmt(lambda: cond_result, body, orelse, local_writes)
+
+  mask = _mask(cond_result)
+  if cond_result.backend.all(mask.value):
+    return body()
+  if not cond_result.backend.any(mask.value):
+    return orelse()
+
+  body_vals, _ = staging.execute_isolated(body, local_writes)
+  orelse_vals, _ = staging.execute_isolated(orelse, local_writes)
+  for var, body_val, orelse_val in zip(local_writes, body_vals, orelse_vals):
+    undefined = (py_defaults.is_undefined(body_val),
+                 py_defaults.is_undefined(orelse_val))
+    if all(undefined):
+      continue
+    if any(undefined):
+      raise BatchingError(
+          '{} must be defined in both branches of a conditional on a batched'
+          ' value'.format(var.name))
+    var.val = _select(mask, body_val, orelse_val)
+
+
+def while_stmt(cond, body, orelse, local_writes):
+  """Runs while loops until the condition is false in all examples.
+
+  Once the condition is false in an example, the loop body keeps running for
+  the others, but the variables of that example are no longer updated.
+  """
+  active = None
+  while True:
+    cond_result = cond()
+    if active is None and not isinstance(cond_result, Batched):
+      if not cond_result:
+        break
+      body()
+      continue
+
+    if isinstance(cond_result, Batched):
+      backend = cond_result.backend
+      mask = _mask(cond_result).value
+      active = mask if active is None else backend.logical_and(active, mask)
+    elif not cond_result:
+      break
+    if not backend.any(active):
+      break
+
+    old_vals = [var.val for var in local_writes]
+    body()
+    if not backend.all(active):
+      active_mask = Batched(active, backend)
+      for var, old_val in zip(local_writes, old_vals):
+        if not py_defaults.is_undefined(old_val):
+          var.val = _select(active_mask, var.val, old_val)
+  orelse()
+
+
+def for_stmt(target, iter_, body, orelse, local_writes):
+  """Runs for loops, iterating batched values along their first example axis."""
+  if not isinstance(iter_, Batched):
+    return py_defaults.for_stmt(target, iter_, body, orelse, local_writes)
+  for i in range(len(iter_)):
+    target.val = iter_[i]
+    body()
+  orelse()
+
+
+def and_(x, operands):
+  for op in operands:
+    if isinstance(x, Batched):
+      x = _select(_mask(x), op(), x)
+    elif not x:
+      return x
+    else:
+      x = op()
+  return x
+
+
+def or_(x, operands):
+  for op in operands:
+    if isinstance(x, Batched):
+      x = _select(_mask(x), x, op())
+    elif x:
+      return x
+    else:
+      x = op()
+  return x
+
+
+def not_(x):
+  if isinstance(x, Batched):
+    return Batched(x.backend.logical_not(_mask(x).value), x.backend)
+  return not x
+
+
+def _call_per_example(func, args, kwargs):
+  """Calls func once per example, and stacks the results."""
+  batched = _first_batched(tuple(args) + tuple(kwargs.values()))
+  backend = batched.backend
+
+  def lane(value, i):
+    return value.lane(i) if isinstance(value, Batched) else value
+
+  results = []
+  for i in range(batched.batch_size):
+    results.append(
+        func(*[lane(a, i) for a in args],
+             **{k: lane(v, i) for k, v in kwargs.items()}))
+  if all(r is None for r in results):
+    return None
+  if isinstance(results[0], tuple):
+    return tuple(
+        Batched(backend.stack(values), backend) for values in zip(*results))
+  return Batched(backend.stack(results), backend)
+
+
+def _call(func, args, kwargs):
+  values = tuple(args) + tuple(kwargs.values())
+  batched = _first_batched(values)
+  if batched is None:
+    return func(*args, **kwargs)
+  if batched.backend.is_elementwise(func):
+    return _elementwise(func, args, kwargs)
+  return _call_per_example(func, args, kwargs)
+
+
+call = staging.RewritingCallOverload(_call)
+
+
+def lift(original):
+  """Decorator registering the batched form of a function.
+
+  The decorated function is called in place of `original` when any argument
+  is batched, or is a list or tuple containing batched values; otherwise
+  original is called as usual.
+
+  Args:
+    original: Callable
+
+  Returns:
+    Callable, the decorator.
+  """
+
+  def decorator(batched_func):
+
+    def replacement(*args, **kwargs):
+      if _contains_batched(tuple(args) + tuple(kwargs.values())):
+        return batched_func(*args, **kwargs)
+      return original(*args, **kwargs)
+
+    call.replaces(original)(replacement)
+    return batched_func
+
+  return decorator
+
+
+def lift_elementwise(func):
+  """Registers func as applying elementwise, broadcasting its arguments."""
+  lift(func)(lambda *args, **kwargs: _elementwise(func, args, kwargs))
+
+
+def _example_axis(axis, x):
+  if axis is None:
+    return None
+  if isinstance(axis, (tuple, list)):
+    return tuple(_example_axis(a, x) for a in axis)
+  return axis + 1 if axis >= 0 else axis
+
+
+def lift_reduction(func, axis_name='axis'):
+  """Registers func as a reduction over the axes in its `axis_name` argument.
+
+  A missing or None axis reduces each example to a scalar.
+
+  Args:
+    func: Callable[..., Any], taking the value to reduce as first argument.
+    axis_name: Text, the name of the argument holding the reduced axes.
+  """
+
+  def batched_reduction(x, *args, **kwargs):
+    if not isinstance(x, Batched) or args:
+      return _call_per_example(func, (x,) + args, kwargs)
+    axis = kwargs.pop(axis_name, None)
+    backend = x.backend
+    value = x.value
+    if axis is None:
+      if kwargs.get('keepdims'):
+        return _call_per_example(func, (x,), dict(kwargs, **{axis_name: None}))
+      value = backend.reshape(value, (x.batch_size, -1))
+      axis = 1
+    else:
+      axis = _example_axis(axis, x)
+    kwargs[axis_name] = axis
+    return Batched(func(value, **kwargs), backend)
+
+  lift(func)(batched_reduction)
+
+
+def lift_matmul(func):
+  """Registers func as a matrix product of two arguments, like np.matmul."""
+
+  def batched_matmul(x, y):
+    backend = _first_batched((x, y)).backend
+    ndims = [v.ndim if isinstance(v, Batched) else backend.ndim(v)
+             for v in (x, y)]
+    if not all(n in (1, 2) for n in ndims):
+      return _call_per_example(func, (x, y), {})
+    x_value = x.value if isinstance(x, Batched) else x
+    y_value = y.value if isinstance(y, Batched) else y
+    # Promote vectors to matrices, so the batch axis broadcasts.
+    if ndims[0] == 1:
+      shape = backend.shape(x_value)
+      x_value = backend.reshape(x_value, shape[:-1] + (1, shape[-1]))
+    if ndims[1] == 1:
+      shape = backend.shape(y_value)
+      y_value = backend.reshape(y_value, shape + (1,))
+    result = backend.matmul(x_value, y_value)
+    shape = backend.shape(result)
+    if ndims[1] == 1:
+      shape = shape[:-1]
+    if ndims[0] == 1:
+      shape = shape[:-2] + shape[-1:] if ndims[1] != 1 else shape[:-1]
+    return Batched(backend.reshape(result, shape), backend)
+
+  lift(func)(batched_matmul)
+
+
+def _lift_numpy():
+  """Registers the batched forms of common NumPy functions."""
+  for func in (abs, np.where, np.clip, np.zeros_like, np.ones_like):
+    lift_elementwise(func)
+  for func in (np.sum, np.mean, np.prod, np.amax, np.amin, np.any, np.all,
+               np.argmax, np.argmin):
+    lift_reduction(func)
+  for func in (np.dot, np.matmul):
+    lift_matmul(func)
+
+  @lift(len)
+  def len_(x):
+    return len(x)
+
+  @lift(max)
+  def max_(*args, **kwargs):
+    if len(args) == 2 and not kwargs:
+      return _elementwise(np.maximum, args)
+    return _call_per_example(max, args, kwargs)
+
+  @lift(min)
+  def min_(*args, **kwargs):
+    if len(args) == 2 and not kwargs:
+      return _elementwise(np.minimum, args)
+    return _call_per_example(min, args, kwargs)
+
+  @lift(range)
+  def range_(*_):
+    raise BatchingError('range arguments can not differ between examples;'
+                        ' use a while loop instead')
+
+  @lift(np.transpose)
+  def transpose(x, axes=None):
+    if not isinstance(x, Batched):
+      return _call_per_example(np.transpose, (x, axes), {})
+    if axes is None:
+      axes = tuple(reversed(range(x.ndim)))
+    return Batched(
+        np.transpose(x.value, (0,) + tuple(_example_axis(a, x) for a in axes)),
+        x.backend)
+
+  @lift(np.reshape)
+  def reshape(x, newshape):
+    if not isinstance(x, Batched):
+      return _call_per_example(np.reshape, (x, newshape), {})
+    if isinstance(newshape, int):
+      newshape = (newshape,)
+    return Batched(
+        x.backend.reshape(x.value, (x.batch_size,) + tuple(newshape)),
+        x.backend)
+
+  def broadcast_all(values):
+    """Returns the raw values, with a batch axis, and their backend."""
+    batched = _first_batched(values)
+    backend = batched.backend
+    result = []
+    for v in values:
+      if isinstance(v, Batched):
+        result.append(v.value)
+      else:
+        v = backend.asarray(v)
+        result.append(
+            backend.broadcast_to(v, (batched.batch_size,) + backend.shape(v)))
+    return result, backend
+
+  @lift(np.concatenate)
+  def concatenate(values, axis=0):
+    values, backend = broadcast_all(values)
+    return Batched(
+        backend.concatenate(values, axis=_example_axis(axis, None)), backend)
+
+  @lift(np.stack)
+  def stack(values, axis=0):
+    values, backend = broadcast_all(values)
+    return Batched(
+        backend.stack(values, axis=_example_axis(axis, None)), backend)
+
+
+_lift_numpy()
+
+
+def _batch_arg(arg, axis, batch_size):
+  if axis is None:
+    return arg
+  backend = backend_for(arg)
+  value = backend.asarray(arg)
+  if axis != 0:
+    value = backend.moveaxis(value, axis, 0)
+  if backend.shape(value)[0] != batch_size:
+    raise ValueError('inconsistent batch sizes: {} and {}'.format(
+        backend.shape(value)[0], batch_size))
+  return Batched(value, backend)
+
+
+def _unbatch_output(value, batch_size, backend):
+  """Returns the stacked values of an output, broadcasting unbatched ones."""
+  if isinstance(value, Batched):
+    return value.value
+  if isinstance(value, (tuple, list)):
+    return type(value)(_unbatch_output(v, batch_size, backend) for v in value)
+  if value is None:
+    return None
+  value = backend.asarray(value)
+  return backend.broadcast_to(value, (batch_size,) + backend.shape(value))
+
+
+def batch(func, in_axes=0, transformers=DEFAULT_TRANSFORMERS):
+  """Converts a function written for one example into a batched function.
+
+  Args:
+    func: Callable, the function to batch.
+    in_axes: Union[int, None, Sequence[Optional[int]]], the batch axis of each
+      argument, or None for arguments shared by all examples. A single value
+      applies to all arguments.
+    transformers: Iterable, the transformers to convert func with.
+
+  Returns:
+    Callable, taking the same arguments as func, and returning its outputs
+    for all the examples, stacked along a leading batch axis.
+  """
+  converted = conversion.convert(func, sys.modules[__name__],
+                                 list(transformers))
+
+  def batched_func(*args):
+    axes = in_axes
+    if not isinstance(axes, (tuple, list)):
+      axes = (axes,) * len(args)
+    if len(axes) != len(args):
+      raise ValueError('in_axes has {} entries, but got {} arguments'.format(
+          len(axes), len(args)))
+    batch_sizes = set()
+    backend = _default_backend
+    for arg, axis in zip(args, axes):
+      if axis is not None:
+        backend = backend_for(arg)
+        batch_sizes.add(backend.shape(backend.asarray(arg))[axis])
+    if len(batch_sizes) != 1:
+      raise ValueError(
+          'expected exactly one batch size, got {}'.format(batch_sizes))
+    batch_size, = batch_sizes
+    batched_args = [
+        _batch_arg(arg, axis, batch_size) for arg, axis in zip(args, axes)
+    ]
+    return _unbatch_output(converted(*batched_args), batch_size, backend)
+
+  batched_func.__name__ = 'batched_' + func.__name__
+  batched_func.__wrapped__ = func
+  return batched_func
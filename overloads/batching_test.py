@@ -0,0 +1,126 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for batching module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest as test
+import numpy as np
+from pyctr.overloads import batching
+
+
+def collatz_steps(n):
+  steps = 0
+  while n != 1:
+    if n % 2 == 0:
+      n = n // 2
+    else:
+      n = 3 * n + 1
+    steps = steps + 1
+  return steps
+
+
+def relu_layer(x, w, b):
+  y = np.dot(x, w) + b
+  z = y if np.sum(y) > 0 else -y
+  return np.maximum(z, 0.), np.sum(z), len(x)
+
+
+def clipped_norm(x, limit):
+  n = np.sqrt(np.sum(x * x))
+  if n > limit and limit > 0:
+    x = x * (limit / n)
+  return x
+
+
+def sum_rows(x):
+  total = 0.
+  for row in x:
+    total = total + np.sum(row)
+  return total
+
+
+def first_positive(x):
+  return sorted(x)[-1]
+
+
+def assert_positive(x):
+  assert x > 0
+  return x
+
+
+def one_sided(x):
+  if x > 0:
+    y = x
+  return x
+
+
+class BatchingTest(test.TestCase):
+
+  def test_while_stmt(self):
+    batched = batching.batch(collatz_steps)
+    ns = np.arange(1, 20)
+
+    self.assertListEqual(
+        list(batched(ns)), [collatz_steps(int(n)) for n in ns])
+
+  def test_in_axes_and_outputs(self):
+    batched = batching.batch(relu_layer, in_axes=(0, None, None))
+    xs = np.random.randn(5, 3)
+    w = np.random.randn(3, 4)
+    b = np.random.randn(4)
+
+    activations, sums, lengths = batched(xs, w, b)
+
+    expected = [relu_layer(x, w, b) for x in xs]
+    self.assertTrue(np.allclose(activations, [e[0] for e in expected]))
+    self.assertTrue(np.allclose(sums, [e[1] for e in expected]))
+    self.assertListEqual(list(lengths), [3] * 5)
+
+  def test_if_stmt_with_logical_ops(self):
+    batched = batching.batch(clipped_norm, in_axes=(0, None))
+    xs = np.random.randn(6, 3) * 3
+
+    self.assertTrue(
+        np.allclose(batched(xs, 2.0),
+                    np.stack([clipped_norm(x, 2.0) for x in xs])))
+
+  def test_for_stmt(self):
+    batched = batching.batch(sum_rows, in_axes=1)
+    xs = np.random.randn(2, 4, 3)
+
+    self.assertTrue(
+        np.allclose(batched(xs), [sum_rows(xs[:, i]) for i in range(4)]))
+
+  def test_call_per_example(self):
+    batched = batching.batch(first_positive)
+    xs = np.array([[3, 1, 2], [0, 5, 4]])
+
+    self.assertListEqual(list(batched(xs)), [3, 5])
+
+  def test_errors(self):
+    with self.assertRaises(batching.BatchingError):
+      batching.batch(assert_positive)(np.arange(1, 3))
+    with self.assertRaises(batching.BatchingError):
+      batching.batch(one_sided)(np.array([-1, 1]))
+    with self.assertRaises(ValueError):
+      batching.batch(relu_layer)(np.ones((2, 3)), np.ones((3, 3, 4)),
+                                 np.ones(4))
+
+
+if __name__ == '__main__':
+  test.main()
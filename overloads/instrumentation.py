@@ -0,0 +1,311 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Overload wrapper which counts and times the virtualized operations.
+
+Example:
+
+  overload = instrumentation.InstrumentedOverload(tf_overload)
+  converted = conversion.convert(f, overload, transformers, source_map=True)
+  converted(x)
+  snapshot = overload.snapshot()
+  snapshot.write_json('hooks.json')
+  snapshot.to_pstats().sort_stats('tottime').print_stats(10)
+
+Timings are inclusive of nested operations: `if_stmt` includes the time spent
+in the reads and assignments of its branches. The own time of each operation
+excludes the time of the operations nested in it.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import json
+import marshal
+import sys
+import threading
+import timeit
+
+from pyctr.api import profiling
+
+HOOKS = ('init', 'assign', 'read', 'call', 'if_stmt', 'while_stmt', 'for_stmt',
+         'reduce_stmt', 'if_exp', 'and_', 'or_', 'not_')
+
+
+class HookStats(object):
+  """Statistics of a hook, optionally restricted to one line of code.
+
+  Attributes:
+    calls: int, the number of calls.
+    sampled_calls: int, the number of calls which were timed.
+    primitive_calls: int, the number of timed calls which were not nested in a
+      call to the same hook from the same line.
+    total_time: float, the time spent in timed calls, in seconds. Recursive
+      calls are only counted once.
+    own_time: float, total_time minus the time spent in nested operations.
+  """
+
+  __slots__ = ('calls', 'sampled_calls', 'primitive_calls', 'total_time',
+               'own_time')
+
+  def __init__(self):
+    self.calls = 0
+    self.sampled_calls = 0
+    self.primitive_calls = 0
+    self.total_time = 0.0
+    self.own_time = 0.0
+
+  def add(self, other):
+    self.calls += other.calls
+    self.sampled_calls += other.sampled_calls
+    self.primitive_calls += other.primitive_calls
+    self.total_time += other.total_time
+    self.own_time += other.own_time
+
+  def estimated_time(self, own=False):
+    """Extrapolates the time of the timed calls to all calls."""
+    t = self.own_time if own else self.total_time
+    if not self.sampled_calls:
+      return 0.0
+    return t * self.calls / self.sampled_calls
+
+  def as_dict(self):
+    d = {k: getattr(self, k) for k in self.__slots__}
+    d['estimated_total_time'] = self.estimated_time()
+    d['estimated_own_time'] = self.estimated_time(own=True)
+    return d
+
+
+class _Frame(object):
+  """An active timed call."""
+
+  __slots__ = ('key', 'child_time', 'is_primitive')
+
+  def __init__(self, key, is_primitive):
+    self.key = key
+    self.child_time = 0.0
+    self.is_primitive = is_primitive
+
+
+class _ThreadState(threading.local):
+
+  def __init__(self):
+    super(_ThreadState, self).__init__()
+    self.stack = []
+    self.active = collections.Counter()
+
+
+class InstrumentedOverload(object):
+  """Wraps an overload module, recording statistics about its hooks.
+
+  Instances can be used anywhere an overload module is expected. The hooks
+  listed in HOOKS are wrapped if the module defines them; all other attributes
+  are forwarded to the module unchanged.
+
+  Every call is counted. In sampling mode, only one call in `sample_every` is
+  timed and attributed to the line of code that made it, which makes the
+  instrumentation much cheaper; the snapshot extrapolates the timings to all
+  calls.
+
+  Attributes:
+    module: the wrapped overload module.
+    sample_every: int, the sampling period. 1 times every call.
+  """
+
+  def __init__(self, module, sample_every=1, hooks=HOOKS,
+               clock=timeit.default_timer):
+    if sample_every < 1:
+      raise ValueError('sample_every must be positive, got {}'.format(
+          sample_every))
+    self.module = module
+    self.sample_every = sample_every
+    self._clock = clock
+    self._lock = threading.Lock()
+    self._thread_state = _ThreadState()
+    self._calls = {}
+    # Maps (hook, code object, lineno) to HookStats.
+    self._line_stats = collections.defaultdict(HookStats)
+    for hook in hooks:
+      if hasattr(module, hook):
+        self._calls[hook] = [0]
+        setattr(self, hook, self._wrap(hook, getattr(module, hook)))
+
+  def __getattr__(self, name):
+    # Only called for attributes not found on the instance, i.e. anything but
+    # the wrapped hooks.
+    if name == 'module':
+      raise AttributeError(name)
+    return getattr(self.module, name)
+
+  def __repr__(self):
+    return '<InstrumentedOverload of {}>'.format(self.module)
+
+  def _wrap(self, hook, fn):
+    """Returns a function recording the calls to fn."""
+    calls = self._calls[hook]
+    sample_every = self.sample_every
+    clock = self._clock
+    line_stats = self._line_stats
+    thread_state = self._thread_state
+    lock = self._lock
+
+    def instrumented(*args, **kwargs):
+      # The hooks may be called from several threads.
+      with lock:
+        calls[0] += 1
+        count = calls[0]
+      if count % sample_every:
+        return fn(*args, **kwargs)
+
+      caller = sys._getframe(1)  # pylint:disable=protected-access
+      key = (hook, caller.f_code, caller.f_lineno)
+      stack = thread_state.stack
+      active = thread_state.active
+      frame = _Frame(key, not active[key])
+      active[key] += 1
+      stack.append(frame)
+      start = clock()
+      try:
+        return fn(*args, **kwargs)
+      finally:
+        elapsed = clock() - start
+        stack.pop()
+        active[key] -= 1
+        if stack:
+          stack[-1].child_time += elapsed
+        with lock:
+          stats = line_stats[key]
+          stats.sampled_calls += 1
+          stats.own_time += elapsed - frame.child_time
+          if frame.is_primitive:
+            stats.primitive_calls += 1
+            stats.total_time += elapsed
+
+    instrumented.__name__ = getattr(fn, '__name__', hook)
+    instrumented.__doc__ = getattr(fn, '__doc__', None)
+    instrumented.__wrapped__ = fn
+    return instrumented
+
+  def reset(self):
+    """Discards all the statistics recorded so far."""
+    with self._lock:
+      for calls in self._calls.values():
+        calls[0] = 0
+      self._line_stats.clear()
+
+  def snapshot(self):
+    """Returns a Snapshot of the statistics recorded so far."""
+    with self._lock:
+      calls = {hook: c[0] for hook, c in self._calls.items()}
+      line_stats = []
+      for (hook, code, lineno), stats in self._line_stats.items():
+        copy = HookStats()
+        copy.add(stats)
+        line_stats.append((hook, code.co_filename, lineno, code.co_name, copy))
+    return Snapshot(calls, line_stats, self.sample_every)
+
+
+class Snapshot(object):
+  """Statistics recorded by an InstrumentedOverload.
+
+  Attributes:
+    hooks: Dict[Text, HookStats], the statistics of each hook.
+    lines: Dict[Tuple[Text, Text, int, Text], HookStats], the statistics of
+      each hook by the line of code which called it, keyed by hook name, file,
+      line number and function name. Lines of converted code are mapped back to
+      the original code where a source map is available, see
+      conversion.convert.
+    sample_every: int, see InstrumentedOverload.
+  """
+
+  def __init__(self, calls, line_stats, sample_every):
+    self.sample_every = sample_every
+    self.hooks = {}
+    for hook, count in calls.items():
+      self.hooks[hook] = HookStats()
+      self.hooks[hook].calls = count
+
+    self.lines = collections.defaultdict(HookStats)
+    for hook, filename, lineno, function_name, stats in line_stats:
+      filename, lineno, function_name = profiling.fold_frame(
+          filename, lineno, function_name)
+      self.lines[(hook, filename, lineno, function_name)].add(stats)
+
+      hook_stats = self.hooks[hook]
+      hook_stats.sampled_calls += stats.sampled_calls
+      hook_stats.primitive_calls += stats.primitive_calls
+      hook_stats.total_time += stats.total_time
+      hook_stats.own_time += stats.own_time
+    self.lines = dict(self.lines)
+
+    # Calls are only counted per line when they are sampled, so extrapolate.
+    for (hook, _, _, _), stats in self.lines.items():
+      hook_stats = self.hooks[hook]
+      if hook_stats.sampled_calls:
+        stats.calls = int(
+            round(hook_stats.calls * stats.sampled_calls /
+                  hook_stats.sampled_calls))
+
+  def to_json(self):
+    """Returns the statistics as a JSON-serializable dict."""
+    return {
+        'sample_every': self.sample_every,
+        'hooks': {
+            hook: stats.as_dict() for hook, stats in sorted(self.hooks.items())
+        },
+        'lines': [
+            dict(
+                stats.as_dict(),
+                hook=hook,
+                filename=filename,
+                lineno=lineno,
+                function=function_name)
+            for (hook, filename, lineno, function_name), stats in sorted(
+                self.lines.items())
+        ],
+    }
+
+  def write_json(self, path):
+    with open(path, 'w') as f:
+      json.dump(self.to_json(), f, indent=2, sort_keys=True)
+
+  def _pstats_dict(self):
+    """Converts the line statistics to the format used by the profile module.
+
+    Each (line, hook) pair appears as a function named after the hook, at the
+    location of the line, e.g. `model.py:12(if_stmt)`. Timings are
+    extrapolated to all calls.
+    """
+    stats = {}
+    for (hook, filename, lineno, _), line_stats in self.lines.items():
+      scale = 1.0
+      if line_stats.sampled_calls:
+        scale = line_stats.calls / line_stats.sampled_calls
+      primitive_calls = int(round(line_stats.primitive_calls * scale))
+      stats[(filename, lineno, hook)] = (primitive_calls, line_stats.calls,
+                                         line_stats.own_time * scale,
+                                         line_stats.total_time * scale, {})
+    return stats
+
+  def to_pstats(self):
+    """Returns the statistics as a pstats.Stats object."""
+    return profiling.stats_from_dict(self._pstats_dict())
+
+  def dump_stats(self, path):
+    """Writes the statistics to a file readable by pstats and its tools."""
+    with open(path, 'wb') as f:
+      marshal.dump(self._pstats_dict(), f)
+
@@ -0,0 +1,215 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for instrumentation module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import inspect
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+
+from absl.testing import absltest as test
+from pyctr.api import conversion
+from pyctr.overloads import instrumentation
+from pyctr.overloads import py_defaults
+from pyctr.overloads import reductions
+from pyctr.overloads.testing import reverse_conditional_logic as rev_cond
+from pyctr.transformers.virtualization import conditional_expressions
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import variables
+
+TRANSFORMERS = [variables, functions, control_flow]
+
+
+def count_up(n):
+  i = 0
+  total = 0
+  while i < n:
+    if i % 2 == 0:
+      total = total + abs(i)
+    i = i + 1
+  return total
+
+
+def sum_abs(xs):
+  total = 0
+  for x in xs:
+    total = total + (x if x > 0 else -x)
+  return total
+
+
+class FakeClock(object):
+
+  def __init__(self):
+    self.time = 0.0
+
+  def __call__(self):
+    self.time += 1.0
+    return self.time
+
+
+class InstrumentationTest(test.TestCase):
+
+  def _line(self, offset):
+    _, first_line = inspect.getsourcelines(count_up)
+    return first_line + offset
+
+  def test_forwards_attributes(self):
+    overload = instrumentation.InstrumentedOverload(py_defaults)
+    self.assertIs(overload.Variable, py_defaults.Variable)
+    self.assertIsNot(overload.read, py_defaults.read)
+    self.assertIs(overload.read.__wrapped__, py_defaults.read)
+
+    overload = instrumentation.InstrumentedOverload(rev_cond)
+    self.assertTrue(hasattr(overload, 'if_stmt'))
+    self.assertFalse(hasattr(overload, 'read'))
+
+  def test_counts_hooks(self):
+    overload = instrumentation.InstrumentedOverload(py_defaults)
+    converted = conversion.convert(count_up, overload, TRANSFORMERS)
+    self.assertEqual(converted(4), count_up(4))
+
+    hooks = overload.snapshot().hooks
+    self.assertEqual(hooks['while_stmt'].calls, 1)
+    self.assertEqual(hooks['if_stmt'].calls, 4)
+    self.assertEqual(hooks['call'].calls, 2)
+    self.assertEqual(hooks['call'].sampled_calls, 2)
+    self.assertEqual(hooks['for_stmt'].calls, 0)
+
+  def test_counts_reductions_and_conditional_expressions(self):
+    overload = instrumentation.InstrumentedOverload(reductions)
+    converted = conversion.convert(
+        sum_abs, overload,
+        [conditional_expressions, variables, functions, control_flow])
+    self.assertEqual(converted([1, -2, 3]), sum_abs([1, -2, 3]))
+
+    hooks = overload.snapshot().hooks
+    self.assertEqual(hooks['reduce_stmt'].calls, 1)
+    self.assertEqual(hooks['for_stmt'].calls, 0)
+
+    overload = instrumentation.InstrumentedOverload(py_defaults)
+    converted = conversion.convert(
+        sum_abs, overload,
+        [conditional_expressions, variables, functions, control_flow])
+    self.assertEqual(converted([1, -2, 3]), sum_abs([1, -2, 3]))
+    self.assertEqual(overload.snapshot().hooks['if_exp'].calls, 3)
+
+  def test_lines_map_to_origin(self):
+    overload = instrumentation.InstrumentedOverload(py_defaults)
+    converted = conversion.convert(
+        count_up, overload, TRANSFORMERS, source_map=True)
+    converted(4)
+
+    lines = overload.snapshot().lines
+    filename = count_up.__code__.co_filename
+    self.assertEqual(lines[('if_stmt', filename, self._line(4),
+                            'count_up')].calls, 4)
+    self.assertEqual(lines[('call', filename, self._line(5), 'count_up')].calls,
+                     2)
+    for _, line_filename, _, _ in lines:
+      self.assertEqual(line_filename, filename)
+
+  def test_own_time(self):
+    clock = FakeClock()
+    overload = instrumentation.InstrumentedOverload(
+        py_defaults, hooks=('if_stmt', 'call'), clock=clock)
+    converted = conversion.convert(count_up, overload, TRANSFORMERS)
+    converted(1)
+
+    hooks = overload.snapshot().hooks
+    # The clock ticks once per reading: the call is timed 1s, and the if
+    # statement 3s, including the call.
+    self.assertEqual(hooks['call'].total_time, 1.0)
+    self.assertEqual(hooks['if_stmt'].total_time, 3.0)
+    self.assertEqual(hooks['if_stmt'].own_time, 2.0)
+
+  def test_sampling(self):
+    overload = instrumentation.InstrumentedOverload(py_defaults, sample_every=3)
+    converted = conversion.convert(count_up, overload, TRANSFORMERS)
+    converted(9)
+
+    hooks = overload.snapshot().hooks
+    self.assertEqual(hooks['if_stmt'].calls, 9)
+    self.assertEqual(hooks['if_stmt'].sampled_calls, 3)
+
+  def test_counts_calls_from_threads(self):
+    overload = instrumentation.InstrumentedOverload(
+        py_defaults, sample_every=10**6)
+
+    def init_variables():
+      for _ in range(20000):
+        overload.init('x')
+
+    threads = [threading.Thread(target=init_variables) for _ in range(4)]
+    interval = sys.getswitchinterval()
+    # Switches threads often, so that unsynchronized updates would be lost.
+    sys.setswitchinterval(1e-6)
+    try:
+      for t in threads:
+        t.start()
+      for t in threads:
+        t.join()
+    finally:
+      sys.setswitchinterval(interval)
+
+    self.assertEqual(overload.snapshot().hooks['init'].calls, 80000)
+
+  def test_reset(self):
+    overload = instrumentation.InstrumentedOverload(py_defaults)
+    converted = conversion.convert(count_up, overload, TRANSFORMERS)
+    converted(2)
+    overload.reset()
+
+    snapshot = overload.snapshot()
+    self.assertEqual(snapshot.hooks['if_stmt'].calls, 0)
+    self.assertEmpty(snapshot.lines)
+
+  def test_output_formats(self):
+    overload = instrumentation.InstrumentedOverload(py_defaults)
+    converted = conversion.convert(
+        count_up, overload, TRANSFORMERS, source_map=True)
+    converted(4)
+    snapshot = overload.snapshot()
+
+    output_dir = tempfile.mkdtemp()
+    json_path = os.path.join(output_dir, 'stats.json')
+    snapshot.write_json(json_path)
+    with open(json_path) as f:
+      report = json.load(f)
+    self.assertEqual(report['hooks']['if_stmt']['calls'], 4)
+    self.assertIn(self._line(4), [l['lineno'] for l in report['lines']])
+
+    stats_path = os.path.join(output_dir, 'stats.prof')
+    snapshot.dump_stats(stats_path)
+    for stats in (pstats.Stats(stats_path), snapshot.to_pstats()):
+      key = (count_up.__code__.co_filename, self._line(4), 'if_stmt')
+      primitive_calls, calls, _, _, _ = stats.stats[key]
+      self.assertEqual(primitive_calls, 4)
+      self.assertEqual(calls, 4)
+
+  def test_invalid_sampling(self):
+    with self.assertRaises(ValueError):
+      instrumentation.InstrumentedOverload(py_defaults, sample_every=0)
+
+
+if __name__ == '__main__':
+  test.main()
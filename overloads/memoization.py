@@ -0,0 +1,189 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""A function call overload which caches the results of pure functions.
+
+Example:
+
+  call = memoization.MemoizingCallOverload(py_defaults.call, max_size=4096)
+  call.memoizes(abs)
+
+  @memoization.pure
+  def distance(x, y):
+    return abs(x - y)
+
+Calls to functions which are registered with `memoizes`, or decorated with
+`pure`, return the cached result of previous calls with equal arguments.
+Arguments must be hashable, or tuples of hashable values; with
+`hash_arrays=True`, NumPy arrays are keyed by their dtype, shape and a digest
+of their contents. Calls with other arguments are not cached. Arguments of
+different types never match, so that e.g. `f(1)` and `f(1.0)` are cached
+separately.
+
+The cache holds the most recently used results, up to max_size entries.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import hashlib
+import threading
+
+import numpy as np
+from pyctr.overloads import staging
+
+_PURE_ATTR = '__pyctr_pure__'
+
+
+def pure(func):
+  """Decorator marking func as pure, so that its calls may be cached."""
+  setattr(func, _PURE_ATTR, True)
+  return func
+
+
+def is_pure(func):
+  return getattr(func, _PURE_ATTR, False) is True
+
+
+class CacheStats(object):
+  """The cache hits and misses of a function.
+
+  Attributes:
+    hits: int
+    misses: int, calls which were not cached, including those with
+      unhashable arguments.
+  """
+
+  __slots__ = ('hits', 'misses')
+
+  def __init__(self):
+    self.hits = 0
+    self.misses = 0
+
+  @property
+  def hit_rate(self):
+    calls = self.hits + self.misses
+    return self.hits / calls if calls else 0.
+
+  def __repr__(self):
+    return 'CacheStats(hits={}, misses={}, hit_rate={:.2f})'.format(
+        self.hits, self.misses, self.hit_rate)
+
+
+class _Unhashable(Exception):
+  pass
+
+
+def _array_key(a):
+  if a.dtype.hasobject:
+    raise _Unhashable()
+  a = np.ascontiguousarray(a)
+  digest = hashlib.blake2b(a.reshape(-1).view(np.uint8), digest_size=16)
+  return a.dtype.str, a.shape, digest.digest()
+
+
+class MemoizingCallOverload(staging.RewritingCallOverload):
+  """A function call overload which caches the results of pure functions.
+
+  Replacements registered with `replaces` take effect as usual; the result of
+  the replacement is cached for pure functions.
+
+  Attributes:
+    max_size: int, the maximum number of cached results.
+    hash_arrays: bool, whether NumPy arguments are keyed by their contents.
+  """
+
+  def __init__(self, default_call, max_size=1024, hash_arrays=False):
+    super(MemoizingCallOverload, self).__init__(default_call)
+    if max_size < 1:
+      raise ValueError('max_size must be positive, got {}'.format(max_size))
+    self.max_size = max_size
+    self.hash_arrays = hash_arrays
+    # The registered functions, by id. They are kept alive, so that their ids
+    # are not reused by other functions.
+    self._pure = {}
+    self._cache = collections.OrderedDict()
+    self._stats = {}
+    self._lock = threading.Lock()
+
+  def memoizes(self, func):
+    """Registers func as pure. Can be used as a decorator."""
+    self._pure[id(func)] = func
+    return func
+
+  def _is_memoized(self, func):
+    return id(func) in self._pure or is_pure(func)
+
+  def _key(self, value):
+    """Returns a hashable key identifying value by type and value."""
+    if isinstance(value, tuple):
+      return (type(value),) + tuple(self._key(v) for v in value)
+    if isinstance(value, np.ndarray):
+      if not self.hash_arrays:
+        raise _Unhashable()
+      return type(value), _array_key(value)
+    try:
+      hash(value)
+    except TypeError:
+      raise _Unhashable()
+    return type(value), value
+
+  def _call_key(self, f, args, kwargs):
+    try:
+      return (id(f), self._key(tuple(args)),
+              self._key(tuple(sorted(kwargs.items()))))
+    except _Unhashable:
+      return None
+
+  def stats(self, func=None):
+    """Returns the CacheStats of func, or a dict of those of all functions."""
+    if func is not None:
+      return self._stats.get(func, CacheStats())
+    return dict(self._stats)
+
+  def clear(self):
+    """Removes all cached results, and resets the statistics."""
+    with self._lock:
+      self._cache.clear()
+      self._stats.clear()
+
+  def __len__(self):
+    return len(self._cache)
+
+  def __call__(self, f, args, kwargs):
+    if not self._is_memoized(f):
+      return super(MemoizingCallOverload, self).__call__(f, args, kwargs)
+
+    key = self._call_key(f, args, kwargs)
+    with self._lock:
+      stats = self._stats.get(f)
+      if stats is None:
+        stats = self._stats[f] = CacheStats()
+      if key is not None and key in self._cache:
+        self._cache.move_to_end(key)
+        stats.hits += 1
+        # The function is kept with the result, so its id is not reused.
+        return self._cache[key][1]
+      stats.misses += 1
+
+    result = super(MemoizingCallOverload, self).__call__(f, args, kwargs)
+    if key is not None:
+      with self._lock:
+        self._cache[key] = (f, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+          self._cache.popitem(last=False)
+    return result
@@ -0,0 +1,135 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for memoization module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gc
+import types
+
+from absl.testing import absltest as test
+import numpy as np
+from pyctr.api import conversion
+from pyctr.overloads import memoization
+from pyctr.overloads import py_defaults
+from pyctr.transformers.virtualization import functions
+
+calls = []
+
+
+def square(x):
+  calls.append(x)
+  return x * x
+
+
+@memoization.pure
+def norm(x):
+  calls.append(x)
+  return np.sqrt(np.sum(x * x))
+
+
+def sum_of_squares(a, b, c):
+  return square(a) + square(b) + square(c)
+
+
+class MemoizationTest(test.TestCase):
+
+  def setUp(self):
+    super(MemoizationTest, self).setUp()
+    del calls[:]
+
+  def test_registered_function(self):
+    call = memoization.MemoizingCallOverload(py_defaults.call)
+    call.memoizes(square)
+    overload = types.ModuleType('memoizing')
+    overload.call = call
+
+    converted = conversion.convert(sum_of_squares, overload, [functions])
+
+    self.assertEqual(converted(2, 3, 2), 17)
+    self.assertEqual(converted(3, 3, 3), 27)
+    self.assertListEqual(calls, [2, 3])
+    stats = call.stats(square)
+    self.assertEqual((stats.hits, stats.misses), (4, 2))
+    self.assertAlmostEqual(stats.hit_rate, 4 / 6)
+
+  def test_registered_functions_kept_alive(self):
+    call = memoization.MemoizingCallOverload(py_defaults.call)
+    call.memoizes(lambda x: x + 1)
+
+    gc.collect()
+    # Otherwise a new function could reuse the id of the registered one.
+    unregistered = lambda x: x + 2
+    self.assertEqual(call(unregistered, (1,), {}), 3)
+    self.assertEqual(call.stats(unregistered).misses, 0)
+
+  def test_arguments_keyed_by_type(self):
+    call = memoization.MemoizingCallOverload(py_defaults.call)
+    call.memoizes(square)
+
+    self.assertIsInstance(call(square, (2,), {}), int)
+    self.assertIsInstance(call(square, (2.,), {}), float)
+    self.assertIsInstance(call(square, (True,), {}), int)
+    self.assertListEqual(calls, [2, 2., True])
+
+  def test_unhashable_arguments(self):
+    call = memoization.MemoizingCallOverload(py_defaults.call)
+    x = np.array([3., 4.])
+
+    self.assertEqual(call(norm, (x,), {}), 5.)
+    self.assertEqual(call(norm, (x,), {}), 5.)
+    self.assertLen(calls, 2)
+    self.assertEqual(call.stats(norm).misses, 2)
+    self.assertEqual(len(call), 0)
+
+  def test_hash_arrays(self):
+    call = memoization.MemoizingCallOverload(py_defaults.call,
+                                             hash_arrays=True)
+
+    self.assertEqual(call(norm, (np.array([3., 4.]),), {}), 5.)
+    self.assertEqual(call(norm, (np.array([3., 4.]),), {}), 5.)
+    self.assertEqual(call(norm, (np.array([[3., 4.]]),), {}), 5.)
+    self.assertEqual(call(norm, (np.array([3, 4]),), {}), 5.)
+    self.assertLen(calls, 3)
+
+  def test_lru_eviction(self):
+    call = memoization.MemoizingCallOverload(py_defaults.call, max_size=2)
+    call.memoizes(square)
+
+    for x in (1, 2, 1, 3, 1, 2):
+      call(square, (x,), {})
+
+    # 2 was evicted by 3, as 1 was used more recently.
+    self.assertListEqual(calls, [1, 2, 3, 2])
+    self.assertEqual(len(call), 2)
+
+    call.clear()
+    self.assertEqual(len(call), 0)
+    self.assertEqual(call.stats(), {})
+
+  def test_replacements(self):
+    call = memoization.MemoizingCallOverload(py_defaults.call)
+    call.memoizes(abs)
+    call.replaces(abs)(square)
+
+    self.assertEqual(call(abs, (-3,), {}), 9)
+    self.assertEqual(call(abs, (-3,), {}), 9)
+    self.assertListEqual(calls, [-3])
+
+
+if __name__ == '__main__':
+  test.main()
@@ -0,0 +1,349 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Overloads which run the iterations of independent for loops concurrently.
+
+The parallel_loops transformer marks the loops whose iterations are
+independent; for_stmt runs them in chunks on a thread pool, which suits
+functions that release the GIL, like most NumPy and IO functions, or on a
+process pool. Other loops run as usual.
+
+Example:
+
+  def f(xs):
+    total = 0
+    results = []
+    for x in xs:
+      y = expensive(x)
+      total = total + y
+      results.append(y)
+    return total, results
+
+  parallel_f = parallel.parallelize(f)
+  with parallel.options(max_workers=4):
+    parallel_f(xs)
+
+The outcome is the same as running the loop sequentially:
+
+  * private variables, and the loop target, hold the values of the last
+    iteration after the loop;
+  * reductions like `total = total + y` combine the contributions of the
+    iterations in order, starting from the value before the loop;
+  * appends to lists happen in iteration order.
+
+If iterations raise, the state reflects the iterations before the first
+failing one, and its exception is raised.
+
+The functions called in the loop must be safe to call concurrently. With
+processes, the values the iterations produce must be picklable, and other
+side effects are lost; processes are forked, and only run where the fork
+start method is available.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import contextlib
+import itertools
+import multiprocessing
+import os
+import sys
+import threading
+
+from concurrent import futures
+from pyctr.api import conversion
+from pyctr.overloads import py_defaults
+from pyctr.overloads import reductions
+from pyctr.overloads import staging
+from pyctr.transformers.optimization import parallel_loops
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import variables
+
+DEFAULT_TRANSFORMERS = (parallel_loops, variables, functions, control_flow)
+
+THREADS = 'threads'
+PROCESSES = 'processes'
+
+_Options = collections.namedtuple(
+    '_Options', ('backend', 'max_workers', 'chunk_size', 'min_iterations'))
+
+_DEFAULT_OPTIONS = _Options(
+    backend=THREADS, max_workers=None, chunk_size=None, min_iterations=2)
+
+_state = threading.local()
+
+
+@contextlib.contextmanager
+def options(backend=THREADS, max_workers=None, chunk_size=None,
+            min_iterations=2):
+  """Sets how the independent loops run in this context.
+
+  Args:
+    backend: Text, THREADS or PROCESSES.
+    max_workers: Optional[int], the number of workers. Defaults to the number
+      of CPUs.
+    chunk_size: Optional[int], the number of consecutive iterations each task
+      runs. Defaults to about four tasks per worker.
+    min_iterations: int, loops with fewer iterations run sequentially.
+
+  Yields:
+    None
+  """
+  if backend not in (THREADS, PROCESSES):
+    raise ValueError('unknown backend {!r}'.format(backend))
+  previous = getattr(_state, 'options', _DEFAULT_OPTIONS)
+  _state.options = _Options(backend, max_workers, chunk_size, min_iterations)
+  try:
+    yield
+  finally:
+    _state.options = previous
+
+
+class _Frame(object):
+  """The variables private to the iteration running in the current thread."""
+
+  __slots__ = ('values', 'collections', 'collected')
+
+  def __init__(self, values, collections_):
+    self.values = values
+    self.collections = collections_
+    self.collected = []
+
+
+def _current_frame():
+  return getattr(_state, 'frame', None)
+
+
+class Variable(py_defaults.Variable):
+  """A variable whose value may be private to the iteration of a loop."""
+
+  @property
+  def val(self):
+    frame = _current_frame()
+    if frame is not None and self in frame.values:
+      return frame.values[self]
+    return self._val
+
+  @val.setter
+  def val(self, value):
+    frame = _current_frame()
+    if frame is not None and self in frame.values:
+      frame.values[self] = value
+    else:
+      self._val = value
+
+
+def init(name):
+  return Variable(py_defaults.Undefined(name), name)
+
+
+assign = py_defaults.assign
+read = py_defaults.read
+if_stmt = py_defaults.if_stmt
+while_stmt = py_defaults.while_stmt
+
+
+call = staging.RewritingCallOverload(py_defaults.call)
+reductions.register_reduction_functions(call)
+
+
+class Independent(object):
+  """An iterable whose loop may run its iterations concurrently.
+
+  Attributes:
+    iterable: the wrapped iterable.
+    collections: Tuple[list, ...], the lists the loop appends to.
+  """
+
+  def __init__(self, iterable, collections_):
+    self.iterable = iterable
+    self.collections = tuple(collections_)
+
+  def __iter__(self):
+    return iter(self.iterable)
+
+
+def independent(iterable, collections_):
+  return Independent(iterable, collections_)
+
+
+def collect(collection, value):
+  """Appends value to the collection, in iteration order."""
+  frame = _current_frame()
+  if frame is not None:
+    for slot, c in enumerate(frame.collections):
+      if c is collection:
+        frame.collected.append((slot, value))
+        return
+  collection.append(value)
+
+
+_Loop = collections.namedtuple(
+    '_Loop', ('target', 'items', 'body', 'local_writes', 'collections'))
+
+# Iteration outcomes.
+_UNCHANGED = 0
+_VALUE = 1
+_PARTIAL = 2
+_TARGET = 3
+
+
+def _run_chunk(loop, start, stop):
+  """Runs iterations [start, stop) of a loop, each in its own frame.
+
+  Args:
+    loop: _Loop
+    start: int
+    stop: int
+
+  Returns:
+    List[Tuple[Optional[BaseException], List[Tuple[int, Any]], List[Any]]],
+    for each iteration that ran, its exception, the outcome of each local
+    write, and the values it appended to each collection. Stops after the
+    first iteration which raises.
+  """
+  results = []
+  for i in range(start, stop):
+    partials = [reductions.Partial() for _ in loop.local_writes]
+    values = dict(zip(loop.local_writes, partials))
+    values[loop.target] = loop.items[i]
+    frame = _Frame(values, loop.collections)
+    _state.frame = frame
+    error = None
+    try:
+      loop.body()
+    except Exception as e:  # pylint:disable=broad-except
+      error = e
+    finally:
+      _state.frame = None
+
+    outcomes = []
+    for var, partial in zip(loop.local_writes, partials):
+      value = values[var]
+      if value is partial:
+        outcomes.append((_UNCHANGED, None))
+      elif value is loop.target:
+        # Variables which alias the loop target, like the original target of
+        # a converted loop.
+        outcomes.append((_TARGET, None))
+      elif isinstance(value, reductions.Partial):
+        outcomes.append((_PARTIAL, value))
+      else:
+        outcomes.append((_VALUE, value))
+    results.append((error, outcomes, frame.collected))
+    if error is not None:
+      break
+  return results
+
+
+_thread_pools = {}
+_thread_pools_lock = threading.Lock()
+
+
+def _thread_pool(max_workers):
+  with _thread_pools_lock:
+    pool = _thread_pools.get(max_workers)
+    if pool is None:
+      pool = futures.ThreadPoolExecutor(max_workers)
+      _thread_pools[max_workers] = pool
+    return pool
+
+
+# Loops running on process pools. Forked workers inherit this table, so they
+# can run the loop body without pickling it.
+_process_loops = {}
+_process_loop_ids = itertools.count()
+
+
+def _run_chunk_in_process(key, start, stop):
+  return _run_chunk(_process_loops[key], start, stop)
+
+
+def _run_chunks(loop, chunks, opts, max_workers):
+  if opts.backend == THREADS:
+    pool = _thread_pool(max_workers)
+    tasks = [pool.submit(_run_chunk, loop, start, stop)
+             for start, stop in chunks]
+    return [t.result() for t in tasks]
+
+  key = next(_process_loop_ids)
+  _process_loops[key] = loop
+  try:
+    with futures.ProcessPoolExecutor(
+        max_workers, mp_context=multiprocessing.get_context('fork')) as pool:
+      tasks = [pool.submit(_run_chunk_in_process, key, start, stop)
+               for start, stop in chunks]
+      return [t.result() for t in tasks]
+  finally:
+    del _process_loops[key]
+
+
+def _merge(loop, chunks, chunk_results):
+  """Applies the outcomes of the iterations in order, as a sequential loop."""
+  for (start, _), results in zip(chunks, chunk_results):
+    for i, (error, outcomes, collected) in enumerate(results, start):
+      for var, (kind, value) in zip(loop.local_writes, outcomes):
+        if kind == _VALUE:
+          var.val = value
+        elif kind == _TARGET:
+          var.val = loop.target
+        elif kind == _PARTIAL:
+          var.val = value.replay(py_defaults.read(var))
+      for slot, value in collected:
+        loop.collections[slot].append(value)
+      if error is not None:
+        raise error
+      loop.target.val = loop.items[i]
+
+
+def for_stmt(target, iter_, body, orelse, local_writes):
+  """Functional form of a for statement.
+
+  Loops over Independent iterables run concurrently, except when nested in
+  another concurrent loop.
+  """
+  if not isinstance(iter_, Independent):
+    return py_defaults.for_stmt(target, iter_, body, orelse, local_writes)
+
+  opts = getattr(_state, 'options', _DEFAULT_OPTIONS)
+  items = list(iter_.iterable)
+  if _current_frame() is not None or len(items) < opts.min_iterations:
+    return py_defaults.for_stmt(target, items, body, orelse, local_writes)
+
+  max_workers = opts.max_workers or os.cpu_count() or 1
+  chunk_size = opts.chunk_size or max(
+      1, -(-len(items) // (4 * max_workers)))
+  chunks = [(start, min(start + chunk_size, len(items)))
+            for start in range(0, len(items), chunk_size)]
+  local_writes = tuple(v for v in local_writes if v is not target)
+  loop = _Loop(target, items, body, local_writes, iter_.collections)
+  _merge(loop, chunks, _run_chunks(loop, chunks, opts, max_workers))
+  orelse()
+
+
+def parallelize(func, transformers=DEFAULT_TRANSFORMERS):
+  """Converts func, running its independent for loops concurrently.
+
+  Args:
+    func: Callable
+    transformers: Iterable, the transformers to convert func with. Must
+      include parallel_loops, before the virtualization transformers.
+
+  Returns:
+    Callable
+  """
+  return conversion.convert(func, sys.modules[__name__], list(transformers))
@@ -0,0 +1,109 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for parallel module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+
+from absl.testing import absltest as test
+import numpy as np
+from pyctr.overloads import parallel
+
+
+def square_all(xs):
+  squares = []
+  threads = []
+  for x in xs:
+    y = x * x
+    squares.append(y)
+    threads.append(threading.current_thread())
+  return squares, threads, x, y
+
+
+def stats(xs):
+  total = 0.
+  largest = -np.inf
+  for x in xs:
+    y = np.sqrt(x)
+    total = total + y
+    largest = max(largest, y)
+  return total, largest
+
+
+def running_sum(xs):
+  total = 0
+  partial_sums = []
+  for x in xs:
+    total = total + x
+    partial_sums.append(total)
+  return partial_sums
+
+
+def inverses(xs):
+  out = []
+  for x in xs:
+    out.append(1 // x)
+  return out
+
+
+class ParallelTest(test.TestCase):
+
+  def test_collects_in_order(self):
+    xs = list(range(20))
+    with parallel.options(max_workers=4, chunk_size=3):
+      squares, threads, x, y = parallel.parallelize(square_all)(xs)
+
+    self.assertEqual(squares, [x * x for x in xs])
+    self.assertEqual((x, y), (19, 361))
+    self.assertNotIn(threading.current_thread(), threads)
+
+  def test_reductions(self):
+    xs = np.random.rand(50).tolist()
+    with parallel.options(max_workers=3):
+      total, largest = parallel.parallelize(stats)(xs)
+
+    # Reductions are combined in iteration order, like the original loop.
+    self.assertEqual((total, largest), stats(xs))
+
+  def test_dependent_loops_run_sequentially(self):
+    converted = parallel.parallelize(running_sum)
+    self.assertEqual(converted([1, 2, 3, 4]), [1, 3, 6, 10])
+
+  def test_processes(self):
+    xs = list(range(10))
+    with parallel.options(backend=parallel.PROCESSES, max_workers=2):
+      out = parallel.parallelize(inverses)(xs[1:])
+      total, largest = parallel.parallelize(stats)(xs)
+
+    self.assertEqual(out, inverses(xs[1:]))
+    self.assertEqual((total, largest), stats(xs))
+
+  def test_errors(self):
+    converted = parallel.parallelize(inverses)
+    with parallel.options(max_workers=2, chunk_size=1):
+      with self.assertRaises(ZeroDivisionError):
+        converted([1, 2, 0, 4])
+      self.assertEqual(converted([1, 2, 4]), [1, 0, 0])
+
+    with self.assertRaises(ValueError):
+      with parallel.options(backend='gpu'):
+        pass
+
+
+if __name__ == '__main__':
+  test.main()
@@ -58,6 +58,10 @@ def for_stmt(target, iter_, body, orelse, _):
     orelse()
 
 
+def if_exp(cond, body, orelse):
+  return body() if cond else orelse()
+
+
 def and_(x, operands):
   if x:
     for op in operands:
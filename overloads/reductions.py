@@ -0,0 +1,359 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Overloads which combine the contributions of reduction loops at once.
+
+The control_flow transformer converts for loops which update variables only
+by associative reduction statements, like `total = total + f(x)` or
+`best = max(best, f(x))`, to calls to reduce_stmt (see
+analysis/reductions.py). reduce_stmt runs the body once per item, as usual,
+but records the contribution of each iteration to the reductions instead of
+accumulating it. The contributions are then combined with one of these
+strategies:
+
+  * VECTORIZE stacks the contributions in an array, and reduces it with a
+    NumPy ufunc, like np.add.reduce.
+  * TREE combines adjacent pairs of contributions, then adjacent pairs of
+    their results, and so on.
+  * SEQUENTIAL runs the original loop.
+
+AUTO, the default, vectorizes floating point and complex contributions, and
+the contributions to max and min; it combines other contributions like the
+original loop. Note that VECTORIZE and TREE regroup the operations, so
+floating point results may differ slightly from the original loop.
+
+Example:
+
+  converted = conversion.convert(f, reductions, [variables, functions,
+                                                 control_flow])
+  with reductions.strategy(reductions.TREE):
+    converted(xs)
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+import numbers
+import operator
+import threading
+
+import numpy as np
+from pyctr.overloads import py_defaults
+from pyctr.overloads import staging
+
+SEQUENTIAL = 'sequential'
+VECTORIZE = 'vectorize'
+TREE = 'tree'
+AUTO = 'auto'
+
+OPERATORS = {
+    'add': operator.add,
+    'sub': operator.sub,
+    'mul': operator.mul,
+    'truediv': operator.truediv,
+    'floordiv': operator.floordiv,
+    'mod': operator.mod,
+    'pow': operator.pow,
+    'matmul': operator.matmul,
+    'and_': operator.and_,
+    'or_': operator.or_,
+    'xor': operator.xor,
+    'lshift': operator.lshift,
+    'rshift': operator.rshift,
+    'max': max,
+    'min': min,
+}
+
+UFUNCS = {
+    'add': np.add,
+    'mul': np.multiply,
+    'and_': np.bitwise_and,
+    'or_': np.bitwise_or,
+    'xor': np.bitwise_xor,
+    'max': np.maximum,
+    'min': np.minimum,
+}
+
+_strategy = threading.local()
+
+
+@contextlib.contextmanager
+def strategy(mode):
+  """Sets how the reduce_stmt calls in this context combine contributions.
+
+  Args:
+    mode: Text, one of SEQUENTIAL, VECTORIZE, TREE or AUTO.
+
+  Yields:
+    None
+  """
+  if mode not in (SEQUENTIAL, VECTORIZE, TREE, AUTO):
+    raise ValueError('unknown strategy {!r}'.format(mode))
+  previous = current_strategy()
+  _strategy.mode = mode
+  try:
+    yield
+  finally:
+    _strategy.mode = previous
+
+
+def current_strategy():
+  return getattr(_strategy, 'mode', AUTO)
+
+
+class Partial(object):
+  """Records the operations applied to a reduction variable.
+
+  Used in place of the value of reduction variables, so that the
+  contributions of an iteration can be collected without the value they are
+  combined with. Operators append to the terms, which can later be replayed
+  on actual values.
+
+  Attributes:
+    terms: Tuple[Tuple[Callable, Any, bool], ...], the operator, the other
+      operand, and whether the Partial was the right operand.
+  """
+
+  __slots__ = ('terms',)
+
+  # Makes NumPy defer to the reflected operators of this class.
+  __array_ufunc__ = None
+
+  def __init__(self, terms=()):
+    self.terms = terms
+
+  def apply(self, op, other, reflected):
+    if isinstance(other, Partial):
+      raise ValueError('reduction variables can only be combined with values'
+                       ' computed independently of them')
+    return Partial(self.terms + ((op, other, reflected),))
+
+  def replay(self, value):
+    for op, other, reflected in self.terms:
+      value = op(other, value) if reflected else op(value, other)
+    return value
+
+  def __getstate__(self):
+    return self.terms
+
+  def __setstate__(self, state):
+    self.terms = state
+
+
+def _partial_operator(op):
+
+  def method(self, other):
+    return self.apply(op, other, False)
+
+  def reflected(self, other):
+    return self.apply(op, other, True)
+
+  return method, reflected
+
+
+for _name, _op in OPERATORS.items():
+  if _name in ('max', 'min'):
+    continue
+  _method, _reflected = _partial_operator(_op)
+  _dunder = _name.rstrip('_')
+  setattr(Partial, '__{}__'.format(_dunder), _method)
+  setattr(Partial, '__r{}__'.format(_dunder), _reflected)
+
+
+def _reduction_function(func):
+
+  def replacement(*args, **kwargs):
+    if len(args) == 2 and not kwargs:
+      x, y = args
+      if isinstance(x, Partial):
+        return x.apply(func, y, False)
+      if isinstance(y, Partial):
+        return y.apply(func, x, True)
+    return func(*args, **kwargs)
+
+  return replacement
+
+
+def register_reduction_functions(call):
+  """Makes max and min record their application to Partial values.
+
+  Args:
+    call: staging.RewritingCallOverload
+  """
+  call.replaces(max)(_reduction_function(max))
+  call.replaces(min)(_reduction_function(min))
+
+
+init = py_defaults.init
+assign = py_defaults.assign
+read = py_defaults.read
+if_stmt = py_defaults.if_stmt
+while_stmt = py_defaults.while_stmt
+for_stmt = py_defaults.for_stmt
+
+call = staging.RewritingCallOverload(py_defaults.call)
+register_reduction_functions(call)
+
+
+def contributions(target, iter_, body, reductions):
+  """Runs a loop, collecting the contributions to its reduction variables.
+
+  The reduction variables are set to Partial values for each iteration, and
+  hold their original values afterwards.
+
+  Args:
+    target: pyct.Variable, the loop target.
+    iter_: Iterable
+    body: Callable with no arguments.
+    reductions: Tuple[Tuple[pyct.Variable, Text], ...], the reduction
+      variables and their operation.
+
+  Returns:
+    List[Optional[List[Tuple[Any, bool]]]], for each reduction, the
+    contributions in iteration order, and whether each was the left operand.
+    None for reductions whose statements applied other operations.
+  """
+  initial = [var.val for var, _ in reductions]
+  results = [[] for _ in reductions]
+  try:
+    for item in iter_:
+      target.val = item
+      for var, _ in reductions:
+        var.val = Partial()
+      body()
+      for i, (var, op) in enumerate(reductions):
+        partial = var.val
+        if results[i] is None:
+          continue
+        if not isinstance(partial, Partial):
+          raise ValueError('{} is not a reduction variable'.format(var.name))
+        for term_op, other, reflected in partial.terms:
+          if term_op is not OPERATORS[op]:
+            results[i] = None
+            break
+          results[i].append((other, reflected))
+  finally:
+    for (var, _), value in zip(reductions, initial):
+      var.val = value
+  return results
+
+
+def tree_reduce(op, values):
+  """Combines values pairwise, preserving their order.
+
+  Args:
+    op: Callable, an associative binary function.
+    values: List, not empty.
+
+  Returns:
+    The combined value.
+  """
+  while len(values) > 1:
+    combined = [op(x, y) for x, y in zip(values[::2], values[1::2])]
+    if len(values) % 2:
+      combined.append(values[-1])
+    values = combined
+  return values[0]
+
+
+def _vectorizable(op, values, mode):
+  """Whether values can be stacked and reduced with a ufunc."""
+  if op not in UFUNCS:
+    return False
+  # result_type would read strings as dtype names.
+  if not all(isinstance(v, (numbers.Number, np.ndarray, np.generic))
+             for v in values):
+    return False
+  kind = np.result_type(*[np.asarray(v).dtype for v in values]).kind
+  if kind not in 'biufc':
+    return False
+  shapes = set(np.shape(v) for v in values)
+  if len(shapes) != 1:
+    return False
+  # Integer sums may overflow, unlike Python ints.
+  return mode == VECTORIZE or kind in 'fc' or op in ('max', 'min')
+
+
+def _vector_reduce(op, values):
+  reduced = UFUNCS[op].reduce(np.stack(values))
+  if not any(isinstance(v, (np.ndarray, np.generic)) for v in values):
+    reduced = reduced.item()
+  return reduced
+
+
+def combine(op, initial, terms, mode):
+  """Combines the contributions to a reduction variable with its value.
+
+  Args:
+    op: Text, the operation of the reduction.
+    initial: the value of the variable before the loop.
+    terms: List[Tuple[Any, bool]], as returned by contributions.
+    mode: Text, one of VECTORIZE, TREE or AUTO.
+
+  Returns:
+    The value of the variable after the loop.
+  """
+  func = OPERATORS[op]
+  if not terms:
+    return initial
+  sequential = Partial(tuple((func, v, r) for v, r in terms))
+  reflected = set(r for _, r in terms)
+  if len(reflected) > 1:
+    return sequential.replay(initial)
+  reflected, = reflected
+  values = [v for v, _ in terms]
+  if reflected:
+    # Each contribution was the left operand: e_n OP ... OP e_1 OP initial.
+    values.reverse()
+
+  if _vectorizable(op, values, mode):
+    reduced = _vector_reduce(op, values)
+  elif mode == TREE:
+    reduced = tree_reduce(func, values)
+  else:
+    return sequential.replay(initial)
+
+  if reflected:
+    return func(reduced, initial)
+  return func(initial, reduced)
+
+
+def reduce_stmt(target, iter_, body, orelse, local_writes, reductions):
+  """Functional form of a for statement which updates reduction variables.
+
+  Args:
+    target: pyct.Variable, the loop target.
+    iter_: Iterable
+    body: Callable with no arguments.
+    orelse: Callable with no arguments.
+    local_writes: Tuple[pyct.Variable, ...], the variables the loop modifies.
+    reductions: Tuple[Tuple[pyct.Variable, Text], ...], the variables which
+      the loop updates only by associative reduction statements, and the
+      name of their operation, like 'add' or 'max'. See
+      analysis/reductions.py.
+  """
+  mode = current_strategy()
+  if mode == SEQUENTIAL or any(
+      py_defaults.is_undefined(var.val) for var, _ in reductions):
+    return for_stmt(target, iter_, body, orelse, local_writes)
+
+  terms = contributions(target, iter_, body, reductions)
+  for (var, op), var_terms in zip(reductions, terms):
+    if var_terms is None:
+      raise ValueError('{} is updated by operations other than {}'.format(
+          var.name, op))
+    var.val = combine(op, var.val, var_terms, mode)
+  orelse()
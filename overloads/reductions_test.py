@@ -0,0 +1,116 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for reductions module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import operator
+
+from absl.testing import absltest as test
+from absl.testing import parameterized
+import numpy as np
+from pyctr.api import conversion
+from pyctr.overloads import reductions
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import variables
+
+
+def stats(xs):
+  total = 0.
+  largest = -np.inf
+  count = 0
+  for x in xs:
+    y = x * x
+    total = total + y
+    largest = max(largest, y)
+    count = count + 1
+  return total, largest, count
+
+
+def reversed_join(xs):
+  s = ''
+  for x in xs:
+    s = str(x) + s
+  return s
+
+
+def concat(xs):
+  s = ''
+  for x in xs:
+    s = s + x
+  return s
+
+
+def sum_rows(rows):
+  total = np.zeros(3)
+  for row in rows:
+    total = total + row
+  return total
+
+
+def conditional_sum(xs):
+  total = 0
+  for x in xs:
+    if x > 1:
+      total = total + x
+  return total
+
+
+class ReductionsTest(parameterized.TestCase):
+
+  def convert(self, f):
+    return conversion.convert(f, reductions,
+                              [variables, functions, control_flow])
+
+  @parameterized.parameters(reductions.AUTO, reductions.VECTORIZE,
+                            reductions.TREE, reductions.SEQUENTIAL)
+  def test_strategies(self, mode):
+    xs = np.random.rand(50).tolist()
+    rows = np.random.rand(10, 3)
+    with reductions.strategy(mode):
+      total, largest, count = self.convert(stats)(xs)
+      self.assertEqual(self.convert(reversed_join)([1, 2, 3]), '321')
+      self.assertEqual(self.convert(concat)(['f', 'd']), 'fd')
+      self.assertEqual(self.convert(concat)(['float', 'int']), 'floatint')
+      self.assertTrue(np.allclose(self.convert(sum_rows)(rows), sum_rows(rows)))
+      self.assertEqual(self.convert(conditional_sum)([1, 2, 3]), 5)
+
+    expected = stats(xs)
+    self.assertAlmostEqual(total, expected[0])
+    self.assertEqual((largest, count), expected[1:])
+    self.assertIsInstance(total, float)
+    self.assertIsInstance(count, int)
+
+  def test_empty_loop(self):
+    self.assertEqual(self.convert(stats)([]), (0., -np.inf, 0))
+
+  def test_tree_reduce(self):
+    self.assertEqual(
+        reductions.tree_reduce(operator.add, ['a', 'b', 'c', 'd', 'e']),
+        'abcde')
+    self.assertEqual(reductions.tree_reduce(operator.add, [1]), 1)
+
+  def test_partial(self):
+    partial = 2 * (reductions.Partial() + 3)
+    self.assertEqual(partial.replay(1), 8)
+    with self.assertRaises(ValueError):
+      partial + reductions.Partial()  # pylint:disable=expression-not-assigned
+
+
+if __name__ == '__main__':
+  test.main()
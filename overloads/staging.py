@@ -18,8 +18,39 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+import sysconfig
+import threading
+import types
+import weakref
+
+from pyctr.api import conversion
+from pyctr.core import parsing
 from pyctr.overloads import py_defaults
 
+# Modules whose functions ConvertingCallOverload calls as they are, by default.
+DEFAULT_SKIPPED_MODULES = (
+    'pyctr.analysis',
+    'pyctr.api',
+    'pyctr.core',
+    'pyctr.overloads',
+    'pyctr.sct',
+    'pyctr.transformers',
+    'absl',
+    'astor',
+    'gast',
+    'jax',
+    'numpy',
+    'six',
+    'tensorflow',
+    'torch',
+    'z3',
+)
+
+_STDLIB_PATHS = tuple(
+    os.path.realpath(sysconfig.get_paths()[k]) + os.sep
+    for k in ('stdlib', 'platstdlib'))
+
 
 # TODO(mdanatg): Tests.
 class RewritingCallOverload(object):
@@ -62,6 +93,140 @@ class RewritingCallOverload(object):
     return self._default_call(f, args, kwargs)
 
 
+class ConvertingCallOverload(object):
+  """A function call overload which converts the functions it calls.
+
+  User-defined functions are converted on their first call, with the same
+  overload module and transformers, so that conversion extends to everything
+  they call in turn. Builtins, C extensions, functions without source code and
+  functions from the skipped modules are called as they are.
+
+  Conversions are memoized by conversion.convert, so repeated and recursive
+  calls, and calls to closures created from the same code, only convert once.
+  Functions which fail to convert are called unconverted. The overload only
+  remembers which code objects convert and why the others failed, weakly, so
+  it keeps no callee alive.
+
+  Example:
+
+    # In an overload module:
+    call = ConvertingCallOverload(sys.modules[__name__], transformers)
+
+  Attributes:
+    overload_module: the module containing overloaded functionality
+    transformers: list of transformers to be applied
+    conversions: int, the number of functions converted so far
+    failures: weakref.WeakKeyDictionary[types.CodeType, Text], the errors
+      which prevented functions from converting.
+  """
+
+  def __init__(self,
+               overload_module,
+               transformers,
+               default_call=py_defaults.call,
+               skipped_modules=DEFAULT_SKIPPED_MODULES,
+               max_depth=None,
+               max_conversions=None):
+    """Creates a call overload.
+
+    Args:
+      overload_module: the module containing overloaded functionality, which
+        should normally include this object as its `call`
+      transformers: list of transformers to be applied
+      default_call: Callable, the overload used for calls to functions which
+        are not converted
+      skipped_modules: Iterable[Text], modules whose functions, including those
+        of their submodules, are not converted
+      max_depth: Optional[int], the maximum number of nested calls to
+        converted functions. Deeper calls run unconverted.
+      max_conversions: Optional[int], the maximum number of functions to
+        convert. Once reached, only functions already converted run converted.
+    """
+    self.overload_module = overload_module
+    self.transformers = transformers
+    self.conversions = 0
+    self.failures = weakref.WeakKeyDictionary()
+    self._default_call = default_call
+    self._skipped_modules = tuple(skipped_modules)
+    self._max_depth = max_depth
+    self._max_conversions = max_conversions
+    self._converts = weakref.WeakKeyDictionary()
+    self._lock = threading.Lock()
+    self._local = threading.local()
+
+  def _is_convertible(self, func):
+    """True if func is a user function which can be converted."""
+    module = func.__module__ or ''
+    for skipped in self._skipped_modules:
+      if module == skipped or module.startswith(skipped + '.'):
+        return False
+    filename = func.__code__.co_filename
+    if filename.startswith('<'):
+      return False
+    # Generated code is already converted.
+    if parsing.is_generated(filename):
+      return False
+    return not os.path.realpath(filename).startswith(_STDLIB_PATHS)
+
+  def _converted(self, func):
+    """Returns the converted version of func, or None."""
+    code = func.__code__
+    converted = None
+    converts = self._converts.get(code)
+    if converts is None:
+      if (self._max_conversions is not None and
+          self.conversions >= self._max_conversions):
+        return None
+      converts = False
+      failure = None
+      if self._is_convertible(func):
+        try:
+          converted = conversion.convert(func, self.overload_module,
+                                         self.transformers)
+          converts = True
+        except Exception as e:  # pylint:disable=broad-except
+          # The exception would keep the frames of its traceback alive.
+          failure = '{}: {}'.format(type(e).__name__, e)
+      with self._lock:
+        if failure is not None:
+          self.failures[code] = failure
+        if code not in self._converts:
+          self._converts[code] = converts
+          if converts:
+            self.conversions += 1
+        converts = self._converts[code]
+
+    if not converts:
+      return None
+    if converted is None:
+      # Memoized, with the closure of func attached.
+      converted = conversion.convert(func, self.overload_module,
+                                     self.transformers)
+    return converted
+
+  def __call__(self, f, args, kwargs):
+    func = f
+    bound_args = ()
+    if isinstance(f, types.MethodType):
+      func = f.__func__
+      bound_args = (f.__self__,)
+
+    depth = getattr(self._local, 'depth', 0)
+    if (not isinstance(func, types.FunctionType) or
+        (self._max_depth is not None and depth >= self._max_depth)):
+      return self._default_call(f, args, kwargs)
+
+    converted = self._converted(func)
+    if converted is None:
+      return self._default_call(f, args, kwargs)
+
+    self._local.depth = depth + 1
+    try:
+      return converted(*(bound_args + tuple(args)), **kwargs)
+    finally:
+      self._local.depth = depth
+
+
 def run_python_while(cond, body, orelse, init_cond_result):
   if init_cond_result:
     body()
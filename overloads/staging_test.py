@@ -0,0 +1,230 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for staging module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gc
+import types
+import weakref
+
+from absl.testing import absltest as test
+from pyctr.api import conversion
+from pyctr.overloads import py_defaults
+from pyctr.overloads import staging
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import variables
+
+TRANSFORMERS = [variables, functions, control_flow]
+
+
+def sign(x):
+  s = -1
+  if x > 0:
+    s = 1
+  return s
+
+
+def sign_sum(x, y):
+  return sign(x) + sign(y)
+
+
+def countdown(n):
+  r = 0
+  if n > 0:
+    r = 1 + countdown_step(n)
+  return r
+
+
+def countdown_step(n):
+  return countdown(n - 1)
+
+
+def make_adder(n):
+
+  def add(x):
+    r = x - n
+    if x > 0:
+      r = x + n
+    return r
+
+  return add
+
+
+add_one = make_adder(1)
+add_two = make_adder(2)
+
+
+def apply_adders(x):
+  return add_one(x) + add_two(x)
+
+
+class Sign(object):
+
+  def get(self, x):
+    return sign(x)
+
+
+def method_sign(x):
+  return Sign().get(x)
+
+
+def sorted_signs(x, y):
+  return sorted([sign(x), sign(y)])
+
+
+converted_sign = conversion.convert(sign, py_defaults, TRANSFORMERS)
+
+
+def call_converted(x):
+  return converted_sign(x)
+
+
+class ConvertingCallOverloadTest(test.TestCase):
+
+  def _overload(self, **kwargs):
+    """Creates an overload module which counts if statements."""
+    module = types.ModuleType('counting_recursive')
+    module.init = py_defaults.init
+    module.assign = py_defaults.assign
+    module.read = py_defaults.read
+    module.if_stmts = 0
+
+    def if_stmt(*args):
+      module.if_stmts += 1
+      return py_defaults.if_stmt(*args)
+
+    module.if_stmt = if_stmt
+    module.call = staging.ConvertingCallOverload(
+        module, TRANSFORMERS, skipped_modules=(), **kwargs)
+    return module
+
+  def test_converts_callees(self):
+    overload = self._overload()
+    converted = conversion.convert(sign_sum, overload, TRANSFORMERS)
+
+    self.assertEqual(converted(1, -1), 0)
+    self.assertEqual(overload.if_stmts, 2)
+    self.assertEqual(overload.call.conversions, 1)
+
+  def test_recursive_calls_convert_once(self):
+    overload = self._overload()
+    converted = conversion.convert(countdown, overload, TRANSFORMERS)
+
+    self.assertEqual(converted(3), 3)
+    self.assertEqual(overload.if_stmts, 4)
+    # countdown_step, and countdown as called from it.
+    self.assertEqual(overload.call.conversions, 2)
+
+  def test_closures_share_conversion(self):
+    overload = self._overload()
+    converted = conversion.convert(apply_adders, overload, TRANSFORMERS)
+
+    self.assertEqual(converted(1), (1 + 1) + (1 + 2))
+    self.assertEqual(converted(-1), (-1 - 1) + (-1 - 2))
+    self.assertEqual(overload.if_stmts, 4)
+    self.assertEqual(overload.call.conversions, 1)
+
+  def test_methods(self):
+    overload = self._overload()
+    converted = conversion.convert(method_sign, overload, TRANSFORMERS)
+
+    self.assertEqual(converted(1), 1)
+    self.assertEqual(overload.if_stmts, 1)
+    # Sign.get and sign. The class itself is called as is.
+    self.assertEqual(overload.call.conversions, 2)
+
+  def test_skips_builtins(self):
+    calls = []
+
+    def default_call(f, args, kwargs):
+      calls.append(f)
+      return py_defaults.call(f, args, kwargs)
+
+    overload = self._overload(default_call=default_call)
+    converted = conversion.convert(sorted_signs, overload, TRANSFORMERS)
+
+    self.assertEqual(converted(1, -1), [-1, 1])
+    self.assertListEqual(calls, [sorted])
+    self.assertEqual(overload.if_stmts, 2)
+    self.assertEqual(overload.call.conversions, 1)
+
+  def test_skips_converted_functions(self):
+    overload = self._overload()
+    converted = conversion.convert(call_converted, overload, TRANSFORMERS)
+
+    self.assertEqual(converted(-2), -1)
+    self.assertEqual(overload.if_stmts, 0)
+    self.assertEqual(overload.call.conversions, 0)
+    self.assertEmpty(overload.call.failures)
+
+  def test_skipped_modules(self):
+    overload = self._overload()
+    overload.call = staging.ConvertingCallOverload(
+        overload, TRANSFORMERS, skipped_modules=(sign.__module__,))
+    converted = conversion.convert(sign_sum, overload, TRANSFORMERS)
+
+    self.assertEqual(converted(1, -1), 0)
+    self.assertEqual(overload.if_stmts, 0)
+    self.assertEqual(overload.call.conversions, 0)
+
+  def test_max_depth(self):
+    overload = self._overload(max_depth=2)
+    converted = conversion.convert(countdown, overload, TRANSFORMERS)
+
+    self.assertEqual(converted(5), 5)
+    # The entry point, countdown_step and the nested countdown run converted.
+    self.assertEqual(overload.if_stmts, 2)
+
+  def test_max_conversions(self):
+    overload = self._overload(max_conversions=1)
+    converted = conversion.convert(method_sign, overload, TRANSFORMERS)
+
+    self.assertEqual(converted(1), 1)
+    # Only Sign.get is converted.
+    self.assertEqual(overload.if_stmts, 0)
+    self.assertEqual(overload.call.conversions, 1)
+
+  def test_failures_run_unconverted(self):
+    overload = self._overload()
+    lambda_sign = lambda x: sign(x)  # pylint:disable=unnecessary-lambda
+
+    def call_lambda(x):
+      return lambda_sign(x)
+
+    converted = conversion.convert(call_lambda, overload, TRANSFORMERS)
+
+    self.assertEqual(converted(1), 1)
+    self.assertIsInstance(overload.call.failures[lambda_sign.__code__], str)
+    self.assertEqual(overload.call.conversions, 0)
+
+  def test_does_not_keep_callees_alive(self):
+    overload = self._overload()
+    add = make_adder(3)
+
+    self.assertEqual(overload.call(add, (1,), {}), 4)
+    self.assertEqual(overload.call.conversions, 1)
+
+    ref = weakref.ref(add)
+    del add
+    gc.collect()
+    self.assertIsNone(ref())
+
+
+if __name__ == '__main__':
+  test.main()
@@ -14,9 +14,12 @@
 # ==============================================================================
 """Contains functions modeling default behavior for Python statements."""
 
+import itertools
 
 variables = {}
-suffix = 0
+# Unlike incrementing an integer, advancing a count is atomic, so that names
+# remain unique when converted functions run concurrently.
+_suffixes = itertools.count()
 
 
 class Undefined(object):
@@ -26,10 +29,7 @@ class Undefined(object):
 
 
 def fresh_name():
-  global suffix
-  name = 'x_{}'.format(suffix)
-  suffix += 1
-  return name
+  return 'x_{}'.format(next(_suffixes))
 
 
 def init(name):
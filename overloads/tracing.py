@@ -0,0 +1,602 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Overloads which trace converted code into a graph of operations.
+
+The arguments of the traced function are replaced by Tracer objects. Calls and
+operators applied to tracers are recorded as nodes of a Graph instead of being
+executed; everything else runs as usual Python. Conditionals on traced values
+trace both branches and merge the variables they modify with select nodes.
+Loops must not depend on traced values, and are unrolled.
+
+The graph can then be optimized and replayed, without the overhead of the
+virtualized Python code:
+
+  converted = conversion.convert(f, tracing, transformers)
+  graph = tracing.optimize(tracing.trace(converted, (x, y)))
+  graph(x2, y2)
+
+Tracing assumes that the recorded calls are pure: they may run in a different
+order, fewer times, or at optimization time in the case of constants.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import array
+import operator
+import pickle
+
+from pyctr.overloads import py_defaults
+from pyctr.overloads import staging
+
+init = py_defaults.init
+assign = py_defaults.assign
+read = py_defaults.read
+
+# Node kinds.
+INPUT = 0
+CONST = 1
+CALL = 2
+SELECT = 3
+
+_KIND_NAMES = ('input', 'const', 'call', 'select')
+
+
+class TracingError(Exception):
+  pass
+
+
+def _build_list(*elements):
+  return list(elements)
+
+
+def _build_tuple(*elements):
+  return elements
+
+
+class Graph(object):
+  """A graph of operations in a compact, array-backed form.
+
+  Nodes are numbered consecutively in topological order. The arrays below have
+  one entry per node; the inputs of node i are
+  `edges[edge_offsets[i]:edge_offsets[i + 1]]`.
+
+  Attributes:
+    kinds: array of int, one of INPUT, CONST, CALL or SELECT.
+    data: array of int. For INPUT, the position of the argument; for CONST,
+      an index in constants; for CALL, an index in functions.
+    edge_offsets: array of int, see above.
+    edges: array of int, the node ids of the inputs of all nodes.
+    constants: List[Any], the values of the constant nodes.
+    functions: List[Tuple[Callable, Tuple[Text, ...]]], the functions called by
+      call nodes, and the names of their keyword arguments. The last inputs of
+      a call node are the values of the keyword arguments.
+    output: int, the id of the node computing the result.
+    num_inputs: int, the number of arguments of the graph.
+  """
+
+  def __init__(self):
+    self.kinds = array.array('b')
+    self.data = array.array('i')
+    self.edge_offsets = array.array('i', [0])
+    self.edges = array.array('i')
+    self.constants = []
+    self.functions = []
+    self.output = -1
+    self.num_inputs = 0
+    self._function_ids = {}
+    self._plan = None
+
+  def __len__(self):
+    return len(self.kinds)
+
+  def inputs_of(self, node):
+    return self.edges[self.edge_offsets[node]:self.edge_offsets[node + 1]]
+
+  def _add(self, kind, data, inputs):
+    for i in inputs:
+      if not 0 <= i < len(self.kinds):
+        raise ValueError('invalid input node {}'.format(i))
+    self.kinds.append(kind)
+    self.data.append(data)
+    self.edges.extend(inputs)
+    self.edge_offsets.append(len(self.edges))
+    self._plan = None
+    return len(self.kinds) - 1
+
+  def add_input(self, position):
+    self.num_inputs = max(self.num_inputs, position + 1)
+    return self._add(INPUT, position, ())
+
+  def add_const(self, value):
+    self.constants.append(value)
+    return self._add(CONST, len(self.constants) - 1, ())
+
+  def add_call(self, func, inputs, keywords=()):
+    """Adds a call node.
+
+    Args:
+      func: Callable
+      inputs: Sequence[int], the ids of the nodes computing the arguments,
+        positional arguments first, followed by the keyword arguments.
+      keywords: Tuple[Text, ...], the names of the keyword arguments, which
+        correspond to the last inputs.
+
+    Returns:
+      int, the id of the new node.
+    """
+    keywords = tuple(keywords)
+    if len(keywords) > len(inputs):
+      raise ValueError('more keywords than inputs')
+    key = (id(func), keywords)
+    index = self._function_ids.get(key)
+    if index is None:
+      index = len(self.functions)
+      self.functions.append((func, keywords))
+      self._function_ids[key] = index
+    return self._add(CALL, index, inputs)
+
+  def add_select(self, cond, true_node, false_node):
+    return self._add(SELECT, 0, (cond, true_node, false_node))
+
+  def _compile(self):
+    """Returns a list of (kind, operand, inputs) tuples, one per node."""
+    plan = []
+    for node in range(len(self.kinds)):
+      kind = self.kinds[node]
+      inputs = tuple(self.inputs_of(node))
+      if kind == CONST:
+        operand = self.constants[self.data[node]]
+      elif kind == CALL:
+        func, keywords = self.functions[self.data[node]]
+        operand = (func, keywords, len(inputs) - len(keywords))
+      else:
+        operand = self.data[node]
+      plan.append((kind, operand, inputs))
+    return plan
+
+  def __call__(self, *args):
+    """Replays the graph on new arguments."""
+    if len(args) != self.num_inputs:
+      raise TypeError('graph takes {} arguments, got {}'.format(
+          self.num_inputs, len(args)))
+    if self._plan is None:
+      self._plan = self._compile()
+    values = []
+    append = values.append
+    for kind, operand, inputs in self._plan:
+      if kind == CALL:
+        func, keywords, num_args = operand
+        if keywords:
+          kwargs = {
+              k: values[i] for k, i in zip(keywords, inputs[num_args:])
+          }
+          append(func(*[values[i] for i in inputs[:num_args]], **kwargs))
+        else:
+          append(func(*[values[i] for i in inputs]))
+      elif kind == CONST:
+        append(operand)
+      elif kind == SELECT:
+        cond, true_node, false_node = inputs
+        append(values[true_node] if values[cond] else values[false_node])
+      else:
+        append(args[operand])
+    return values[self.output]
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    del state['_function_ids']
+    del state['_plan']
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._plan = None
+    self._function_ids = {(id(func), keywords): i
+                          for i, (func, keywords) in enumerate(self.functions)}
+
+  def dumps(self):
+    """Serializes the graph.
+
+    The functions and constants are pickled, so functions must be importable
+    by name, and constants picklable.
+
+    Returns:
+      bytes
+    """
+    return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+  def __str__(self):
+    lines = []
+    for node in range(len(self.kinds)):
+      kind = self.kinds[node]
+      inputs = ', '.join('%{}'.format(i) for i in self.inputs_of(node))
+      if kind == INPUT:
+        rhs = 'input {}'.format(self.data[node])
+      elif kind == CONST:
+        rhs = 'const {!r}'.format(self.constants[self.data[node]])
+      elif kind == CALL:
+        func, keywords = self.functions[self.data[node]]
+        name = getattr(func, '__name__', repr(func))
+        if keywords:
+          rhs = '{}({}; {})'.format(name, inputs, ', '.join(keywords))
+        else:
+          rhs = '{}({})'.format(name, inputs)
+      else:
+        rhs = '{}({})'.format(_KIND_NAMES[kind], inputs)
+      lines.append('%{} = {}'.format(node, rhs))
+    lines.append('return %{}'.format(self.output))
+    return '\n'.join(lines)
+
+
+def loads(data):
+  """Deserializes a graph written by Graph.dumps."""
+  graph = pickle.loads(data)
+  if not isinstance(graph, Graph):
+    raise ValueError('expected a Graph, got {}'.format(type(graph)))
+  return graph
+
+
+class Tracer(object):
+  """Stands in for the value computed by a node of a graph being traced.
+
+  Operators applied to tracers record call nodes. Tracers can't be converted
+  to concrete values, e.g. by `bool` or `len`.
+  """
+
+  __slots__ = ('graph', 'node')
+
+  def __init__(self, graph, node):
+    self.graph = graph
+    self.node = node
+
+  def __repr__(self):
+    return '<Tracer %{}>'.format(self.node)
+
+  def __hash__(self):
+    return id(self)
+
+  def __bool__(self):
+    raise TracingError(
+        'the truth value of a traced value is unknown until the graph runs;'
+        ' only if statements, and, or and not may depend on it')
+
+  __nonzero__ = __bool__
+
+  def __len__(self):
+    raise TracingError('the length of a traced value is unknown')
+
+  def __iter__(self):
+    raise TracingError('traced values can not be iterated over')
+
+  def __getattr__(self, name):
+    if name.startswith('__'):
+      raise AttributeError(name)
+    return _record(getattr, (self, name), {})
+
+
+def _binary_operator(op):
+
+  def method(self, other):
+    return _record(op, (self, other), {})
+
+  def reflected(self, other):
+    return _record(op, (other, self), {})
+
+  return method, reflected
+
+
+def _unary_operator(op):
+
+  def method(self):
+    return _record(op, (self,), {})
+
+  return method
+
+
+for _name, _op in (('add', operator.add), ('sub', operator.sub),
+                   ('mul', operator.mul), ('truediv', operator.truediv),
+                   ('floordiv', operator.floordiv), ('mod', operator.mod),
+                   ('pow', operator.pow), ('matmul', operator.matmul),
+                   ('and', operator.and_), ('or', operator.or_),
+                   ('xor', operator.xor), ('lshift', operator.lshift),
+                   ('rshift', operator.rshift)):
+  _method, _reflected = _binary_operator(_op)
+  setattr(Tracer, '__{}__'.format(_name), _method)
+  setattr(Tracer, '__r{}__'.format(_name), _reflected)
+
+for _name, _op in (('lt', operator.lt), ('le', operator.le),
+                   ('eq', operator.eq), ('ne', operator.ne),
+                   ('gt', operator.gt), ('ge', operator.ge),
+                   ('getitem', operator.getitem)):
+  setattr(Tracer, '__{}__'.format(_name), _binary_operator(_op)[0])
+
+for _name, _op in (('neg', operator.neg), ('pos', operator.pos),
+                   ('abs', operator.abs), ('invert', operator.invert)):
+  setattr(Tracer, '__{}__'.format(_name), _unary_operator(_op))
+
+
+def _find_graph(values):
+  """Returns the graph of the first tracer found in values, or None."""
+  for v in values:
+    if isinstance(v, Tracer):
+      return v.graph
+    if isinstance(v, (list, tuple)):
+      graph = _find_graph(v)
+      if graph is not None:
+        return graph
+  return None
+
+
+def _as_node(graph, value):
+  """Returns the id of a node computing value, adding nodes if needed."""
+  if isinstance(value, Tracer):
+    if value.graph is not graph:
+      raise TracingError('{} belongs to a different trace'.format(value))
+    return value.node
+  if isinstance(value, (list, tuple)) and _find_graph(value) is not None:
+    builder = _build_list if isinstance(value, list) else _build_tuple
+    return graph.add_call(builder, [_as_node(graph, v) for v in value])
+  return graph.add_const(value)
+
+
+def _record(func, args, kwargs):
+  graph = _find_graph(tuple(args) + tuple(kwargs.values()))
+  keywords = tuple(kwargs)
+  inputs = [_as_node(graph, a) for a in args]
+  inputs.extend(_as_node(graph, kwargs[k]) for k in keywords)
+  return Tracer(graph, graph.add_call(func, inputs, keywords))
+
+
+def call(func, args, kwargs):
+  if isinstance(func, Tracer):
+    raise TracingError('traced values can not be called')
+  if _find_graph(tuple(args) + tuple(kwargs.values())) is None:
+    return func(*args, **kwargs)
+  return _record(func, args, kwargs)
+
+
+def _select(graph, cond, true_value, false_value):
+  if true_value is false_value:
+    return true_value
+  return Tracer(
+      graph,
+      graph.add_select(cond.node, _as_node(graph, true_value),
+                       _as_node(graph, false_value)))
+
+
+def if_stmt(cond, body, orelse, local_writes):
+  """Traces both branches of conditionals on traced values."""
+  cond_result = cond()
+  if not isinstance(cond_result, Tracer):
+    return py_defaults.if_stmt(lambda: cond_result, body, orelse, local_writes)
+
+  body_vals, _ = staging.execute_isolated(body, local_writes)
+  orelse_vals, _ = staging.execute_isolated(orelse, local_writes)
+  for var, body_val, orelse_val in zip(local_writes, body_vals, orelse_vals):
+    undefined = py_defaults.is_undefined(body_val), py_defaults.is_undefined(
+        orelse_val)
+    if any(undefined):
+      if all(undefined):
+        continue
+      raise TracingError(
+          '{} must be defined in both branches of a conditional on a traced'
+          ' value'.format(var.name))
+    var.val = _select(cond_result.graph, cond_result, body_val, orelse_val)
+
+
+def _check_concrete(value, statement):
+  if isinstance(value, Tracer):
+    raise TracingError(
+        '{} loops can not depend on traced values; only their body is traced'
+        .format(statement))
+  return value
+
+
+def while_stmt(cond, body, orelse, local_writes):
+  py_defaults.while_stmt(lambda: _check_concrete(cond(), 'while'), body,
+                         orelse, local_writes)
+
+
+def for_stmt(target, iter_, body, orelse, local_writes):
+  py_defaults.for_stmt(target, _check_concrete(iter_, 'for'), body, orelse,
+                       local_writes)
+
+
+def and_(x, operands):
+  for op in operands:
+    if isinstance(x, Tracer):
+      x = _select(x.graph, x, op(), x)
+    elif not x:
+      return x
+    else:
+      x = op()
+  return x
+
+
+def or_(x, operands):
+  for op in operands:
+    if isinstance(x, Tracer):
+      x = _select(x.graph, x, x, op())
+    elif x:
+      return x
+    else:
+      x = op()
+  return x
+
+
+def not_(x):
+  if isinstance(x, Tracer):
+    return _record(operator.not_, (x,), {})
+  return not x
+
+
+def trace(func, args, static_argnums=()):
+  """Traces a converted function into a graph.
+
+  Args:
+    func: Callable, converted with this overload module.
+    args: Sequence, the arguments to trace func with. Each becomes an input of
+      the graph, except the static ones; the values of the others are not
+      used.
+    static_argnums: Iterable[int], the positions of the arguments which are not
+      traced. The graph is specialized to their values, and doesn't take them
+      as arguments.
+
+  Returns:
+    Graph, computing func on its non-static arguments.
+  """
+  static_argnums = frozenset(static_argnums)
+  graph = Graph()
+  traced_args = []
+  for i, arg in enumerate(args):
+    if i in static_argnums:
+      traced_args.append(arg)
+    else:
+      traced_args.append(Tracer(graph, graph.add_input(graph.num_inputs)))
+  graph.output = _as_node(graph, func(*traced_args))
+  return graph
+
+
+def _copy_nodes(graph, nodes, remap, result):
+  """Appends nodes of graph to result, renaming inputs with remap."""
+  for node in nodes:
+    kind = graph.kinds[node]
+    inputs = [remap[i] for i in graph.inputs_of(node)]
+    if kind == INPUT:
+      remap[node] = result.add_input(graph.data[node])
+    elif kind == CONST:
+      remap[node] = result.add_const(graph.constants[graph.data[node]])
+    elif kind == CALL:
+      func, keywords = graph.functions[graph.data[node]]
+      remap[node] = result.add_call(func, inputs, keywords)
+    else:
+      remap[node] = result.add_select(*inputs)
+
+
+def eliminate_dead_code(graph):
+  """Returns a copy of graph without the nodes its output doesn't use.
+
+  Inputs are always kept, so that the graph keeps its signature.
+
+  Args:
+    graph: Graph
+
+  Returns:
+    Graph
+  """
+  live = bytearray(len(graph))
+  live[graph.output] = 1
+  for node in range(len(graph) - 1, -1, -1):
+    if graph.kinds[node] == INPUT:
+      live[node] = 1
+    if live[node]:
+      for i in graph.inputs_of(node):
+        live[i] = 1
+
+  result = Graph()
+  remap = {}
+  _copy_nodes(graph, [n for n in range(len(graph)) if live[n]], remap, result)
+  result.num_inputs = graph.num_inputs
+  result.output = remap[graph.output]
+  return result
+
+
+def _const_key(value):
+  try:
+    hash(value)
+  except TypeError:
+    return (id(value),)
+  return (type(value), value)
+
+
+def eliminate_common_subexpressions(graph):
+  """Returns a copy of graph in which identical nodes are merged.
+
+  Nodes are identical if they call the same function on the same inputs, or
+  are equal constants. Unhashable constants are only merged with themselves.
+
+  Args:
+    graph: Graph
+
+  Returns:
+    Graph
+  """
+  result = Graph()
+  remap = {}
+  seen = {}
+  for node in range(len(graph)):
+    kind = graph.kinds[node]
+    inputs = tuple(remap[i] for i in graph.inputs_of(node))
+    if kind == CONST:
+      key = (kind,) + _const_key(graph.constants[graph.data[node]])
+    elif kind == CALL:
+      func, keywords = graph.functions[graph.data[node]]
+      key = (kind, id(func), keywords, inputs)
+    else:
+      key = (kind, graph.data[node], inputs)
+    if key in seen:
+      remap[node] = seen[key]
+    else:
+      _copy_nodes(graph, (node,), remap, result)
+      seen[key] = remap[node]
+  result.num_inputs = graph.num_inputs
+  result.output = remap[graph.output]
+  return eliminate_dead_code(result)
+
+
+def fold_constants(graph):
+  """Returns a copy of graph in which nodes with constant inputs are computed.
+
+  Selects with a constant condition are replaced by the selected input. Calls
+  which raise an exception are left to raise when the graph runs.
+
+  Args:
+    graph: Graph
+
+  Returns:
+    Graph
+  """
+  result = Graph()
+  remap = {}
+  for node in range(len(graph)):
+    kind = graph.kinds[node]
+    inputs = [remap[i] for i in graph.inputs_of(node)]
+    const_inputs = all(result.kinds[i] == CONST for i in inputs)
+    if kind == SELECT and result.kinds[inputs[0]] == CONST:
+      cond = result.constants[result.data[inputs[0]]]
+      remap[node] = inputs[1] if cond else inputs[2]
+    elif kind == CALL and const_inputs:
+      func, keywords = graph.functions[graph.data[node]]
+      values = [result.constants[result.data[i]] for i in inputs]
+      num_args = len(values) - len(keywords)
+      try:
+        value = func(*values[:num_args], **dict(zip(keywords,
+                                                    values[num_args:])))
+      except Exception:  # pylint:disable=broad-except
+        _copy_nodes(graph, (node,), remap, result)
+      else:
+        remap[node] = result.add_const(value)
+    else:
+      _copy_nodes(graph, (node,), remap, result)
+  result.num_inputs = graph.num_inputs
+  result.output = remap[graph.output]
+  return eliminate_dead_code(result)
+
+
+def optimize(graph):
+  """Applies constant folding, CSE and dead code elimination to graph."""
+  return eliminate_common_subexpressions(fold_constants(graph))
@@ -0,0 +1,170 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tracing module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import operator
+
+from absl.testing import absltest as test
+from pyctr.api import conversion
+from pyctr.overloads import tracing
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import logical_ops
+from pyctr.transformers.virtualization import variables
+
+TRANSFORMERS = [variables, functions, logical_ops, control_flow]
+
+
+def polynomial(x, n):
+  total = 0
+  for i in range(n):
+    total = total + x**i
+  return total
+
+
+def clipped(x, lo, hi):
+  y = x
+  if x < lo:
+    y = lo
+  else:
+    if x > hi:
+      y = hi
+  return y
+
+
+def redundant(x):
+  unused = abs(x) * 3
+  a = abs(x) + abs(x)
+  b = max(x, 2 + 3)
+  return a, [b, unused is None]
+
+
+def in_range(x, lo, hi):
+  return x >= lo and x <= hi and not x == 0
+
+
+def data_dependent_loop(x):
+  while x > 0:
+    x = x - 1
+  return x
+
+
+def _count_calls(graph, func):
+  return sum(1 for node in range(len(graph))
+             if graph.kinds[node] == tracing.CALL and
+             graph.functions[graph.data[node]][0] is func)
+
+
+class TracingTest(test.TestCase):
+
+  def _trace(self, func, *args, **kwargs):
+    converted = conversion.convert(func, tracing, TRANSFORMERS)
+    return tracing.trace(converted, args, **kwargs)
+
+  def test_unrolls_loops(self):
+    graph = self._trace(polynomial, 'x', 3, static_argnums=(1,))
+
+    self.assertEqual(graph.num_inputs, 1)
+    self.assertEqual(_count_calls(graph, operator.pow), 3)
+    for x in (-2, 0, 1.5, 3):
+      self.assertEqual(graph(x), polynomial(x, 3))
+
+  def test_conditionals(self):
+    graph = self._trace(clipped, 'x', 'lo', 'hi')
+
+    self.assertEqual(list(graph.kinds).count(tracing.SELECT), 2)
+    for x in (-5, 0, 5, 10, 15):
+      self.assertEqual(graph(x, 0, 10), clipped(x, 0, 10))
+
+  def test_logical_ops(self):
+    graph = self._trace(in_range, 'x', 'lo', 'hi')
+
+    for x in (-1, 0, 1, 5):
+      self.assertEqual(graph(x, -1, 3), in_range(x, -1, 3))
+
+  def test_data_dependent_loop(self):
+    with self.assertRaises(tracing.TracingError):
+      self._trace(data_dependent_loop, 'x')
+
+  def test_optimize(self):
+    graph = self._trace(redundant, 'x')
+    optimized = tracing.optimize(graph)
+
+    self.assertEqual(_count_calls(graph, abs), 3)
+    self.assertEqual(_count_calls(optimized, abs), 1)
+    self.assertLess(len(optimized), len(graph))
+    for x in (-3, 4):
+      self.assertEqual(optimized(x), graph(x))
+      self.assertEqual(optimized(x), redundant(x))
+
+  def test_fold_constants(self):
+    graph = tracing.Graph()
+    x = graph.add_input(0)
+    cond = graph.add_call(operator.gt, [graph.add_const(2), graph.add_const(1)])
+    doubled = graph.add_call(operator.mul, [x, graph.add_const(2)])
+    graph.output = graph.add_select(cond, doubled, x)
+
+    folded = tracing.fold_constants(graph)
+
+    self.assertEqual(list(folded.kinds),
+                     [tracing.INPUT, tracing.CONST, tracing.CALL])
+    self.assertEqual(folded(4), 8)
+
+  def test_eliminate_dead_code_keeps_inputs(self):
+    graph = tracing.Graph()
+    graph.add_input(0)
+    graph.output = graph.add_input(1)
+
+    pruned = tracing.eliminate_dead_code(graph)
+
+    self.assertEqual(pruned.num_inputs, 2)
+    self.assertEqual(pruned(1, 2), 2)
+
+  def test_keyword_arguments(self):
+
+    def f(x):
+      return round(x, ndigits=1)
+
+    graph = self._trace(f, 'x')
+
+    self.assertEqual(graph(1.26), 1.3)
+    self.assertIn('round(%0, %1; ndigits)', str(graph))
+
+  def test_serialization(self):
+    graph = tracing.optimize(self._trace(clipped, 'x', 'lo', 'hi'))
+
+    restored = tracing.loads(graph.dumps())
+
+    self.assertEqual(str(restored), str(graph))
+    self.assertEqual(restored(12, 0, 10), 10)
+
+  def test_concretization_errors(self):
+
+    def f(x):
+      return len(str(bool(x)))
+
+    graph = self._trace(f, 'x')
+    with self.assertRaises(tracing.TracingError):
+      bool(tracing.Tracer(graph, 0))
+    # Calls on traced values are recorded rather than executed.
+    self.assertEqual(graph(0), 5)
+
+
+if __name__ == '__main__':
+  test.main()
@@ -20,6 +20,7 @@ from __future__ import print_function
 
 import gast
 from pyctr.core import anno
+from pyctr.core import ast_util
 from pyctr.core import parsing
 from pyctr.core import pretty_printer
 from pyctr.sct import templates
@@ -58,7 +59,8 @@ class EntityInfo(object):
 class Context(object):
   """Contains information about a source code transformation.
 
-  This object is mutable, and is updated during conversion. Not thread safe.
+  This object is mutable, and is updated during conversion. Not thread safe;
+  each conversion creates its own Context.
 
   Attributes:
     info: EntityInfo, immutable.
@@ -75,7 +77,8 @@ class Context(object):
 class EntityContext(Context):
   """Tracks the conversion of a single entity.
 
-  This object is mutable, and is updated during conversion. Not thread safe.
+  This object is mutable, and is updated during conversion. Not thread safe;
+  each conversion creates its own EntityContext, along with its Namer.
 
   Attributes:
     namer: Namer
@@ -188,6 +191,23 @@ class _State(object):
     return self._value[key]
 
 
+def _inherit_origin(nodes, origin):
+  """Annotates nodes which don't have an origin, and their children."""
+  if not isinstance(nodes, (list, tuple)):
+    nodes = (nodes,)
+  to_visit = list(nodes)
+  while to_visit:
+    n = to_visit.pop()
+    if not isinstance(n, gast.AST) or isinstance(n, gast.expr_context):
+      continue
+    # Nodes which have an origin came from the original code, and so did
+    # their children.
+    if anno.hasanno(n, anno.Basic.ORIGIN):
+      continue
+    anno.setanno(n, anno.Basic.ORIGIN, origin)
+    to_visit.extend(gast.iter_child_nodes(n))
+
+
 class Base(gast.NodeTransformer):
   """Base class for general-purpose code transformers.
 
@@ -435,4 +455,63 @@ class Base(gast.NodeTransformer):
     if did_enter_function:
       self._enclosing_entities.pop()
 
+    # Generated code inherits the origin of the code it replaces, so that it
+    # can be mapped back to its source.
+    if (result is not node and result is not None and
+        anno.hasanno(node, anno.Basic.ORIGIN)):
+      _inherit_origin(result, anno.getanno(node, anno.Basic.ORIGIN))
+
     return result
+
+
+class FunctionScopedBase(Base):
+  """Base class for transformers which track the names used by functions.
+
+  While the body of a function is visited, the attributes below include the
+  names of that function and the functions enclosing it.
+
+  Attributes:
+    local_names: Set[Text], the names assigned, deleted or declared as
+      parameters, which may shadow globals such as modules.
+    reserved_names: Set[Text], all the names, which new symbols must avoid.
+  """
+
+  def __init__(self, entity_info):
+    super(FunctionScopedBase, self).__init__(entity_info)
+    self.local_names = set()
+    self.reserved_names = set()
+
+  def visit_FunctionDef(self, node):
+    outer_names = self.local_names, self.reserved_names
+    names = ast_util.name_nodes(node)
+    self.local_names = self.local_names | set(
+        n.id for n in names if not isinstance(n.ctx, gast.Load))
+    self.reserved_names = self.reserved_names | set(n.id for n in names)
+    node = self.generic_visit(node)
+    self.local_names, self.reserved_names = outer_names
+    return node
+
+
+class Configured(object):
+  """A transformer module whose transform function takes extra arguments.
+
+  Instances may be passed in the list of transformers to conversion.convert,
+  in place of modules. They can be pickled, e.g. by conversion.convert_many,
+  when the transform function is defined at the top level of its module.
+
+  Example:
+
+    def with_budget(max_iterations):
+      return transformer.Configured(_transform, max_iterations=max_iterations)
+
+  Attributes:
+    options: Dict[Text, Any], the keyword arguments passed to the transform
+      function, after the node, context and overload.
+  """
+
+  def __init__(self, transform_fn, **options):
+    self._transform_fn = transform_fn
+    self.options = options
+
+  def transform(self, node, ctx, overload):
+    return self._transform_fn(node, ctx, overload, **self.options)
@@ -265,6 +265,50 @@ class TransformerTest(test.TestCase):
     expected_substring = 'I blew up'
     self.assertIn(expected_substring, obtained_message, obtained_message)
 
+  def test_function_scoped_names(self):
+
+    class TestTransformer(transformer.FunctionScopedBase):
+
+      def visit_Return(self, node):
+        anno.setanno(node, 'local_names', self.local_names)
+        anno.setanno(node, 'reserved_names', self.reserved_names)
+        return node
+
+    def test_function(a):
+      b = abs(a)
+
+      def inner(c):
+        return c + b
+
+      return inner
+
+    tr = TestTransformer(self._simple_source_info())
+    node, _ = parsing.parse_entity(test_function)
+    node = tr.visit(node)
+
+    fn_body = node.body[0].body
+    inner_return = fn_body[1].body[0]
+    outer_return = fn_body[2]
+    self.assertSetEqual(
+        anno.getanno(outer_return, 'local_names'), {'a', 'b', 'c'})
+    self.assertSetEqual(
+        anno.getanno(outer_return, 'reserved_names'),
+        {'a', 'abs', 'b', 'c', 'inner'})
+    self.assertSetEqual(
+        anno.getanno(inner_return, 'local_names'), {'a', 'b', 'c'})
+    self.assertEmpty(tr.local_names)
+    self.assertEmpty(tr.reserved_names)
+
+  def test_configured(self):
+
+    def transform(node, ctx, overload, scale):
+      return node, ctx, overload, scale
+
+    configured = transformer.Configured(transform, scale=2)
+    self.assertEqual(configured.transform('node', 'ctx', 'overload'),
+                     ('node', 'ctx', 'overload', 2))
+    self.assertDictEqual(configured.options, {'scale': 2})
+
 
 if __name__ == '__main__':
   test.main()
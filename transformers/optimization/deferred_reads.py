@@ -0,0 +1,126 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Marks the reads of variables whose value is only passed along.
+
+In virtualized code, a read like `overload.read(x)` which is the value of an
+assignment, an argument of a call, or a returned value or tuple element, does
+not use the value of x itself. These reads are replaced with
+`overload.read_deferred(x)`, so that overloads whose values are computed
+asynchronously can pass them along without waiting for them:
+
+  overload.assign(y, overload.read(x))
+  overload.call(f, (overload.read(y),), {})
+
+becomes:
+
+  overload.assign(y, overload.read_deferred(x))
+  overload.call(f, (overload.read_deferred(y),), {})
+
+The other reads, like operands, conditions or the receivers of method calls,
+are left unchanged. Only the returns of the converted function itself are
+deferred: nested functions, like the test functions which the control_flow
+transformer generates, may return values which the overload uses, for
+instance as a condition.
+
+If the overload module also has a `call_deferred` function, calls in the same
+positions, or whose value is discarded, are likewise replaced with
+`overload.call_deferred`. `overload.call` must then return a value which can
+be used directly, and `overload.call_deferred` may return one which is only
+computed later:
+
+  overload.assign(y, overload.call(f, (), {}))
+  overload.call(g, (overload.call(f, (), {}),), {})
+
+becomes:
+
+  overload.assign(y, overload.call_deferred(f, (), {}))
+  overload.call_deferred(g, (overload.call_deferred(f, (), {}),), {})
+
+The transformer does nothing unless the overload module has a
+`read_deferred` function. It must run after the variables and functions
+transformers.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gast
+from pyctr.core import ast_util
+from pyctr.sct import transformer
+
+
+class DeferredReadTransformer(transformer.Base):
+  """Replaces the reads which only forward values with read_deferred."""
+
+  def __init__(self, ctx, overload):
+    super(DeferredReadTransformer, self).__init__(ctx.info)
+    self.overload = overload
+    self._defer_calls = hasattr(overload.module, 'call_deferred')
+    self._function_depth = 0
+
+  def _defer(self, node):
+    """Returns node, deferred if it is a read or a call."""
+    overload_name = self.overload.symbol_name
+    if ast_util.is_overload_call(node, overload_name, 'read'):
+      node.func.attr = 'read_deferred'
+    elif (self._defer_calls and
+          ast_util.is_overload_call(node, overload_name, 'call')):
+      node.func.attr = 'call_deferred'
+    return node
+
+  def visit_Call(self, node):
+    node = self.generic_visit(node)
+    overload_name = self.overload.symbol_name
+    if (ast_util.is_overload_call(node, overload_name, 'assign') and
+        len(node.args) == 2):
+      node.args[1] = self._defer(node.args[1])
+    elif (ast_util.is_overload_call(node, overload_name, 'call') and
+          len(node.args) == 3):
+      args, keywords = node.args[1:]
+      if isinstance(args, gast.Tuple):
+        args.elts = [self._defer(a) for a in args.elts]
+      if isinstance(keywords, gast.Dict):
+        keywords.values = [self._defer(v) for v in keywords.values]
+    return node
+
+  def visit_Expr(self, node):
+    node = self.generic_visit(node)
+    # Nothing uses the values of expression statements.
+    node.value = self._defer(node.value)
+    return node
+
+  def visit_FunctionDef(self, node):
+    self._function_depth += 1
+    node = self.generic_visit(node)
+    self._function_depth -= 1
+    return node
+
+  def visit_Return(self, node):
+    node = self.generic_visit(node)
+    if self._function_depth > 1:
+      return node
+    # The elements of returned tuples are also passed along as they are.
+    if isinstance(node.value, gast.Tuple):
+      node.value.elts = [self._defer(elt) for elt in node.value.elts]
+    elif node.value is not None:
+      node.value = self._defer(node.value)
+    return node
+
+
+def transform(node, ctx, overload):
+  if not hasattr(overload.module, 'read_deferred'):
+    return node
+  return DeferredReadTransformer(ctx, overload).visit(node)
@@ -0,0 +1,69 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for deferred_reads module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import types
+
+from absl.testing import absltest as test
+from pyctr.api import conversion
+from pyctr.overloads import py_defaults
+from pyctr.transformers.optimization import deferred_reads
+from pyctr.transformers.virtualization import functions
+from pyctr.transformers.virtualization import variables
+
+
+class Box(object):
+
+  def __init__(self, value):
+    self.value = value
+
+
+def forward(x):
+  y = x
+  z = abs(y)
+  return y + z, x, z
+
+
+class DeferredReadsTest(test.TestCase):
+
+  def test_forwarding_reads_deferred(self):
+    overload = types.ModuleType('boxing')
+    overload.init = py_defaults.init
+    overload.assign = py_defaults.assign
+    overload.read = lambda var: py_defaults.read(var).value
+    overload.read_deferred = py_defaults.read
+    overload.call = lambda f, args, kwargs: Box(f(*[a.value for a in args]))
+
+    converted = conversion.convert(forward, overload,
+                                   [variables, functions, deferred_reads])
+    total, x, z = converted(Box(-2))
+
+    self.assertEqual(total, 0)
+    self.assertIsInstance(x, Box)
+    self.assertIsInstance(z, Box)
+    self.assertEqual(z.value, 2)
+
+  def test_requires_read_deferred(self):
+    converted = conversion.convert(forward, py_defaults,
+                                   [variables, functions, deferred_reads])
+    self.assertEqual(converted(-2), (0, -2, 2))
+
+
+if __name__ == '__main__':
+  test.main()
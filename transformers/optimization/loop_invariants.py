@@ -0,0 +1,380 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Hoists loop invariant calls to pure functions out of loops.
+
+The calls are assigned to new variables before the loop:
+
+  for x in xs:
+    y = y + np.dot(x, w) + np.sum(b)
+
+becomes:
+
+  if not isinstance(xs, (bool, int, float, str, list, tuple, range, dict,
+                         set, frozenset)) or bool(xs):
+    loop_invariant = np.sum(b)
+  for x in xs:
+    y = y + np.dot(x, w) + loop_invariant
+
+The guard keeps the hoisted calls from running, or raising, when a loop over
+a Python value runs no iterations. Other values, like tensors, may be loops
+which the overloads stage, so the calls always run for them, and the guard
+is a plain Python conditional. The guard of a while loop evaluates its test
+once more, so calls are only hoisted from the body of while loops whose test
+only calls pure functions. Calls in the test of a while loop always run at
+least once, and are assigned before the loop unguarded. Calls hoisted from an
+inner loop which are also invariant in the outer loop move to the guard of the
+outer loop.
+
+A call is hoisted when the function is on the pure function allowlist, and
+none of the variables it reads may change in the loop, either directly or
+through an alias assigned elsewhere in the function.
+
+This transformer must run before the virtualization transformers, e.g.:
+
+  conversion.convert(f, overloads, [loop_invariants, variables, control_flow])
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gast
+from pyctr.analysis import activity
+from pyctr.core import anno
+from pyctr.core import ast_util
+from pyctr.core import qual_names
+from pyctr.sct import templates
+from pyctr.sct import transformer
+
+_NUMPY_FUNCTIONS = ('abs', 'absolute', 'amax', 'amin', 'argmax', 'argmin',
+                    'cos', 'dot', 'exp', 'inner', 'linalg.inv', 'linalg.norm',
+                    'log', 'matmul', 'max', 'maximum', 'mean', 'min',
+                    'minimum', 'outer', 'prod', 'shape', 'sin', 'size', 'sqrt',
+                    'square', 'std', 'sum', 'tanh', 'var')
+_MATH_FUNCTIONS = ('cos', 'exp', 'floor', 'ceil', 'log', 'pow', 'sin', 'sqrt',
+                   'tan', 'tanh')
+_BUILTIN_FUNCTIONS = ('abs', 'bool', 'float', 'int', 'len', 'max', 'min',
+                      'round')
+
+# The dotted names of the functions which may be hoisted. They must be pure,
+# and return new values rather than views of their arguments, since the
+# hoisted value is shared by all iterations.
+PURE_FUNCTIONS = frozenset(
+    ['np.' + f for f in _NUMPY_FUNCTIONS] +
+    ['numpy.' + f for f in _NUMPY_FUNCTIONS] +
+    ['math.' + f for f in _MATH_FUNCTIONS] + list(_BUILTIN_FUNCTIONS))
+
+_SCOPED_NODES = (gast.Lambda, gast.ListComp, gast.SetComp, gast.DictComp,
+                 gast.GeneratorExp, gast.FunctionDef, gast.ClassDef)
+
+
+class LoopInvariantTransformer(transformer.FunctionScopedBase):
+  """Hoists loop invariant calls to pure functions out of for and while loops.
+
+  Attributes:
+    ctx: transformer.EntityContext
+    overload: overloads.Overload
+    pure_functions: FrozenSet[Text], the dotted names of the functions which
+      may be hoisted.
+  """
+
+  def __init__(self, ctx, overload, pure_functions):
+    super(LoopInvariantTransformer, self).__init__(ctx.info)
+    self.ctx = ctx
+    self.overload = overload
+    self.pure_functions = frozenset(pure_functions)
+    self._aliases = {}
+    self._hoisted_assigns = set()
+    self._guards = {}
+
+  def _is_pure_call(self, node):
+    name = ast_util.dotted_name(node.func)
+    if name is None or name not in self.pure_functions:
+      return False
+    # A local variable shadowing the function, e.g. a parameter named `np`.
+    return name.split('.')[0] not in self.local_names
+
+  def _variant_names(self, node):
+    """Returns the names of the variables which may change in the loop.
+
+    These are the variables assigned in the loop, the ones which may be
+    mutated through an alias: those passed to functions not on the
+    allowlist, used as method receivers, or assigned to other variables, and
+    the ones which may alias any of these.
+
+    Args:
+      node: Union[gast.For, gast.While]
+
+    Returns:
+      Set[Text]
+    """
+    body_scope = anno.getanno(node, anno.Static.BODY_SCOPE)
+    names = set(str(qn.root) for qn in body_scope.modified)
+    loop_nodes = list(node.body)
+    if isinstance(node, gast.For):
+      names |= ast_util.reference_names(node.target)
+    else:
+      loop_nodes.append(node.test)
+
+    for loop_node in loop_nodes:
+      for n in gast.walk(loop_node):
+        if isinstance(n, gast.Call) and not self._is_pure_call(n):
+          names |= ast_util.reference_names(n.func)
+          for arg in n.args:
+            names |= ast_util.reference_names(arg)
+          for keyword in n.keywords:
+            names |= ast_util.reference_names(keyword.value)
+        elif isinstance(n, (gast.Assign, gast.AugAssign)):
+          names |= ast_util.reference_names(n.value)
+        elif isinstance(n, gast.For):
+          names |= ast_util.reference_names(n.iter)
+        elif isinstance(n, _SCOPED_NODES):
+          names |= set(m.id for m in ast_util.name_nodes(n))
+
+    pending = list(names)
+    while pending:
+      for alias in self._aliases.get(pending.pop(), ()):
+        if alias not in names:
+          names.add(alias)
+          pending.append(alias)
+    return names
+
+  def _is_invariant(self, node, variant):
+    if isinstance(node, gast.Name):
+      return node.id not in variant
+    if isinstance(node, gast.Call):
+      if not self._is_pure_call(node):
+        return False
+      children = list(node.args) + [k.value for k in node.keywords]
+    elif isinstance(node, _SCOPED_NODES + (gast.Yield, gast.YieldFrom,
+                                            gast.Await)):
+      return False
+    else:
+      children = gast.iter_child_nodes(node)
+    return all(self._is_invariant(c, variant) for c in children)
+
+  def _hoist(self, node, by_value, state):
+    """Replaces the hoistable calls in the expression node.
+
+    Args:
+      node: gast.AST, an expression.
+      by_value: bool, whether the value of node is only read by its parent,
+        which therefore can't alias or mutate it.
+      state: Tuple[Set[Text], Dict[Text, Text], List[gast.AST]], the variant
+        names of the loop, the names of the hoisted calls by source, and the
+        assignments of the hoisted calls.
+
+    Returns:
+      gast.AST, the new expression.
+    """
+    variant, hoisted_names, hoisted = state
+    if isinstance(node, gast.Call):
+      if by_value and self._is_invariant(node, variant):
+        key = gast.dump(node)
+        if key not in hoisted_names:
+          name = self.ctx.namer.new_symbol('loop_invariant',
+                                           self.reserved_names)
+          hoisted_names[key] = name
+          hoisted.extend(
+              templates.replace('name = value', name=name, value=node))
+        return gast.Name(id=hoisted_names[key], ctx=gast.Load(),
+                         annotation=None)
+      pure = self._is_pure_call(node)
+      node.args = [self._hoist(a, pure, state) for a in node.args]
+      for keyword in node.keywords:
+        keyword.value = self._hoist(keyword.value, pure, state)
+      return node
+
+    if isinstance(node, gast.BinOp):
+      node.left = self._hoist(node.left, True, state)
+      node.right = self._hoist(node.right, True, state)
+    elif isinstance(node, gast.UnaryOp):
+      node.operand = self._hoist(node.operand, True, state)
+    elif isinstance(node, gast.Compare):
+      node.left = self._hoist(node.left, True, state)
+      node.comparators = [
+          self._hoist(c, True, state) for c in node.comparators
+      ]
+    elif isinstance(node, (gast.BoolOp, gast.IfExp)):
+      # Only the first operand runs unconditionally.
+      if isinstance(node, gast.BoolOp):
+        node.values[0] = self._hoist(node.values[0], False, state)
+      else:
+        node.test = self._hoist(node.test, True, state)
+    elif isinstance(node, gast.Subscript):
+      node.value = self._hoist(node.value, False, state)
+      node.slice = self._hoist(node.slice, True, state)
+    elif isinstance(node, (gast.Index, gast.Slice, gast.ExtSlice)):
+      for field, value in gast.iter_fields(node):
+        if isinstance(value, gast.AST):
+          setattr(node, field, self._hoist(value, True, state))
+        elif isinstance(value, list):
+          setattr(node, field, [self._hoist(v, True, state) for v in value])
+    elif isinstance(node, (gast.Attribute, gast.Starred)):
+      node.value = self._hoist(node.value, False, state)
+    elif isinstance(node, (gast.Tuple, gast.List, gast.Set)):
+      node.elts = [self._hoist(e, False, state) for e in node.elts]
+    return node
+
+  def _hoist_from_statement(self, node, state):
+    """Hoists calls from the parts of a statement run at each iteration."""
+    if isinstance(node, (gast.Assign, gast.Expr, gast.Return)):
+      if node.value is not None:
+        # The values hoisted from the tests of inner loops are only read.
+        by_value = node in self._hoisted_assigns
+        node.value = self._hoist(node.value, by_value, state)
+    elif isinstance(node, gast.AugAssign):
+      node.value = self._hoist(node.value, True, state)
+    elif isinstance(node, (gast.If, gast.While, gast.Assert)):
+      node.test = self._hoist(node.test, True, state)
+    elif isinstance(node, gast.For):
+      node.iter = self._hoist(node.iter, False, state)
+
+  def _is_repeatable(self, node):
+    """Whether the expression node may run once more without side effects."""
+    for n in gast.walk(node):
+      if isinstance(n, gast.Call) and not self._is_pure_call(n):
+        return False
+      if isinstance(n, (gast.Yield, gast.YieldFrom, gast.Await)):
+        return False
+    return True
+
+  def _guarded(self, node, hoisted):
+    """Returns the statements which run the hoisted calls before the loop.
+
+    Args:
+      node: Union[gast.For, gast.While], the loop. The iterable of for loops
+        is replaced with a new variable, unless it is one already.
+      hoisted: List[gast.Assign], the assignments of the hoisted calls.
+
+    Returns:
+      List[gast.AST], the statements to run before the loop.
+    """
+    if isinstance(node, gast.For):
+      value = node.iter
+      prefix = 'loop_iter'
+    else:
+      value = ast_util.copy_clean(node.test)
+      prefix = 'loop_test'
+
+    before = []
+    value_assign = None
+    if not isinstance(value, gast.Name):
+      name = self.ctx.namer.new_symbol(prefix, self.reserved_names)
+      value_assign, = templates.replace('name = value', name=name, value=value)
+      before.append(value_assign)
+      value = gast.Name(id=name, ctx=gast.Load(), annotation=None)
+      if isinstance(node, gast.For):
+        node.iter = value
+        # The loop reads the new variable, so it must stay with the loop.
+        value_assign = None
+
+    guard, = templates.replace(
+        """
+          if not isinstance(value, (bool, int, float, str, list, tuple, range,
+                                    dict, set, frozenset)) or bool(value):
+            hoisted
+        """,
+        value=value,
+        hoisted=hoisted)
+    before.append(guard)
+    self._guards[guard] = value_assign
+    return before
+
+  def _visit_loop(self, node):
+    node = self.generic_visit(node)
+    variant = self._variant_names(node)
+    hoisted_names = {}
+    before = []
+
+    # The test of a while loop runs at least once, so its calls may run
+    # before the loop.
+    if isinstance(node, gast.While):
+      node.test = self._hoist(node.test, True,
+                              (variant, hoisted_names, before))
+      self._hoisted_assigns.update(before)
+      if not self._is_repeatable(node.test):
+        return before + [node] if before else node
+
+    hoisted = []
+    body = []
+    for stmt in node.body:
+      if stmt in self._guards:
+        # The calls hoisted from inner loops may also be invariant in this one,
+        # in which case they need to run at most once for all its iterations.
+        remaining = []
+        for assign in stmt.body:
+          if self._is_invariant(assign.value, variant):
+            hoisted.append(assign)
+          else:
+            remaining.append(assign)
+        stmt.body = remaining
+        if not remaining:
+          if self._guards[stmt] is not None:
+            body.remove(self._guards[stmt])
+          continue
+      else:
+        self._hoist_from_statement(stmt, (variant, hoisted_names, hoisted))
+      body.append(stmt)
+    node.body = body
+
+    if hoisted:
+      before.extend(self._guarded(node, hoisted))
+    if not before:
+      return node
+    return before + [node]
+
+  def visit_For(self, node):
+    return self._visit_loop(node)
+
+  def visit_While(self, node):
+    return self._visit_loop(node)
+
+  def visit_FunctionDef(self, node):
+    outer_aliases = self._aliases
+    self._aliases = ast_util.aliases(node)
+    node = super(LoopInvariantTransformer, self).visit_FunctionDef(node)
+    self._aliases = outer_aliases
+    return node
+
+
+def with_pure_functions(pure_functions):
+  """Returns this transformer, with a custom allowlist.
+
+  Example:
+
+    transformers = [loop_invariants.with_pure_functions(
+        loop_invariants.PURE_FUNCTIONS | {'my_lib.norm'}), variables]
+
+  Args:
+    pure_functions: Iterable[Text], the dotted names of the functions which
+      may be hoisted, as they are called in the converted code.
+
+  Returns:
+    An object which may be passed in the list of transformers to convert.
+  """
+  return transformer.Configured(
+      _transform, pure_functions=frozenset(pure_functions))
+
+
+def _transform(node, ctx, overload, pure_functions):
+  node = qual_names.resolve(node)
+  node = activity.resolve(node, ctx, parent_scope=None, overload=overload)
+  node = LoopInvariantTransformer(ctx, overload, pure_functions).visit(node)
+  return node
+
+
+def transform(node, ctx, overload):
+  return _transform(node, ctx, overload, PURE_FUNCTIONS)
@@ -0,0 +1,169 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for loop_invariants module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest as test
+import numpy as np
+from pyctr.api import conversion
+from pyctr.overloads import py_defaults
+from pyctr.transformers.optimization import loop_invariants
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import variables
+
+calls = []
+
+
+def norm(x):
+  calls.append(x)
+  return np.sqrt(np.sum(x * x))
+
+
+def scaled_sum(xs, w):
+  total = 0.
+  for x in xs:
+    total = total + x / norm(w)
+  return total
+
+
+def count_below(limit, w):
+  i = 0
+  while i * norm(w) < limit:
+    i = i + 1
+  return i
+
+
+def normalize_rows(xs):
+  out = []
+  for x in xs:
+    x = x / norm(x)
+    out.append(x)
+  return out
+
+
+def mutate_in_loop(w, n):
+  total = 0.
+  for _ in range(n):
+    total = total + norm(w)
+    np.add(w, 1., out=w)
+  return total
+
+
+def mutate_alias_in_loop(w, n):
+  v = w
+  total = 0.
+  for _ in range(n):
+    total = total + norm(w)
+    np.add(v, 1., out=v)
+  return total
+
+
+def sum_inverse(xs, w):
+  total = 0.
+  for x in xs:
+    total = total + x * np.sum(np.linalg.inv(w))
+  return total
+
+
+def returned_in_loop(w, n):
+  out = []
+  for _ in range(n):
+    out.append(norm(w))
+  return out
+
+
+def nested_loops(xs, w):
+  total = 0.
+  for x in xs:
+    i = 0
+    while i < x:
+      total = total + norm(w)
+      i = i + 1
+  return total
+
+
+class LoopInvariantsTest(test.TestCase):
+
+  def setUp(self):
+    super(LoopInvariantsTest, self).setUp()
+    del calls[:]
+
+  def convert(self, f):
+    transformer = loop_invariants.with_pure_functions(
+        loop_invariants.PURE_FUNCTIONS | {'norm'})
+    return conversion.convert(f, py_defaults,
+                              [transformer, variables, control_flow])
+
+  def assertConvertedEqual(self, f, *args):
+    expected = f(*args)
+    del calls[:]
+    self.assertEqual(self.convert(f)(*args), expected)
+
+  def test_for_loop(self):
+    self.assertConvertedEqual(scaled_sum, [1., 2., 3.], np.array([3., 4.]))
+    self.assertLen(calls, 1)
+
+  def test_while_loop(self):
+    self.assertConvertedEqual(count_below, 12., np.array([3., 4.]))
+    self.assertLen(calls, 1)
+
+  def test_nested_loops(self):
+    self.assertConvertedEqual(nested_loops, [1, 2], np.array([3., 4.]))
+    self.assertLen(calls, 1)
+
+  def test_loop_variables_not_hoisted(self):
+    xs = [np.array([3., 4.]), np.array([6., 8.])]
+    converted = self.convert(normalize_rows)(xs)
+    self.assertLen(calls, 2)
+    self.assertTrue(np.allclose(converted, normalize_rows(xs)))
+
+  def test_mutated_not_hoisted(self):
+    expected = mutate_in_loop(np.array([3., 4.]), 3)
+    del calls[:]
+    self.assertEqual(
+        self.convert(mutate_in_loop)(np.array([3., 4.]), 3), expected)
+    self.assertLen(calls, 3)
+
+  def test_mutated_through_alias_not_hoisted(self):
+    expected = mutate_alias_in_loop(np.array([3., 4.]), 3)
+    del calls[:]
+    self.assertEqual(
+        self.convert(mutate_alias_in_loop)(np.array([3., 4.]), 3), expected)
+    self.assertLen(calls, 3)
+
+  def test_no_iterations(self):
+    converted = conversion.convert(sum_inverse, py_defaults,
+                                   [loop_invariants, variables, control_flow])
+    # The inverse of a singular matrix raises, so it must not run.
+    self.assertEqual(converted([], np.zeros((2, 2))), 0.)
+    self.assertEqual(converted([1., 2.], np.eye(2)), 6.)
+
+  def test_aliased_not_hoisted(self):
+    converted = self.convert(returned_in_loop)(np.array([3., 4.]), 3)
+    self.assertLen(calls, 3)
+    self.assertListEqual(converted, [5., 5., 5.])
+
+  def test_default_allowlist(self):
+    converted = conversion.convert(scaled_sum, py_defaults,
+                                   [loop_invariants, variables, control_flow])
+    self.assertAlmostEqual(converted([1., 2.], np.array([3., 4.])), 0.6)
+    self.assertLen(calls, 2)
+
+
+if __name__ == '__main__':
+  test.main()
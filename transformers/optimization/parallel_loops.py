@@ -0,0 +1,293 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Marks for loops whose iterations may run concurrently.
+
+The iterable of such loops is wrapped in a call to `overload.independent`,
+which receives the lists the loop collects results into:
+
+  for x in xs:
+    y = f(x)
+    total = total + y
+    results.append(g(y))
+
+becomes:
+
+  for x in overload.independent(xs, (results,)):
+    y = f(x)
+    total = total + y
+    overload.collect(results, g(y))
+
+A loop is independent if no iteration reads a value written by another,
+according to the activity analysis of its body. Each variable the loop
+modifies must be either:
+
+  * private to an iteration: assigned by a top level statement of the body
+    before it is first read;
+  * write-only: never read in the loop, so it keeps the last value assigned;
+  * a reduction: only used in statements like `total = total + e`,
+    `total = e * total` or `total = max(total, e)`, where e does not depend on
+    total. See analysis/reductions.py.
+
+The loop may also append to lists which it does not otherwise use; these
+appends are routed through `overload.collect`, so that the overload can keep
+them in iteration order. Loops with break, continue, return or yield
+statements, or nested definitions, are not marked.
+
+Calls may mutate their arguments, which the activity analysis doesn't see.
+Loops which call methods of variables defined outside the loop, or pass
+these variables, or values which may alias them, to functions which are not
+on the pure function allowlist, are not marked either. The allowlist is
+loop_invariants.PURE_FUNCTIONS by default; with_pure_functions extends it.
+
+The transformer does nothing unless the overload module has `independent`
+and `collect` functions. It must run before the virtualization transformers.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gast
+from pyctr.analysis import activity
+from pyctr.analysis import reductions
+from pyctr.core import anno
+from pyctr.core import ast_util
+from pyctr.core import qual_names
+from pyctr.sct import templates
+from pyctr.sct import transformer
+from pyctr.transformers.optimization import loop_invariants
+
+_UNSUPPORTED_NODES = (gast.Return, gast.Yield, gast.YieldFrom, gast.Await,
+                      gast.FunctionDef, gast.ClassDef, gast.Lambda,
+                      gast.Global, gast.Nonlocal)
+
+
+def _has_unsupported_statements(nodes):
+  """True if nodes jump out of the loop, or define functions or classes."""
+  to_visit = list(nodes)
+  while to_visit:
+    node = to_visit.pop()
+    if isinstance(node, _UNSUPPORTED_NODES + (gast.Break, gast.Continue)):
+      return True
+    if isinstance(node, (gast.For, gast.While)):
+      # Jumps in nested loops apply to those loops.
+      if any(isinstance(n, _UNSUPPORTED_NODES) for n in gast.walk(node)):
+        return True
+      to_visit.extend(node.orelse)
+      continue
+    to_visit.extend(gast.iter_child_nodes(node))
+  return False
+
+
+class _LoopAnalysis(object):
+  """Decides whether the iterations of a for loop are independent.
+
+  Attributes:
+    independent: bool
+    collections: List[Text], the names of the lists the loop appends to.
+  """
+
+  def __init__(self, node, overload_name, local_names, pure_functions):
+    self.node = node
+    self.overload_name = overload_name
+    self.local_names = local_names
+    self.pure_functions = pure_functions
+    self.collections = []
+    self.independent = self._analyze()
+
+  def _collection_append(self, node):
+    """Returns the list name and value of `l.append(v)` statements."""
+    if not (isinstance(node, gast.Expr) and isinstance(node.value, gast.Call)):
+      return None
+    call = node.value
+    if call.keywords or not isinstance(call.func, gast.Attribute):
+      return None
+    func = call.func
+    if (func.attr == 'append' and isinstance(func.value, gast.Name) and
+        len(call.args) == 1):
+      return func.value, call.args[0]
+    if (func.attr == 'collect' and isinstance(func.value, gast.Name) and
+        func.value.id == self.overload_name and len(call.args) == 2 and
+        isinstance(call.args[0], gast.Name)):
+      return call.args[0], call.args[1]
+    return None
+
+  def _is_pure_call(self, node):
+    name = ast_util.dotted_name(node.func)
+    if name is None or name not in self.pure_functions:
+      return False
+    # A local variable shadowing the function, e.g. a parameter named `np`.
+    return name.split('.')[0] not in self.local_names
+
+  def _analyze(self):
+    node = self.node
+    if node.orelse or _has_unsupported_statements(node.body):
+      return False
+
+    target_names = set(n.id for n in ast_util.name_nodes(node.target))
+    body_scope = anno.getanno(node, anno.Static.BODY_SCOPE)
+    modified = set(str(qn.root) for qn in body_scope.modified)
+    modified -= target_names
+    occurrences = {}
+    for stmt in node.body:
+      for n in ast_util.name_nodes(stmt):
+        occurrences.setdefault(n.id, []).append(n)
+
+    reduced = set(reductions.find(node))
+    collection_uses = {}
+    for stmt in node.body:
+      for n in gast.walk(stmt):
+        append = self._collection_append(n)
+        if append is not None:
+          collection_uses.setdefault(append[0].id, set()).add(id(append[0]))
+    self.collections = sorted(
+        name for name, uses in collection_uses.items()
+        if name not in modified and name not in target_names and
+        all(id(n) in uses for n in occurrences[name]))
+
+    # Private variables: assigned before they are read in each iteration.
+    private = set(target_names)
+    for stmt in node.body:
+      read = set(n.id
+                 for n in ast_util.name_nodes(stmt)
+                 if isinstance(n.ctx, gast.Load))
+      if isinstance(stmt, gast.Assign):
+        read = set()
+        for n in ast_util.name_nodes(stmt.value):
+          read.add(n.id)
+        for t in stmt.targets:
+          read.update(n.id
+                      for n in ast_util.name_nodes(t)
+                      if isinstance(n.ctx, gast.Load))
+      elif isinstance(stmt, gast.AugAssign):
+        # The target is also read, though its context is Store.
+        read.update(n.id for n in ast_util.name_nodes(stmt.target))
+      carried = (read & modified) - private - reduced
+      if carried:
+        return False
+      if isinstance(stmt, gast.Assign):
+        for t in stmt.targets:
+          if isinstance(t, (gast.Name, gast.Tuple, gast.List)):
+            private.update(n.id
+                           for n in ast_util.name_nodes(t)
+                           if isinstance(n.ctx, gast.Store))
+
+    # Variables modified but never read keep the last value assigned, and
+    # need no special handling. Mutations through calls escape the activity
+    # analysis, so the variables shared by the iterations, and the private
+    # ones which may alias them, may only be passed to pure functions.
+    shared = set(self.local_names) - private - set(self.collections)
+    aliases = {}
+    for stmt in node.body:
+      for name, names in ast_util.aliases(stmt).items():
+        aliases.setdefault(name, set()).update(names)
+    pending = list(shared)
+    while pending:
+      for alias in aliases.get(pending.pop(), ()):
+        if alias not in shared:
+          shared.add(alias)
+          pending.append(alias)
+
+    # Appending a value to a collection doesn't mutate it.
+    appends = set(c + '.append' for c in self.collections)
+    for stmt in node.body:
+      for n in gast.walk(stmt):
+        if (not isinstance(n, gast.Call) or self._is_pure_call(n) or
+            ast_util.dotted_name(n.func) in appends):
+          continue
+        names = set()
+        if isinstance(n.func, gast.Attribute):
+          names |= ast_util.reference_names(n.func.value)
+        for arg in n.args:
+          names |= ast_util.reference_names(arg)
+        for keyword in n.keywords:
+          names |= ast_util.reference_names(keyword.value)
+        if names & shared:
+          return False
+    return True
+
+
+class _AppendRewriter(gast.NodeTransformer):
+  """Routes the appends to the collections of a loop through the overload."""
+
+  def __init__(self, analysis, overload):
+    self.analysis = analysis
+    self.overload = overload
+
+  def visit_Expr(self, node):
+    append = self.analysis._collection_append(node)  # pylint:disable=protected-access
+    if append is None or append[0].id not in self.analysis.collections:
+      return node
+    collect, = templates.replace(
+        'overload.collect(collection, value)',
+        overload=self.overload.symbol_name,
+        collection=append[0].id,
+        value=append[1])
+    return collect
+
+
+class ParallelLoopTransformer(transformer.FunctionScopedBase):
+  """Wraps the iterables of independent for loops in overload.independent."""
+
+  def __init__(self, ctx, overload, pure_functions):
+    super(ParallelLoopTransformer, self).__init__(ctx.info)
+    self.ctx = ctx
+    self.overload = overload
+    self.pure_functions = frozenset(pure_functions)
+
+  def visit_For(self, node):
+    module = self.overload.module
+    if hasattr(module, 'independent') and hasattr(module, 'collect'):
+      analysis = _LoopAnalysis(node, self.overload.symbol_name,
+                               self.local_names, self.pure_functions)
+      if analysis.independent:
+        rewriter = _AppendRewriter(analysis, self.overload)
+        node.body = [rewriter.visit(stmt) for stmt in node.body]
+        node.iter = templates.replace_as_expression(
+            'overload.independent(iter_, (collections,))',
+            overload=self.overload.symbol_name,
+            iter_=node.iter,
+            collections=analysis.collections)
+    return self.generic_visit(node)
+
+
+def with_pure_functions(pure_functions):
+  """Returns this transformer, with a custom allowlist.
+
+  Example:
+
+    transformers = [parallel_loops.with_pure_functions(
+        loop_invariants.PURE_FUNCTIONS | {'my_lib.norm'}), variables]
+
+  Args:
+    pure_functions: Iterable[Text], the dotted names of the functions which
+      don't mutate their arguments, as they are called in the converted code.
+
+  Returns:
+    An object which may be passed in the list of transformers to convert.
+  """
+  return transformer.Configured(
+      _transform, pure_functions=frozenset(pure_functions))
+
+
+def _transform(node, ctx, overload, pure_functions):
+  node = qual_names.resolve(node)
+  node = activity.resolve(node, ctx, parent_scope=None, overload=overload)
+  node = ParallelLoopTransformer(ctx, overload, pure_functions).visit(node)
+  return node
+
+
+def transform(node, ctx, overload):
+  return _transform(node, ctx, overload, loop_invariants.PURE_FUNCTIONS)
@@ -0,0 +1,185 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for parallel_loops module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import types
+
+from absl.testing import absltest as test
+from pyctr.api import conversion
+from pyctr.overloads import py_defaults
+from pyctr.transformers.optimization import loop_invariants
+from pyctr.transformers.optimization import parallel_loops
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import variables
+
+
+def reductions(xs):
+  total = 0
+  largest = 0
+  for x in xs:
+    y = x * x
+    total = total + y
+    largest = max(largest, y)
+  return total, largest
+
+
+def collected(xs):
+  squares = []
+  for x in xs:
+    squares.append(x * x)
+  return squares
+
+
+def loop_carried(xs):
+  prev = 0
+  diffs = []
+  for x in xs:
+    diffs.append(x - prev)
+    prev = x
+  return diffs
+
+
+def reduction_read(xs):
+  total = 0
+  out = []
+  for x in xs:
+    total = total + x
+    out.append(total)
+  return out
+
+
+def mutated(xs):
+  seen = set()
+  for x in xs:
+    seen.add(x)
+  return seen
+
+
+def add_to(out, x):
+  out.append(x)
+
+
+def scale(w, x):
+  return w * x
+
+
+def mutated_by_callee(xs):
+  out = []
+  for x in xs:
+    add_to(out, x)
+  return out
+
+
+def mutated_through_alias(xs):
+  out = {}
+  for x in xs:
+    d = out
+    d.__setitem__(x, len(d))
+  return out
+
+
+def scaled(xs, w):
+  out = []
+  for x in xs:
+    out.append(scale(w, abs(x)))
+  return out
+
+
+def extend_aliased(xs):
+  acc = []
+  alias = acc
+  for x in xs:
+    acc += [x]
+  return alias
+
+
+def early_exit(xs):
+  found = None
+  for x in xs:
+    if x > 1:
+      found = x
+      break
+  return found
+
+
+class ParallelLoopsTest(test.TestCase):
+
+  def setUp(self):
+    super(ParallelLoopsTest, self).setUp()
+    self.marked = []
+    overload = types.ModuleType('recording')
+    for name in ('init', 'assign', 'read', 'call', 'if_stmt', 'for_stmt'):
+      setattr(overload, name, getattr(py_defaults, name))
+
+    def independent(iterable, collections):
+      self.marked.append(collections)
+      return iterable
+
+    overload.independent = independent
+    overload.collect = lambda collection, value: collection.append(value)
+    self.overload = overload
+
+  def convert(self, f):
+    return conversion.convert(f, self.overload,
+                              [parallel_loops, variables, control_flow])
+
+  def test_reductions(self):
+    self.assertEqual(self.convert(reductions)([1, 3, 2]), (14, 9))
+    self.assertEqual(self.marked, [()])
+
+  def test_collections(self):
+    self.assertEqual(self.convert(collected)([1, 2, 3]), [1, 4, 9])
+    self.assertEqual(self.marked, [([1, 4, 9],)])
+
+  def test_dependent_loops_not_marked(self):
+    self.assertEqual(self.convert(loop_carried)([1, 3, 6]), [1, 2, 3])
+    self.assertEqual(self.convert(reduction_read)([1, 2]), [1, 3])
+    self.assertEqual(self.convert(mutated)([1, 1]), {1})
+    self.assertEqual(self.marked, [])
+
+  def test_calls_mutating_shared_variables_not_marked(self):
+    self.assertEqual(self.convert(mutated_by_callee)([2, 1]), [2, 1])
+    self.assertEqual(self.convert(mutated_through_alias)([2, 1]), {2: 0, 1: 1})
+    self.assertEqual(self.convert(scaled)([-1, 2], 3), [3, 6])
+    self.assertEqual(self.marked, [])
+
+  def test_pure_functions(self):
+    pure_functions = loop_invariants.PURE_FUNCTIONS | {'scale'}
+    converted = conversion.convert(
+        scaled, self.overload,
+        [parallel_loops.with_pure_functions(pure_functions), variables,
+         control_flow])
+    self.assertEqual(converted([-1, 2], 3), [3, 6])
+    self.assertEqual(self.marked, [([3, 6],)])
+
+  def test_augmented_assignments_not_marked(self):
+    # The list is extended in place, which the alias observes.
+    converted = conversion.convert(extend_aliased, self.overload,
+                                   [parallel_loops])
+    self.assertEqual(converted([1, 2]), [1, 2])
+    self.assertEqual(self.marked, [])
+
+  def test_jumps_not_marked(self):
+    converted = conversion.convert(early_exit, self.overload, [parallel_loops])
+    self.assertEqual(converted([1, 2, 3]), 2)
+    self.assertEqual(self.marked, [])
+
+
+if __name__ == '__main__':
+  test.main()
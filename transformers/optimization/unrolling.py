@@ -0,0 +1,247 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Unrolls for loops with a small trip count known at conversion time.
+
+The unrolled loops iterate over a range with literal arguments, or over a
+literal tuple or list:
+
+  for i in range(2):
+    x = x * w[i]
+
+becomes:
+
+  i = 0
+  x = x * w[i]
+  i = 1
+  x = x * w[i]
+
+Staged overloads then emit straight-line code instead of a loop op with
+loop-carried state. Loops are unrolled within a budget of iterations, and of
+statements in the unrolled code. Loops containing break or continue
+statements, or function and class definitions, are left as they are.
+
+This transformer must run before the virtualization transformers, e.g.:
+
+  conversion.convert(f, overloads, [unrolling, variables, control_flow])
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gast
+from pyctr.core import anno
+from pyctr.core import ast_util
+from pyctr.sct import templates
+from pyctr.sct import transformer
+
+# The default budget: the most iterations of a single loop, and the most
+# statements in its unrolled code.
+MAX_ITERATIONS = 16
+MAX_STATEMENTS = 256
+
+
+def _int_literal(node):
+  """Returns the value of an integer literal node, else None."""
+  if isinstance(node, gast.UnaryOp) and isinstance(node.op, gast.USub):
+    value = _int_literal(node.operand)
+    return None if value is None else -value
+  if isinstance(node, gast.Num) and isinstance(node.n, int):
+    return node.n
+  return None
+
+
+def _count_statements(nodes):
+  return sum(
+      1 for node in nodes for n in gast.walk(node) if isinstance(n, gast.stmt))
+
+
+def _has_jumps_or_definitions(nodes):
+  """True if nodes contain break or continue statements of the loop, or defs."""
+  to_visit = list(nodes)
+  while to_visit:
+    node = to_visit.pop()
+    if isinstance(node, (gast.Break, gast.Continue, gast.FunctionDef,
+                         gast.ClassDef)):
+      return True
+    if isinstance(node, (gast.For, gast.While)):
+      # Jumps in nested loops apply to those loops.
+      to_visit.extend(node.orelse)
+      to_visit.extend(n for n in gast.walk(node)
+                      if isinstance(n, (gast.FunctionDef, gast.ClassDef)))
+      continue
+    to_visit.extend(gast.iter_child_nodes(node))
+  return False
+
+
+class UnrollingTransformer(transformer.FunctionScopedBase):
+  """Unrolls for loops over literal ranges, tuples and lists.
+
+  Attributes:
+    ctx: transformer.EntityContext
+    overload: overloads.Overload
+    max_iterations: int, the most iterations of an unrolled loop.
+    max_statements: int, the most statements in the unrolled code of a loop.
+  """
+
+  def __init__(self, ctx, overload, max_iterations, max_statements):
+    super(UnrollingTransformer, self).__init__(ctx.info)
+    self.ctx = ctx
+    self.overload = overload
+    self.max_iterations = max_iterations
+    self.max_statements = max_statements
+
+  def _range_values(self, node):
+    """Returns the values of a range with literal arguments, else None."""
+    if not (isinstance(node, gast.Call) and isinstance(node.func, gast.Name) and
+            node.func.id == 'range' and 'range' not in self.local_names):
+      return None
+    if node.keywords or not 1 <= len(node.args) <= 3:
+      return None
+    args = [_int_literal(a) for a in node.args]
+    if any(a is None for a in args) or (len(args) == 3 and args[2] == 0):
+      return None
+    values = range(*args)
+    if len(values) > self.max_iterations:
+      return None
+    return [gast.Num(n=v) for v in values]
+
+  def _literal_values(self, node, target, body):
+    """Returns the elements of a literal tuple or list, and their setup.
+
+    Elements are evaluated before the first iteration, like the literal
+    itself. Constants, names which the loop does not assign, and tuples of
+    those are used directly; other elements are first assigned to new
+    variables.
+
+    Args:
+      node: gast.AST, the loop iterable.
+      target: gast.AST, the loop target.
+      body: List[gast.AST], the loop body.
+
+    Returns:
+      Optional[Tuple[List[gast.AST], List[gast.AST]]], the values of the
+      iterations, and the assignments to run before the loop.
+    """
+    if not isinstance(node, (gast.Tuple, gast.List)):
+      return None
+    if any(isinstance(e, gast.Starred) for e in node.elts):
+      return None
+    if len(node.elts) > self.max_iterations:
+      return None
+
+    assigned = set(
+        n.id for stmt in [target] + body for n in gast.walk(stmt)
+        if isinstance(n, gast.Name) and not isinstance(n.ctx, gast.Load))
+    setup = []
+    values = [self._stable_value(e, assigned, setup) for e in node.elts]
+    return values, setup
+
+  def _stable_value(self, node, assigned, setup):
+    if isinstance(node, (gast.Num, gast.Str, gast.NameConstant)) or (
+        isinstance(node, gast.Name) and node.id not in assigned):
+      return node
+    if (isinstance(node, (gast.Tuple, gast.List)) and
+        not any(isinstance(e, gast.Starred) for e in node.elts)):
+      return type(node)(
+          elts=[self._stable_value(e, assigned, setup) for e in node.elts],
+          ctx=gast.Load())
+    name = self.ctx.namer.new_symbol('unrolled_value', self.reserved_names)
+    setup.extend(templates.replace('name = value', name=name, value=node))
+    return gast.Name(id=name, ctx=gast.Load(), annotation=None)
+
+  def _assignments(self, target, value):
+    """Returns the assignments of value to the loop target, if possible.
+
+    Tuple targets are assigned element by element, since unpacking is not
+    virtualized. This requires a literal value of the same length.
+
+    Args:
+      target: gast.AST
+      value: gast.AST
+
+    Returns:
+      Optional[List[gast.AST]]
+    """
+    if isinstance(target, gast.Name):
+      return templates.replace(
+          'target = value',
+          target=ast_util.copy_clean(target),
+          value=ast_util.copy_clean(value))
+    if not (isinstance(target, (gast.Tuple, gast.List)) and
+            isinstance(value, (gast.Tuple, gast.List)) and
+            len(target.elts) == len(value.elts)):
+      return None
+    assignments = []
+    for t, v in zip(target.elts, value.elts):
+      assignment = self._assignments(t, v)
+      if assignment is None:
+        return None
+      assignments.extend(assignment)
+    return assignments
+
+  def visit_For(self, node):
+    node = self.generic_visit(node)
+
+    if _has_jumps_or_definitions(node.body):
+      return node
+
+    setup = []
+    values = self._range_values(node.iter)
+    if values is None:
+      literal = self._literal_values(node.iter, node.target, node.body)
+      if literal is None:
+        return node
+      values, setup = literal
+
+    size = len(values) * (_count_statements(node.body) + 1)
+    if size > self.max_statements:
+      return node
+
+    assignments = [self._assignments(node.target, v) for v in values]
+    if any(a is None for a in assignments):
+      return node
+
+    unrolled = list(setup)
+    for assignment in assignments:
+      unrolled.extend(assignment)
+      unrolled.extend(
+          ast_util.copy_clean(node.body, preserve_annos={anno.Basic.ORIGIN}))
+    unrolled.extend(node.orelse)
+    return unrolled or gast.Pass()
+
+
+def with_budget(max_iterations=MAX_ITERATIONS, max_statements=MAX_STATEMENTS):
+  """Returns this transformer, with a custom budget.
+
+  Args:
+    max_iterations: int, the most iterations of an unrolled loop.
+    max_statements: int, the most statements in the unrolled code of a loop,
+      including the assignments to the loop target.
+
+  Returns:
+    An object which may be passed in the list of transformers to convert.
+  """
+  return transformer.Configured(
+      _transform, max_iterations=max_iterations, max_statements=max_statements)
+
+
+def _transform(node, ctx, overload, max_iterations, max_statements):
+  return UnrollingTransformer(ctx, overload, max_iterations,
+                              max_statements).visit(node)
+
+
+def transform(node, ctx, overload):
+  return _transform(node, ctx, overload, MAX_ITERATIONS, MAX_STATEMENTS)
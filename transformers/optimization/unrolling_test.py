@@ -0,0 +1,140 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for unrolling module."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import inspect
+import types
+
+from absl.testing import absltest as test
+from pyctr.api import conversion
+from pyctr.overloads import py_defaults
+from pyctr.transformers.optimization import unrolling
+from pyctr.transformers.virtualization import control_flow
+from pyctr.transformers.virtualization import variables
+
+
+def power(x):
+  y = 1
+  for _ in range(3):
+    y = y * x
+  return y
+
+
+def weighted_sum(a, b):
+  total = 0
+  for w, v in ((1, a), (2, b)):
+    total = total + w * v
+  return total
+
+
+def swap_elements(a, b):
+  for a in (b, a):
+    b = a
+  return a, b
+
+
+def nested(n):
+  total = 0
+  for i in range(1, 3):
+    for j in range(-1, 1):
+      total = total + i * j + n
+  return total
+
+
+def with_break(n):
+  i = 0
+  for i in range(5):
+    if i > n:
+      break
+  return i
+
+
+def long_loop(x):
+  for _ in range(100):
+    x = x + 1
+  return x
+
+
+def dynamic_range(n):
+  total = 0
+  for i in range(n):
+    total = total + i
+  return total
+
+
+def _counting_overload():
+  """Creates an overload module which counts for statements."""
+  module = types.ModuleType('counting_for')
+  module.init = py_defaults.init
+  module.assign = py_defaults.assign
+  module.read = py_defaults.read
+  module.if_stmt = py_defaults.if_stmt
+  module.for_stmts = 0
+
+  def for_stmt(*args):
+    module.for_stmts += 1
+    return py_defaults.for_stmt(*args)
+
+  module.for_stmt = for_stmt
+  return module
+
+
+class UnrollingTest(test.TestCase):
+
+  def _run(self, f, args, unroller):
+    overload = _counting_overload()
+    converted = conversion.convert(f, overload,
+                                   [unroller, variables, control_flow])
+    self.assertEqual(converted(*args), f(*args))
+    return overload.for_stmts
+
+  def assertUnrolled(self, f, *args, **kwargs):
+    self.assertEqual(self._run(f, args, kwargs.get('unroller', unrolling)), 0)
+
+  def assertNotUnrolled(self, f, *args, **kwargs):
+    self.assertGreater(
+        self._run(f, args, kwargs.get('unroller', unrolling)), 0)
+
+  def test_range(self):
+    self.assertUnrolled(power, 3)
+
+  def test_literal_tuple(self):
+    self.assertUnrolled(weighted_sum, 3, 4)
+    self.assertUnrolled(swap_elements, 1, 2)
+
+  def test_nested(self):
+    self.assertUnrolled(nested, 1)
+
+  def test_not_unrolled(self):
+    converted = conversion.convert(with_break, py_defaults, [unrolling])
+    self.assertIn('break', inspect.getsource(converted))
+    self.assertEqual(converted(2), 3)
+    self.assertNotUnrolled(long_loop, 0)
+    self.assertNotUnrolled(dynamic_range, 4)
+
+  def test_budget(self):
+    self.assertNotUnrolled(power, 3, unroller=unrolling.with_budget(2))
+    self.assertNotUnrolled(
+        power, 3, unroller=unrolling.with_budget(max_statements=5))
+    self.assertUnrolled(
+        long_loop, 0, unroller=unrolling.with_budget(max_iterations=100))
+
+
+if __name__ == '__main__':
+  test.main()
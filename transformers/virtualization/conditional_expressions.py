@@ -0,0 +1,49 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Handles conditional expressions: x if cond else y."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from pyctr.sct import templates
+from pyctr.sct import transformer
+
+
+class ConditionalExpressionTransformer(transformer.Base):
+  """Transforms conditional expressions."""
+
+  def __init__(self, ctx, overload):
+    super(ConditionalExpressionTransformer, self).__init__(ctx.info)
+    self.ctx = ctx
+    self.overload = overload
+
+  def visit_IfExp(self, node):
+    node = self.generic_visit(node)
+
+    if not hasattr(self.overload.module, 'if_exp'):
+      return node
+
+    return templates.replace_as_expression(
+        'overload.if_exp(test, lambda: body, lambda: orelse)',
+        overload=self.overload.symbol_name,
+        test=node.test,
+        body=node.body,
+        orelse=node.orelse)
+
+
+def transform(node, ctx, overload):
+  node = ConditionalExpressionTransformer(ctx, overload).visit(node)
+  return node
@@ -0,0 +1,68 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for conditional_expressions converter."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest as test
+from absl.testing import parameterized
+from pyctr.api import conversion
+from pyctr.overloads import py_defaults
+from pyctr.overloads.testing import reverse_conditional_logic
+from pyctr.transformers.virtualization import conditional_expressions
+
+
+class ConditionalExpressionsTest(parameterized.TestCase):
+
+  @parameterized.parameters((-1,), (1,))
+  def test_if_exp(self, x):
+
+    def test_fn(x):
+      return 'positive' if x > 0 else 'negative'
+
+    converted_fn = conversion.convert(test_fn, py_defaults,
+                                      [conditional_expressions])
+    self.assertEqual(test_fn(x), converted_fn(x))
+
+  def test_if_exp_lazy(self):
+
+    def foo():
+      raise ValueError()
+
+    def test_fn(x):
+      return foo() if x else 1
+
+    converted_fn = conversion.convert(test_fn, py_defaults,
+                                      [conditional_expressions])
+
+    self.assertEqual(converted_fn(False), 1)
+    with self.assertRaises(ValueError):
+      converted_fn(True)
+
+  def test_no_overload(self):
+
+    def test_fn(x):
+      return 1 if x else 2
+
+    # reverse_conditional_logic does not overload conditional expressions.
+    converted_fn = conversion.convert(test_fn, reverse_conditional_logic,
+                                      [conditional_expressions])
+    self.assertEqual(converted_fn(True), 1)
+
+
+if __name__ == '__main__':
+  test.main()
@@ -20,6 +20,7 @@ from __future__ import print_function
 
 import gast
 from pyctr.analysis import activity
+from pyctr.analysis import reductions
 from pyctr.core import anno
 from pyctr.core import qual_names
 from pyctr.sct import templates
@@ -104,13 +105,27 @@ class ControlFlowTransformer(transformer.Base):
     return templates.replace(
         'target = overload.init(target_name)',
         target=target,
-        target_name='"{}"'.format(target.id),
+        target_name=gast.Str(target.id),
         overload=self.overload.symbol_name)
 
+  def _reduction_specs(self, node):
+    """Returns (variable, operation) tuples for the reductions of a loop."""
+    if not hasattr(self.overload.module, 'reduce_stmt'):
+      return []
+    loop_reductions = anno.getanno(node, anno.Static.REDUCTIONS, default={})
+    return [
+        gast.Tuple(
+            elts=[gast.Name(r.name, gast.Load(), None), gast.Str(r.op)],
+            ctx=gast.Load())
+        for r in loop_reductions.values()
+        if r.associative
+    ]
+
   def visit_For(self, node):
     body_scope = anno.getanno(node, anno.Static.BODY_SCOPE)
     orelse_scope = anno.getanno(node, anno.Static.ORELSE_SCOPE)
     modified_in_cond = body_scope.modified | orelse_scope.modified
+    reduction_specs = self._reduction_specs(node)
 
     node = self.generic_visit(node)
 
@@ -136,14 +151,28 @@ class ControlFlowTransformer(transformer.Base):
         self._make_target_init(target, self.overload) for target in targets
     ]
 
-    template = """
-      target_inits
-      def body_name():
-        body
-      def orelse_name():
-        orelse
-      overload.for_stmt(target, iter_, body_name, orelse_name, (local_writes,))
-    """
+    if reduction_specs:
+      # Loops updating reduction variables can combine the contributions of
+      # their iterations at once. See analysis/reductions.py.
+      template = """
+        target_inits
+        def body_name():
+          body
+        def orelse_name():
+          orelse
+        overload.reduce_stmt(target, iter_, body_name, orelse_name,
+                             (local_writes,), (reductions,))
+      """
+    else:
+      template = """
+        target_inits
+        def body_name():
+          body
+        def orelse_name():
+          orelse
+        overload.for_stmt(target, iter_, body_name, orelse_name,
+                          (local_writes,))
+      """
 
     node = templates.replace(
         template,
@@ -155,7 +184,8 @@ class ControlFlowTransformer(transformer.Base):
         orelse=node.orelse if node.orelse else gast.Pass(),
         overload=self.overload.symbol_name,
         iter_=node.iter,
-        local_writes=tuple(modified_in_cond))
+        local_writes=tuple(modified_in_cond),
+        reductions=reduction_specs)
 
     return node
 
@@ -163,5 +193,6 @@ class ControlFlowTransformer(transformer.Base):
 def transform(node, ctx, overload):
   node = qual_names.resolve(node)
   node = activity.resolve(node, ctx, parent_scope=None, overload=overload)
+  node = reductions.resolve(node, overload.symbol_name)
   node = ControlFlowTransformer(ctx, overload).visit(node)
   return node
@@ -59,7 +59,7 @@ class VariableTransformer(transformer.Base):
       init_node = templates.replace(
           init_template,
           lhs=var,
-          lhs_name='"{}"'.format(var),
+          lhs_name=gast.Str(var),
           overload=self.overload.symbol_name)
       init_nodes.extend(init_node)
 